@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Answer cache for Silkroad RAG Chatbot
+Caches final answers in front of the FileSearch + generation call
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from text_normalize import normalize
+
+# Marker file written by the upload scripts every time documents are
+# (re-)uploaded to a FileSearch store. Running apps watch it and drop
+# their cached answers when it changes.
+STORE_GENERATION_FILE = '.store_generation.json'
+
+MAX_MISS_VECTORS = 1024  # Embeddings of recent misses, reused when their answer is stored
+_NO_VECTOR = object()
+
+def normalize_question(question):
+    """Normalize a question for cache keys (text_normalize.normalize, no trailing ?!.)"""
+    return normalize(question).rstrip('?!.。 ')
+
+def prompt_fingerprint(*parts):
+    """Short hash of the prompt template(s), so prompt edits invalidate old entries"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+def read_store_generation(path=STORE_GENERATION_FILE):
+    """Read the store generation marker (empty dict if missing)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def bump_store_generation(store_id, path=STORE_GENERATION_FILE):
+    """Mark that documents in a store changed (call after uploading)"""
+    marker = read_store_generation(path)
+    marker = {
+        'store_id': store_id,
+        'generation': marker.get('generation', 0) + 1,
+        'updated_at': datetime.now().isoformat()
+    }
+
+    # Write to a temp file and rename, so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(marker, f)
+    os.replace(tmp_path, path)
+    return marker['generation']
+
+class AnswerCache:
+    """
+    Thread-safe LRU + TTL cache of chat results
+
+    Keys combine the normalized question with the store ID, model name and
+    prompt template hash. When an embedding function is given, a miss on the
+    exact key falls back to a near-duplicate lookup by cosine similarity;
+    the question's embedding is kept until set() stores its answer, so a
+    miss costs one embedding call.
+
+    When the store generation changes the cache is cleared, unless an
+    on_store_change callback is set: then the old answers keep being served
+    until a staging cache (see begin_staging / swap) replaces them at once.
+    """
+
+    def __init__(self, max_size=1000, ttl=3600, embed_fn=None,
+                 similarity_threshold=0.95, generation_file=STORE_GENERATION_FILE,
+                 generation_check_interval=5.0, max_tracked_questions=5000):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.generation_file = generation_file
+        self.generation_check_interval = generation_check_interval
+
+        self._entries = OrderedDict()  # key -> (expires_at, namespace, result)
+        self._embeddings = {}          # key -> (namespace, unit vector)
+        self._miss_vectors = OrderedDict()  # key -> unit vector (or None) computed by get()
+        self._lock = threading.Lock()
+        self._staging = None           # Cache being warmed; new answers also go there
+
+        # Lookup counts per normalized question (top_questions() for the warmer)
+        self._popularity = {}          # normalized question -> [count, question]
+        self.max_tracked_questions = max_tracked_questions
+        self.on_store_change = None
+
+        self._generation_mtime = self._stat_generation_file()
+        self._generation_checked_at = time.monotonic()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.swaps = 0
+
+    @staticmethod
+    def namespace(store_id, model_name, prompt_hash):
+        """Everything besides the question that changes the answer"""
+        return f"{store_id}|{model_name}|{prompt_hash}"
+
+    @staticmethod
+    def make_key(question, namespace):
+        """Cache key for a question within a namespace"""
+        raw = f"{namespace}|{normalize_question(question)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, question, namespace, similar=True):
+        """Return a cached result for the question, or None (similar=False: exact key only)"""
+        self._check_store_generation()
+        key = self.make_key(question, namespace)
+        now = time.monotonic()
+
+        with self._lock:
+            self._count_lookup(question)
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                self._remove(key)
+
+        if self.embed_fn and similar:
+            result = self._get_similar(question, key, namespace, now)
+            if result is not None:
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, question, namespace, result):
+        """Store a successful result"""
+        key = self.make_key(question, namespace)
+        with self._lock:
+            vector = self._miss_vectors.pop(key, _NO_VECTOR)
+        if vector is _NO_VECTOR:
+            vector = self._embed(question) if self.embed_fn else None
+        self._store(key, namespace, result, vector)
+
+        staging = self._staging
+        if staging is not None:
+            # Answered against the current documents: keep it across the swap
+            staging._store(key, namespace, result, vector)
+
+    def _store(self, key, namespace, result, vector):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, namespace, result)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._embeddings[key] = (namespace, vector)
+
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def begin_staging(self):
+        """Empty cache with the same settings to warm; swap() puts it in place"""
+        staging = AnswerCache(self.max_size, self.ttl, self.embed_fn, self.similarity_threshold,
+                              generation_file=None)
+        self._staging = staging
+        return staging
+
+    def swap(self, staging):
+        """Atomically replace every cached answer with the staging cache's"""
+        with staging._lock:
+            entries, embeddings = staging._entries, staging._embeddings
+        with self._lock:
+            self._entries, self._embeddings = entries, embeddings
+            if self._staging is staging:
+                self._staging = None
+            self.swaps += 1
+
+    def abort_staging(self, staging):
+        """Stop mirroring new answers into a staging cache that will not be used"""
+        if self._staging is staging:
+            self._staging = None
+
+    def top_questions(self, n):
+        """The n most looked-up questions (original wording of the first lookup)"""
+        with self._lock:
+            ranked = sorted(self._popularity.values(), key=lambda item: -item[0])
+        return [question for _, question in ranked[:n]]
+
+    def _count_lookup(self, question):
+        """Count a lookup (caller holds the lock); drop the rarest half when full"""
+        normalized = normalize_question(question)
+        item = self._popularity.get(normalized)
+        if item:
+            item[0] += 1
+            return
+        if len(self._popularity) >= self.max_tracked_questions:
+            ranked = sorted(self._popularity.items(), key=lambda kv: -kv[1][0])
+            self._popularity = dict(ranked[:self.max_tracked_questions // 2])
+        self._popularity[normalized] = [1, question]
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._embeddings.clear()
+            self._miss_vectors.clear()
+
+    def stats(self):
+        """Counters for /api/health"""
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'swaps': self.swaps,
+                'warming': self._staging is not None,
+                'semantic_lookup': self.embed_fn is not None
+            }
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        self._embeddings.pop(key, None)
+
+    def _embed(self, question):
+        """Unit-length embedding of the normalized question (None on failure)"""
+        try:
+            import numpy as np
+            vector = np.asarray(self.embed_fn(normalize_question(question)), dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            return vector / norm if norm else None
+        except Exception as e:
+            print(f"Answer cache embedding failed: {e}")
+            return None
+
+    def _get_similar(self, question, question_key, namespace, now):
+        """Near-duplicate lookup by cosine similarity within the namespace"""
+        vector = self._embed(question)
+        with self._lock:
+            # Reused by set() if this lookup misses (a failed embedding is not retried)
+            self._miss_vectors[question_key] = vector
+            self._miss_vectors.move_to_end(question_key)
+            while len(self._miss_vectors) > MAX_MISS_VECTORS:
+                self._miss_vectors.popitem(last=False)
+        if vector is None:
+            return None
+
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            for key, (entry_namespace, entry_vector) in self._embeddings.items():
+                if entry_namespace != namespace:
+                    continue
+                score = float(vector @ entry_vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                return None
+            entry = self._entries.get(best_key)
+            if not entry or entry[0] <= now:
+                self._remove(best_key)
+                return None
+
+            self._entries.move_to_end(best_key)
+            self._miss_vectors.pop(question_key, None)
+            self.semantic_hits += 1
+            return entry[2]
+
+    def _stat_generation_file(self):
+        if not self.generation_file:
+            return None
+        try:
+            return os.stat(self.generation_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_store_generation(self):
+        """Clear the cache when the upload scripts bumped the store generation"""
+        now = time.monotonic()
+        if not self.generation_file or now - self._generation_checked_at < self.generation_check_interval:
+            return
+        self._generation_checked_at = now
+
+        mtime = self._stat_generation_file()
+        if mtime != self._generation_mtime:
+            self._generation_mtime = mtime
+            with self._lock:
+                self.invalidations += 1
+            if self.on_store_change:
+                print("✓ Store documents changed - warming a new answer cache")
+                self.on_store_change()
+                return
+            self.clear()
+            print("✓ Store documents changed - answer cache cleared")
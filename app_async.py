@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Async (ASGI) server mode for Silkroad RAG Chatbot
+Same API and strategies as the Flask apps (rag_engine), but Gemini is called
+through client.aio on one event loop with one shared client and connection
+pool, so a single process can hold hundreds of in-flight questions without a
+thread each.
+
+Run:
+    hypercorn app_async:app --bind 0.0.0.0:5005
+"""
+from quart import Quart, render_template, request, jsonify, session, Response
+import uuid
+from config import Config
+from rag_engine import RAGEngine
+
+# Initialize Quart app (Flask-compatible API)
+app = Quart(__name__)
+app.config.from_object(Config)
+app.secret_key = Config.SECRET_KEY
+
+# Shared engine (prompts, session store, answer cache, metrics); one
+# connection pool for all requests. Any strategy works, RAG_STRATEGY picks it.
+engine = RAGEngine(Config, max_connections=Config.GEMINI_MAX_CONNECTIONS)
+app.engine = engine
+
+@app.after_request
+async def add_cors_headers(response):
+    """Allow cross-origin requests (same as CORS(app) in the Flask apps)"""
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+def get_or_create_session_id():
+    """Get or create a unique session ID for the user"""
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    return session['session_id']
+
+async def read_message():
+    """(user message, request JSON); same validation as rag_engine.web.read_message"""
+    data = await request.get_json(silent=True) or {}
+    return (data.get('message') or '').strip(), data
+
+@app.route('/')
+async def index():
+    """Render the main chatbot interface"""
+    return await render_template('index.html')
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    """
+    Chat endpoint
+    Expects JSON: { "message": "user question" }
+    Returns JSON: { "answer": "bot response", "citations": [...] }
+    """
+    try:
+        user_message, data = await read_message()
+
+        if not user_message:
+            return jsonify({
+                'error': 'Message is required',
+                'success': False
+            }), 400
+
+        trace = bool(data.get('trace')) or Config.TRACE_RESPONSES
+        result = await engine.aask(user_message, get_or_create_session_id(), trace=trace)
+
+        if result.get('success'):
+            return jsonify({**result, 'cached': result.get('cached', False)})
+        elif 'retry_after' in result:
+            # Gemini overloaded / circuit open: tell the client when to retry
+            return jsonify(result), 503, {'Retry-After': str(result['retry_after'])}
+        else:
+            return jsonify(result), 500
+
+    except Exception as e:
+        return jsonify({
+            'error': f'Server error: {str(e)}',
+            'success': False
+        }), 500
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events), see rag_engine/web.py"""
+    try:
+        user_message, _ = await read_message()
+
+        if not user_message:
+            return jsonify({
+                'error': 'Message is required',
+                'success': False
+            }), 400
+
+        response = Response(
+            engine.astream(user_message, get_or_create_session_id()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+            }
+        )
+        response.timeout = None  # Long answers must not hit the response timeout
+        return response
+
+    except Exception as e:
+        return jsonify({
+            'error': f'Server error: {str(e)}',
+            'success': False
+        }), 500
+
+@app.route('/api/history', methods=['GET'])
+async def get_history():
+    """Get chat history for current session"""
+    try:
+        history = await engine.ahistory(get_or_create_session_id())
+
+        return jsonify({
+            'history': [msg.to_dict() for msg in history],
+            'success': True
+        })
+    except Exception as e:
+        return jsonify({
+            'error': f'Error retrieving history: {str(e)}',
+            'success': False
+        }), 500
+
+@app.route('/api/clear', methods=['POST'])
+async def clear_history():
+    """Clear chat history for current session"""
+    try:
+        await engine.aclear(get_or_create_session_id())
+
+        return jsonify({
+            'message': 'History cleared',
+            'success': True
+        })
+    except Exception as e:
+        return jsonify({
+            'error': f'Error clearing history: {str(e)}',
+            'success': False
+        }), 500
+
+@app.route('/api/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint"""
+    return jsonify({**engine.health(), 'server': 'async'})
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus metrics, see rag_engine/tracing.py"""
+    return Response(engine.prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Strategy-specific endpoints (e.g. /api/examples), as in rag_engine/web.py
+engine.strategy.register_routes(app)
+
+if __name__ == '__main__':
+    print("\n" + "=" * 60)
+    print("Silkroad RAG Chatbot - ASYNC SERVER MODE")
+    print("=" * 60)
+
+    if not engine.client:
+        print("\n⚠ Warning: Gemini client not initialized!")
+        print("  Please check your .env configuration\n")
+
+    print(f"Server running at: http://localhost:5005")
+    print(f"Features:")
+    print(f"  - Async Gemini calls (client.aio), one shared connection pool")
+    print(f"  - Strategy: {engine.strategy.name} (RAG_STRATEGY)")
+    print(f"  - Max upstream connections: {Config.GEMINI_MAX_CONNECTIONS}")
+    print(f"  - For production: hypercorn app_async:app --bind 0.0.0.0:5005")
+    print("=" * 60 + "\n")
+
+    app.run(
+        host='0.0.0.0',
+        port=5005,
+        debug=Config.DEBUG
+    )
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: prompt prefix caching (PROMPT_CACHE_MODE off / system / cached)
+Runs the strategies in-process against fake_gemini_server.py and compares
+the recorded usage metadata and latency of the final generation call.
+The fake server adds --prefill-ms-per-1k of latency per 1000 uncached
+prompt tokens, so the latency column reflects the prefill savings.
+
+Usage:
+    python bench_prompt_cache.py --questions 40 --prefill-ms-per-1k 100
+"""
+import argparse
+import json
+import threading
+
+from google import genai
+from google.genai import types
+
+from config import Config
+from fake_gemini_server import create_server
+from load_test import TEST_QUESTIONS, percentile
+from qa_example_log import read_examples
+from rag_engine import RAGEngine
+
+MODES = ('off', 'system', 'cached')
+
+def load_questions(limit, examples_file=None):
+    """Questions of the Q&A examples (falls back to the load test questions)"""
+    try:
+        questions = [ex['question'] for ex in read_examples(examples_file)]
+    except (OSError, ValueError, KeyError):
+        questions = []
+    questions = questions or TEST_QUESTIONS
+    return [questions[i % len(questions)] for i in range(limit)]
+
+def bench_config(mode):
+    """Config for one run: fake store, no answer cache, given prompt cache mode"""
+    return type('BenchConfig', (Config,), {
+        'FILE_SEARCH_STORE_ID': Config.FILE_SEARCH_STORE_ID or 'fileSearchStores/bench',
+        'ANSWER_CACHE_ENABLED': False,
+        'INTENT_RECORD_LABELS': False,
+        'PROMPT_CACHE_MODE': mode,
+    })
+
+def run(client, strategy, mode, questions):
+    """Ask every question in a fresh session; return generation-call stats"""
+    engine = RAGEngine(bench_config(mode), strategy, client=client)
+    prompt_tokens, cached_tokens, latencies = [], [], []
+    errors = 0
+
+    for i, question in enumerate(questions):
+        result = engine.ask(question, f'bench-{strategy}-{mode}-{i}', trace=True)
+        if not result.get('success'):
+            errors += 1
+            continue
+        for span in result['trace']['spans']:
+            if span['kind'] == 'llm' and span['name'] == 'generation':
+                prompt_tokens.append(span['prompt_tokens'] or 0)
+                cached_tokens.append(span['cached_tokens'] or 0)
+                latencies.append(span['duration_ms'])
+
+    n = len(latencies) or 1
+    latencies.sort()
+    return {
+        'requests': len(questions),
+        'errors': errors,
+        'prompt_tokens': round(sum(prompt_tokens) / n, 1),
+        'cached_tokens': round(sum(cached_tokens) / n, 1),
+        'billed_uncached_tokens': round((sum(prompt_tokens) - sum(cached_tokens)) / n, 1),
+        'generation_p50_ms': percentile(latencies, 50),
+        'generation_mean_ms': round(sum(latencies) / n, 1),
+        'prompt_cache': engine.prompt_cache.stats() if engine.prompt_cache else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Prompt prefix caching benchmark (fake Gemini server)')
+    parser.add_argument('--strategies', default='plain,dynamic,few_shot')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='Fake Gemini base latency')
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=100.0,
+                        help='Fake latency per 1000 uncached prompt tokens')
+    parser.add_argument('--fake-port', type=int, default=8090)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    server = create_server('127.0.0.1', args.fake_port, args.latency_ms, 'fixed',
+                           prefill_ms_per_1k=args.prefill_ms_per_1k)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = genai.Client(
+        api_key='fake-key',
+        http_options=types.HttpOptions(base_url=f'http://127.0.0.1:{args.fake_port}')
+    )
+    questions = load_questions(args.questions)
+
+    print("=" * 90)
+    print(f"Prompt cache benchmark: {len(questions)} questions, base latency {args.latency_ms:.0f} ms, "
+          f"prefill {args.prefill_ms_per_1k:.0f} ms / 1k uncached tokens")
+    print("=" * 90)
+    print(f"  {'strategy':<10} {'mode':<8} {'prompt tok':>10} {'cached':>8} {'uncached':>9} "
+          f"{'p50 ms':>8} {'mean ms':>8} {'Δ uncached':>11}")
+
+    results = {}
+    try:
+        for strategy in args.strategies.split(','):
+            results[strategy] = {}
+            for mode in args.modes.split(','):
+                r = results[strategy][mode] = run(client, strategy, mode, questions)
+                baseline = results[strategy].get('off', r)['billed_uncached_tokens'] or 1
+                saving = 1 - r['billed_uncached_tokens'] / baseline
+                print(f"  {strategy:<10} {mode:<8} {r['prompt_tokens']:>10} {r['cached_tokens']:>8} "
+                      f"{r['billed_uncached_tokens']:>9} {r['generation_p50_ms']:>8} "
+                      f"{r['generation_mean_ms']:>8} {saving:>10.0%}")
+    finally:
+        server.shutdown()
+
+    if args.output:
+        report = {
+            'settings': {
+                'questions': len(questions),
+                'latency_ms': args.latency_ms,
+                'prefill_ms_per_1k': args.prefill_ms_per_1k,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
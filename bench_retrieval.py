@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: local retrieval (local_index.py) without any generation
+Runs every qa_examples question through the BM25, vector and hybrid (RRF)
+rankings and reports queries per second, latency and recall@k.
+
+A question counts as recalled at k when one of its top k chunks contains
+at least --min-overlap of the reference answer's tokens. Query embeddings
+are computed in one batch before timing, so QPS is the local search only.
+
+Usage:
+    python bench_retrieval.py --k 1,3,5,10
+    python bench_retrieval.py --no-vectors --output retrieval.json
+"""
+import argparse
+import json
+import time
+
+from load_test import percentile
+from local_index import INDEX_DIR, LocalIndex, embed_texts
+from qa_example_log import read_examples
+from text_normalize import tokenize
+
+def answer_coverage(chunk_text, reference):
+    """Share of the reference answer's distinct tokens found in a chunk"""
+    expected = set(tokenize(reference))
+    if not expected:
+        return 0.0
+    return len(expected & set(tokenize(chunk_text))) / len(expected)
+
+def run(index, examples, mode, vectors, ks, min_overlap, candidates, rrf_k, repeat):
+    """Search every question (repeat times); latency, QPS and recall@k"""
+    top_k = max(ks)
+    hits = {k: 0 for k in ks}
+    latencies = []
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i, example in enumerate(examples):
+            t0 = time.perf_counter()
+            index.search(example['question'], top_k, vectors[i] if vectors else None,
+                         mode=mode, candidates=candidates, rrf_k=rrf_k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    # Recall from the last pass (results are deterministic)
+    for i, example in enumerate(examples):
+        results = index.search(example['question'], top_k, vectors[i] if vectors else None,
+                               mode=mode, candidates=candidates, rrf_k=rrf_k)
+        first_hit = next((rank for rank, chunk in enumerate(results, 1)
+                          if answer_coverage(chunk['text'], example['answer']) >= min_overlap), None)
+        for k in ks:
+            if first_hit is not None and first_hit <= k:
+                hits[k] += 1
+
+    latencies.sort()
+    return {
+        'queries': len(latencies),
+        'qps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'recall': {f'@{k}': round(hits[k] / len(examples), 4) for k in ks},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Local retrieval benchmark (QPS, recall@k)')
+    parser.add_argument('--index', default=INDEX_DIR)
+    parser.add_argument('--examples', help='Examples file (default: qa_examples.jsonl, else qa_examples.json)')
+    parser.add_argument('--k', default='1,3,5,10', help='Cutoffs for recall@k')
+    parser.add_argument('--min-overlap', type=float, default=0.5,
+                        help='Share of reference answer tokens a chunk must contain to count as relevant')
+    parser.add_argument('--candidates', type=int, default=50, help='Per ranking, before fusion')
+    parser.add_argument('--rrf-k', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed passes over the questions')
+    parser.add_argument('--no-vectors', action='store_true', help='BM25 only (no embedding calls)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    ks = sorted(int(k) for k in args.k.split(','))
+    examples = [ex for ex in read_examples(args.examples) if ex.get('question') and ex.get('answer')]
+
+    t0 = time.perf_counter()
+    index = LocalIndex(args.index)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    vectors, embed_ms = None, None
+    if index.embeddings is not None and not args.no_vectors:
+        from config import Config
+        from gemini_client import create_gemini_client
+        t0 = time.perf_counter()
+        vectors = embed_texts(create_gemini_client(), Config.EMBEDDING_MODEL,
+                              [ex['question'] for ex in examples])
+        embed_ms = (time.perf_counter() - t0) * 1000
+
+    modes = ['bm25'] + (['vector', 'hybrid'] if vectors else [])
+
+    print("=" * 80)
+    print(f"Retrieval benchmark: {len(examples)} questions, {len(index)} chunks, "
+          f"index loaded in {load_ms:.0f} ms"
+          + (f", query embeddings {embed_ms:.0f} ms" if embed_ms is not None else ''))
+    print("=" * 80)
+    print(f"  {'mode':<8} {'QPS':>9} {'p50 ms':>8} {'p95 ms':>8}  " + '  '.join(f"{'R@' + str(k):>6}" for k in ks))
+
+    results = {}
+    for mode in modes:
+        r = results[mode] = run(index, examples, mode, vectors, ks, args.min_overlap,
+                                args.candidates, args.rrf_k, args.repeat)
+        print(f"  {mode:<8} {r['qps']:>9} {r['p50_ms']:>8} {r['p95_ms']:>8}  "
+              + '  '.join(f"{r['recall'][f'@{k}']:>6}" for k in ks))
+
+    if args.output:
+        report = {
+            'settings': {
+                'questions': len(examples),
+                'chunks': len(index),
+                'min_overlap': args.min_overlap,
+                'candidates': args.candidates,
+                'rrf_k': args.rrf_k,
+                'index_load_ms': round(load_ms, 1),
+                'query_embedding_ms': round(embed_ms, 1) if embed_ms is not None else None,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Exact-match index from standards codes to documents
+Questions naming a code ("ASTM E1105", "AAMA 2605", "CAN/ULC S702") get
+their candidate set with one dict lookup per code instead of a similarity
+search: the few-shot strategy answers from a matching example or picks
+its examples among them, the local retriever ranks only the chunks that
+contain the code.
+
+Keys are text_normalize.standard_codes(); an ASTM code with an edition
+year ('ASTM E1105-15') is also indexed under its base ('ASTM E1105').
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from text_normalize import standard_codes
+
+EDITION_RE = re.compile(r'^(ASTM [A-Z]\d+(?:\.\d+)?)-\d{2,4}$')
+
+def code_keys(text):
+    """Index keys of every code in a text (codes plus ASTM base designations)"""
+    keys = set(standard_codes(text))
+    for code in list(keys):
+        base = EDITION_RE.match(code)
+        if base:
+            keys.add(base.group(1))
+    return keys
+
+class CodeIndex:
+    """Inverted index code -> sorted document ids (int32 arrays)"""
+
+    def __init__(self, postings=None):
+        self.postings = postings or {}
+
+    def __len__(self):
+        return len(self.postings)
+
+    @classmethod
+    def build(cls, items):
+        """Index (doc id, text) pairs"""
+        postings = {}
+        for doc_id, text in items:
+            for key in code_keys(text):
+                postings.setdefault(key, []).append(doc_id)
+        return cls({key: np.unique(np.array(ids, dtype=np.int32)) for key, ids in postings.items()})
+
+    def lookup(self, codes):
+        """
+        Ids of the documents containing every known code of the question
+        (all of them, else any of them); None if no code is known
+        """
+        found = []
+        for code in codes:
+            if code not in self.postings:
+                base = EDITION_RE.match(code)
+                code = base.group(1) if base else code
+            if code in self.postings:
+                found.append(self.postings[code])
+        if not found:
+            return None
+        ids = found[0]
+        for other in found[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        if not len(ids):
+            ids = np.unique(np.concatenate(found))
+        return ids
+
+    def save(self, directory):
+        """codes.json (code list) + code_start.npy / code_ids.npy (postings)"""
+        codes = sorted(self.postings)
+        lengths = [len(self.postings[code]) for code in codes]
+        with open(os.path.join(directory, 'codes.json'), 'w', encoding='utf-8') as f:
+            json.dump(codes, f, ensure_ascii=False)
+        np.save(os.path.join(directory, 'code_start.npy'),
+                np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64))
+        np.save(os.path.join(directory, 'code_ids.npy'),
+                np.concatenate([self.postings[code] for code in codes]) if codes else np.zeros(0, np.int32))
+
+    @classmethod
+    def load(cls, directory):
+        """Index saved by save(); postings are views into the memory-mapped ids"""
+        with open(os.path.join(directory, 'codes.json'), 'r', encoding='utf-8') as f:
+            codes = json.load(f)
+        start = np.load(os.path.join(directory, 'code_start.npy'))
+        ids = np.load(os.path.join(directory, 'code_ids.npy'), mmap_mode='r').view(np.ndarray)
+        return cls({code: ids[start[i]:start[i + 1]] for i, code in enumerate(codes)})
+
+    def stats(self):
+        return {
+            'codes': len(self.postings),
+            'postings': int(sum(len(ids) for ids in self.postings.values())),
+        }
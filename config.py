@@ -15,12 +15,53 @@ class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     FILE_SEARCH_STORE_ID = os.getenv('FILE_SEARCH_STORE_ID')
 
+    # Override the Gemini API endpoint (e.g. http://localhost:8089 for fake_gemini_server.py)
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
+    # HTTP connection pool size for the async server mode (app_async.py)
+    GEMINI_MAX_CONNECTIONS = int(os.getenv('GEMINI_MAX_CONNECTIONS', '500'))
+
+    # Gemini call protection (rag_engine/resilience.py)
+    # Token bucket sized to the API quota (0 = unlimited); wait at most GEMINI_RATE_LIMIT_WAIT s for a slot
+    GEMINI_RATE_LIMIT_RPS = float(os.getenv('GEMINI_RATE_LIMIT_RPS', '0'))
+    GEMINI_RATE_LIMIT_BURST = int(os.getenv('GEMINI_RATE_LIMIT_BURST', '10'))
+    GEMINI_RATE_LIMIT_WAIT = float(os.getenv('GEMINI_RATE_LIMIT_WAIT', '10'))
+    # Jittered exponential retry on 429 / 5xx / connection errors
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', '0.5'))  # seconds
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', '8'))
+    # Circuit breaker: open after N consecutive failures (0 = off), probe again after GEMINI_BREAKER_RESET s
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+    GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+    # Identical in-flight requests share one upstream call
+    GEMINI_COALESCE = os.getenv('GEMINI_COALESCE', 'True').lower() == 'true'
+    # Concurrent identical standalone chat questions share one answer (whole strategy run)
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+
+    # Retrieval backend: 'file_search' (Gemini FileSearch tool) or 'local'
+    # (local_index.py: BM25 + embedding index of documents/, excerpts in the prompt)
+    RETRIEVAL_BACKEND = os.getenv('RETRIEVAL_BACKEND', 'file_search').lower()
+    LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', 'local_index')
+    LOCAL_INDEX_TOP_K = int(os.getenv('LOCAL_INDEX_TOP_K', '5'))            # Chunks in the prompt
+    LOCAL_INDEX_CANDIDATES = int(os.getenv('LOCAL_INDEX_CANDIDATES', '50'))  # Per ranking, before fusion
+    LOCAL_INDEX_RRF_K = int(os.getenv('LOCAL_INDEX_RRF_K', '60'))
+    # Embed the question for the vector ranking (one embedding call per retrieval)
+    LOCAL_INDEX_VECTORS = os.getenv('LOCAL_INDEX_VECTORS', 'True').lower() == 'true'
+    # Seconds between checks for a newly built index generation
+    LOCAL_INDEX_RELOAD_INTERVAL = float(os.getenv('LOCAL_INDEX_RELOAD_INTERVAL', '5'))
+    # Questions naming standards codes: excerpts from the chunks containing the codes (0 = off)
+    LOCAL_INDEX_CODE_TOP_K = int(os.getenv('LOCAL_INDEX_CODE_TOP_K', '3'))
+
     # Model Configuration
     MODEL_NAME = 'gemini-2.5-flash'  # or 'gemini-2.5-pro' for better quality
 
     # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+    PORT = int(os.getenv('PORT', '5001'))  # python -m rag_engine
+
+    # Answering strategy for python -m rag_engine (rag_engine/strategies):
+    # plain, dynamic, few_shot or graph. The app_*.py entry points pick their own.
+    RAG_STRATEGY = os.getenv('RAG_STRATEGY', 'plain').lower()
 
     # File Upload Configuration
     DOCUMENTS_FOLDER = 'documents'
@@ -32,10 +73,80 @@ class Config:
     TEMPERATURE = 0.1  # Very low for focused, deterministic responses
     MAX_OUTPUT_TOKENS = 2000  # Allow longer responses while examples guide conciseness
 
+    # Pipeline mode for app_improved.py: run intent analysis and retrieval concurrently,
+    # use default instructions if the analysis misses the deadline
+    PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'False').lower() == 'true'
+    ANALYSIS_DEADLINE_MS = int(os.getenv('ANALYSIS_DEADLINE_MS', '1500'))
+    PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '32'))
+
+    # Local intent classifier (intent_classifier.py): the LLM query analysis
+    # only runs when the classifier's confidence is below the threshold
+    INTENT_CLASSIFIER_ENABLED = os.getenv('INTENT_CLASSIFIER_ENABLED', 'True').lower() == 'true'
+    INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '0.8'))
+    INTENT_RECORD_LABELS = os.getenv('INTENT_RECORD_LABELS', 'True').lower() == 'true'
+
+    # Adaptive LangGraph workflow (app_langgraph.py)
+    # Fused: one FileSearch call retrieves and answers (instead of retrieve + generate)
+    GRAPH_FUSED_GENERATION = os.getenv('GRAPH_FUSED_GENERATION', 'True').lower() == 'true'
+    # Questions of at most this many words skip the LLM analysis (0 = only the local classifier decides)
+    GRAPH_CHEAP_MAX_WORDS = int(os.getenv('GRAPH_CHEAP_MAX_WORDS', '0'))
+    # Validation pass: 'always', 'never' or 'auto' (answers below the confidence,
+    # while the request is still inside the latency budget)
+    GRAPH_VALIDATION = os.getenv('GRAPH_VALIDATION', 'auto').lower()
+    GRAPH_VALIDATE_BELOW_CONFIDENCE = float(os.getenv('GRAPH_VALIDATE_BELOW_CONFIDENCE', '0.9'))
+    GRAPH_LATENCY_BUDGET_MS = int(os.getenv('GRAPH_LATENCY_BUDGET_MS', '6000'))
+
+    # Few-shot example index (app_with_examples.py)
+    EXAMPLE_INDEX_PATH = os.getenv('EXAMPLE_INDEX_PATH', 'qa_examples.index.npz')
+    # Match on text without diacritics (questions typed without tone marks)
+    EXAMPLE_INDEX_FOLD_DIACRITICS = os.getenv('EXAMPLE_INDEX_FOLD_DIACRITICS', 'True').lower() == 'true'
+    # Fast path for questions (almost) identical to an example, no Gemini call:
+    # 'off', 'curated' (the example's answer), 'cached' (a cached model answer for
+    # the example question) or 'auto' (cached model answer, else curated)
+    EXAMPLE_FAST_PATH = os.getenv('EXAMPLE_FAST_PATH', 'off').lower()
+    EXAMPLE_FAST_PATH_THRESHOLD = float(os.getenv('EXAMPLE_FAST_PATH_THRESHOLD', '0.9'))  # cosine similarity
+    # Lower threshold when the example question names exactly the question's standards codes (0 = off)
+    EXAMPLE_CODE_MATCH_THRESHOLD = float(os.getenv('EXAMPLE_CODE_MATCH_THRESHOLD', '0.8'))
+
+    # Static prompt instructions: 'off' (inline in the prompt), 'system' (sent as
+    # system_instruction) or 'cached' (system_instruction registered with Gemini
+    # context caching, refreshed PROMPT_CACHE_REFRESH_MARGIN seconds before the TTL ends)
+    PROMPT_CACHE_MODE = os.getenv('PROMPT_CACHE_MODE', 'off').lower()
+    PROMPT_CACHE_TTL = int(os.getenv('PROMPT_CACHE_TTL', '3600'))
+    PROMPT_CACHE_REFRESH_MARGIN = int(os.getenv('PROMPT_CACHE_REFRESH_MARGIN', '300'))
+
+    # Add the per-request trace block (node / Gemini call spans) to every /api/chat
+    # response; otherwise only when the request JSON has "trace": true
+    TRACE_RESPONSES = os.getenv('TRACE_RESPONSES', 'False').lower() == 'true'
+
+    # Session Storage Configuration
+    # 'memory': per-process LRU + TTL (single worker)
+    # 'sqlite': shared file, use with several gunicorn workers
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory').lower()
+    SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '10000'))
+    SESSION_TTL = int(os.getenv('SESSION_TTL', '3600'))  # idle seconds
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'chat_sessions.db')
+
+    # Answer Cache Configuration
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_MAX_SIZE = int(os.getenv('ANSWER_CACHE_MAX_SIZE', '1000'))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', '3600'))  # seconds
+    # Near-duplicate lookup by embedding similarity (one embedding call per cache miss)
+    ANSWER_CACHE_SEMANTIC = os.getenv('ANSWER_CACHE_SEMANTIC', 'False').lower() == 'true'
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', '0.95'))
+    EMBEDDING_MODEL = 'text-embedding-004'
+    # Cache warming (rag_engine/warmer.py): at startup and after upload scripts bump the
+    # store generation, answer the top questions (this process's traffic, then
+    # qa_examples.json) in the background and swap the new answers in when done
+    CACHE_WARM_ENABLED = os.getenv('CACHE_WARM_ENABLED', 'False').lower() == 'true'
+    CACHE_WARM_TOP_N = int(os.getenv('CACHE_WARM_TOP_N', '50'))
+    CACHE_WARM_CONCURRENCY = int(os.getenv('CACHE_WARM_CONCURRENCY', '4'))
+    CACHE_WARM_SOURCES = os.getenv('CACHE_WARM_SOURCES', 'traffic,examples')
+
     @staticmethod
     def validate():
         """Validate required configuration"""
         if not Config.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is not set in environment variables")
-        if not Config.FILE_SEARCH_STORE_ID:
+        if not Config.FILE_SEARCH_STORE_ID and Config.RETRIEVAL_BACKEND != 'local':
             raise ValueError("FILE_SEARCH_STORE_ID is not set. Run upload_document.py first.")
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Offline evaluation of the answer strategies against qa_examples.json
+Calls RAGEngine in-process with a thread pool (rate limited upstream) and
+scores every answer with cheap local metrics:
+    - token F1 vs the reference answer
+    - standards-code overlap (ASTM E331, AAMA 501.2, TCVN 2737:2023, ...)
+    - length ratio (answer words / reference words)
+
+Gemini responses are cached on disk keyed by a hash of the full request
+(model, prompt, system instruction, generation settings, store), so a
+re-run only calls the API for prompts that changed.
+
+Usage:
+    python eval_runner.py --strategies plain,dynamic,few_shot --workers 8 --rps 5
+    python eval_runner.py --limit 20 --output eval_results.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+from config import Config
+from qa_example_log import read_examples
+from rag_engine import RAGEngine
+from rag_engine.resilience import TokenBucket
+from text_normalize import standard_codes, tokenize
+
+CACHE_FILE = '.eval_cache.jsonl'
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def token_f1(answer, reference):
+    """Bag-of-words F1 between answer and reference (SQuAD style)"""
+    answer_tokens, reference_tokens = tokenize(answer), tokenize(reference)
+    if not answer_tokens or not reference_tokens:
+        return float(answer_tokens == reference_tokens)
+    remaining = {}
+    for token in reference_tokens:
+        remaining[token] = remaining.get(token, 0) + 1
+    common = 0
+    for token in answer_tokens:
+        if remaining.get(token):
+            remaining[token] -= 1
+            common += 1
+    if not common:
+        return 0.0
+    precision = common / len(answer_tokens)
+    recall = common / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def code_overlap(answer, reference):
+    """Precision/recall of the standards codes (None if the reference has none)"""
+    expected = standard_codes(reference)
+    if not expected:
+        return None, None
+    found = standard_codes(answer)
+    recall = len(found & expected) / len(expected)
+    precision = len(found & expected) / len(found) if found else 0.0
+    return precision, recall
+
+def score(answer, reference):
+    precision, recall = code_overlap(answer, reference)
+    reference_words = len(tokenize(reference)) or 1
+    return {
+        'token_f1': round(token_f1(answer, reference), 4),
+        'code_precision': round(precision, 4) if precision is not None else None,
+        'code_recall': round(recall, 4) if recall is not None else None,
+        'length_ratio': round(len(tokenize(answer)) / reference_words, 3),
+    }
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+# ============================================================================
+# UPSTREAM: RATE LIMIT + RESPONSE CACHE
+# ============================================================================
+
+class ResponseCache:
+    """
+    Gemini responses on disk (JSON Lines, append-only), keyed by request hash
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry['response']
+                    except (ValueError, KeyError):
+                        continue  # Torn last line after a crash
+
+    @staticmethod
+    def key(**request):
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return types.GenerateContentResponse.model_validate(data)
+
+    def put(self, key, response):
+        data = response.model_dump(mode='json', exclude_none=True)
+        with self.lock:
+            self.entries[key] = data
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'response': data}, ensure_ascii=False) + '\n')
+
+def wrap_generate(engine, cache, limiter):
+    """Route engine.generate through the response cache and the rate limiter"""
+    generate = engine.generate
+
+    def cached_generate(contents, file_search=True, temperature=None, max_output_tokens=None,
+                        system_instruction=None, call='generation'):
+        key = cache.key(
+            model=engine.config.MODEL_NAME,
+            store=engine.config.FILE_SEARCH_STORE_ID if file_search else None,
+            contents=contents,
+            system_instruction=system_instruction,
+            temperature=engine.config.TEMPERATURE if temperature is None else temperature,
+            max_output_tokens=max_output_tokens,
+        )
+        response = cache.get(key)
+        if response is None:
+            limiter.acquire()
+            response = generate(contents, file_search, temperature, max_output_tokens,
+                                system_instruction, call)
+            cache.put(key, response)
+        return response
+
+    engine.generate = cached_generate
+
+def hold_out_examples(strategy):
+    """
+    Few-shot: never show the example being evaluated (leave-one-out),
+    otherwise the reference answer is in the prompt
+    """
+    find_similar = strategy.find_similar_examples
+
+    def find_similar_examples(user_question, top_k=3):
+        examples = find_similar(user_question, top_k=top_k + 1)
+        return [ex for ex in examples if ex.get('question') != user_question][:top_k]
+
+    strategy.find_similar_examples = find_similar_examples
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def eval_config():
+    """Config for evaluation: no answer cache or example fast path, no label recording, in-memory sessions"""
+    return type('EvalConfig', (Config,), {
+        'ANSWER_CACHE_ENABLED': False,
+        'INTENT_RECORD_LABELS': False,
+        'SESSION_BACKEND': 'memory',
+        'EXAMPLE_FAST_PATH': 'off',  # Would answer with the reference itself
+    })
+
+def evaluate_strategy(strategy, examples, cache, limiter, workers):
+    """Answer every example (one fresh session each) and score it"""
+    engine = RAGEngine(eval_config(), strategy)
+    if not engine.client:
+        raise RuntimeError('Gemini client not initialized')
+    wrap_generate(engine, cache, limiter)
+    if hasattr(engine.strategy, 'find_similar_examples'):
+        hold_out_examples(engine.strategy)
+
+    def run(example):
+        start = time.perf_counter()
+        result = engine.ask(example['question'], f"eval-{strategy}-{example.get('id')}")
+        item = {
+            'id': example.get('id'),
+            'question': example['question'],
+            'success': bool(result.get('success')),
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+        if result.get('success'):
+            item['answer'] = result['answer']
+            item.update(score(result['answer'], example['answer']))
+        else:
+            item['error'] = result.get('error')
+        return item
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        items = list(pool.map(run, examples))
+
+    answered = [item for item in items if item['success']]
+    summary = {
+        'questions': len(items),
+        'errors': len(items) - len(answered),
+        'token_f1': mean(item['token_f1'] for item in answered),
+        'code_precision': mean(item['code_precision'] for item in answered),
+        'code_recall': mean(item['code_recall'] for item in answered),
+        'length_ratio': mean(item['length_ratio'] for item in answered),
+    }
+    return summary, items
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline evaluation against qa_examples.json')
+    parser.add_argument('--strategies', default='plain,dynamic,few_shot')
+    parser.add_argument('--examples', help='Examples file (default: qa_examples.jsonl, else qa_examples.json)')
+    parser.add_argument('--limit', type=int, help='Only the first N examples')
+    parser.add_argument('--workers', type=int, default=8, help='Questions answered concurrently')
+    parser.add_argument('--rps', type=float, default=5.0, help='Max Gemini calls per second (0 = unlimited)')
+    parser.add_argument('--cache-file', default=CACHE_FILE, help='Response cache (JSONL)')
+    parser.add_argument('--no-cache', action='store_true', help='Always call Gemini (cache is not read or written)')
+    parser.add_argument('--output', help='Write summary and per-question scores as JSON to this file')
+    args = parser.parse_args()
+
+    examples = [ex for ex in read_examples(args.examples) if ex.get('question') and ex.get('answer')]
+    if args.limit:
+        examples = examples[:args.limit]
+
+    cache = ResponseCache(None if args.no_cache else args.cache_file)
+    limiter = TokenBucket(args.rps, burst=max(1, int(args.rps)))
+
+    print("=" * 80)
+    print(f"Evaluation: {len(examples)} examples, {args.workers} workers, "
+          f"max {args.rps or '∞'} Gemini calls/s")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    summaries, details = {}, {}
+    for strategy in args.strategies.split(','):
+        strategy = strategy.strip()
+        t0 = time.perf_counter()
+        try:
+            summaries[strategy], details[strategy] = evaluate_strategy(
+                strategy, examples, cache, limiter, args.workers
+            )
+        except Exception as e:
+            summaries[strategy] = {'error': str(e)}
+            print(f"  {strategy:<10} ✗ {e}")
+            continue
+        s = summaries[strategy]
+        print(f"  {strategy:<10} F1={s['token_f1']}  codes P/R={s['code_precision']}/{s['code_recall']}  "
+              f"length={s['length_ratio']}  errors={s['errors']}  ({time.perf_counter() - t0:.1f}s)")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ Done in {elapsed:.1f}s (response cache: {cache.hits} hits, {cache.misses} misses)")
+
+    if args.output:
+        report = {
+            'settings': {
+                'examples': len(examples),
+                'workers': args.workers,
+                'rps': args.rps,
+                'model': Config.MODEL_NAME,
+            },
+            'elapsed_s': round(elapsed, 1),
+            'cache': {'hits': cache.hits, 'misses': cache.misses},
+            'summary': summaries,
+            'results': details,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+    if any('error' in s for s in summaries.values()):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Few-shot example retrieval index for app_with_examples.py
+Character n-gram TF-IDF over the example questions, stored as sparse
+postings in NumPy arrays. A query is scored against every example in one
+vectorized pass and the top K are taken with argpartition.
+
+The expensive part (n-gram counting) is kept per question and persisted,
+so a reload only processes new or changed questions and startup does not
+recompute anything that is already on disk.
+"""
+import hashlib
+import os
+from collections import Counter
+
+import numpy as np
+
+from text_normalize import fold_diacritics, normalize as normalize_text
+
+INDEX_FORMAT_VERSION = 2
+
+def question_key(question):
+    """Stable key of a question (reuse its n-gram counts across reloads)"""
+    return hashlib.sha1(normalize_text(question).encode('utf-8')).hexdigest()
+
+def char_ngrams(text, n_min=2, n_max=4, fold=False):
+    """
+    Character n-grams within word boundaries (like TF-IDF char_wb)
+    fold=True counts them on the text without diacritics.
+    """
+    counts = Counter()
+    for word in (fold_diacritics(text) if fold else normalize_text(text)).split():
+        padded = f' {word} '
+        for n in range(n_min, n_max + 1):
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    return counts
+
+class ExampleIndex:
+    """TF-IDF char n-gram index over Q&A example questions"""
+
+    def __init__(self, n_min=2, n_max=4, fold=False):
+        self.n_min = n_min
+        self.n_max = n_max
+        self.fold = fold
+        self.vocabulary = {}   # n-gram -> term id
+        self.doc_terms = {}    # question key -> (term ids, counts)
+        self._snapshot = None  # (examples, idf, postings...) swapped atomically
+
+    def __len__(self):
+        snapshot = self._snapshot
+        return len(snapshot['examples']) if snapshot else 0
+
+    def _count_terms(self, question):
+        counts = char_ngrams(question, self.n_min, self.n_max, self.fold)
+        term_ids = np.fromiter(
+            (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts),
+            dtype=np.int32, count=len(counts)
+        )
+        return term_ids, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+    def build(self, examples):
+        """
+        (Re)build the index for a list of {question, answer} examples
+        Only questions without cached n-gram counts are processed.
+        Returns {'added', 'reused', 'removed'} counts.
+        """
+        keys = [question_key(ex['question']) for ex in examples]
+        added = 0
+        for key, example in zip(keys, examples):
+            if key not in self.doc_terms:
+                self.doc_terms[key] = self._count_terms(example['question'])
+                added += 1
+
+        stale = set(self.doc_terms) - set(keys)
+        for key in stale:
+            del self.doc_terms[key]
+
+        num_docs = len(examples)
+        num_terms = len(self.vocabulary)
+        lengths = np.array([len(self.doc_terms[k][0]) for k in keys], dtype=np.int64)
+        if num_docs:
+            term_ids = np.concatenate([self.doc_terms[k][0] for k in keys])
+            counts = np.concatenate([self.doc_terms[k][1] for k in keys])
+        else:
+            term_ids = np.zeros(0, dtype=np.int32)
+            counts = np.zeros(0, dtype=np.float32)
+        doc_ids = np.repeat(np.arange(num_docs, dtype=np.int32), lengths)
+
+        # Smoothed IDF and sublinear TF, rows L2-normalized (cosine similarity)
+        df = np.bincount(term_ids, minlength=num_terms)
+        idf = (np.log((1.0 + num_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        weights = (1.0 + np.log(counts)) * idf[term_ids]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights * weights, minlength=num_docs))
+        norms[norms == 0] = 1.0
+        weights = (weights / norms[doc_ids]).astype(np.float32)
+
+        # Term-major postings: term -> (doc ids, weights)
+        order = np.argsort(term_ids, kind='stable')
+        self._snapshot = {
+            'examples': list(examples),
+            'idf': idf,
+            'term_start': np.concatenate(([0], np.cumsum(df))).astype(np.int64),
+            'posting_docs': doc_ids[order],
+            'posting_weights': weights[order],
+        }
+        return {'added': added, 'reused': num_docs - added, 'removed': len(stale)}
+
+    def search(self, question, top_k=3, candidates=None):
+        """
+        Return the top K examples as {**example, 'similarity': cosine}
+        candidates: positions in the examples list to choose from (e.g. the
+        examples sharing a standards code), None for all
+        """
+        snapshot = self._snapshot
+        if not snapshot or not snapshot['examples'] or top_k <= 0:
+            return []
+        examples = snapshot['examples']
+        idf = snapshot['idf']
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.int64)
+            candidates = candidates[candidates < len(examples)]
+            if not len(candidates):
+                return []
+
+        counts = char_ngrams(question, self.n_min, self.n_max, self.fold)
+        known = [(self.vocabulary.get(term), c) for term, c in counts.items()]
+        known = [(t, c) for t, c in known if t is not None and t < len(idf)]
+        if not known:
+            return []
+
+        term_ids = np.array([t for t, _ in known], dtype=np.int64)
+        query = (1.0 + np.log(np.array([c for _, c in known], dtype=np.float32))) * idf[term_ids]
+        query /= np.linalg.norm(query) or 1.0
+
+        # Gather the postings of every query term at once and accumulate per doc
+        starts = snapshot['term_start'][term_ids]
+        lengths = snapshot['term_start'][term_ids + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return []
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        scores = np.bincount(
+            snapshot['posting_docs'][offsets],
+            weights=snapshot['posting_weights'][offsets] * np.repeat(query, lengths),
+            minlength=len(examples)
+        )
+
+        pool = candidates if candidates is not None else np.arange(len(examples))
+        k = min(top_k, len(pool))
+        if k < len(pool):
+            top = pool[np.argpartition(-scores[pool], k - 1)[:k]]
+        else:
+            top = pool
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return [{**examples[i], 'similarity': float(scores[i])} for i in top]
+
+    def save(self, path):
+        """Persist vocabulary and per-question n-gram counts (atomic rename)"""
+        keys = list(self.doc_terms)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        lengths = [len(self.doc_terms[k][0]) for k in keys]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                params=np.array([INDEX_FORMAT_VERSION, self.n_min, self.n_max, int(self.fold)]),
+                vocabulary=np.array(terms, dtype=str),
+                keys=np.array(keys, dtype=str),
+                doc_start=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+                term_ids=np.concatenate([self.doc_terms[k][0] for k in keys]) if keys else np.zeros(0, np.int32),
+                counts=np.concatenate([self.doc_terms[k][1] for k in keys]) if keys else np.zeros(0, np.float32),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, n_min=2, n_max=4, fold=False):
+        """
+        Load persisted n-gram counts; call build(examples) afterwards
+        Returns an empty index if the file is missing or from another format.
+        """
+        index = cls(n_min, n_max, fold)
+        if not os.path.exists(path):
+            return index
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if list(data['params']) != [INDEX_FORMAT_VERSION, n_min, n_max, int(fold)]:
+                    return index
+                vocabulary = {term: i for i, term in enumerate(data['vocabulary'].tolist())}
+                doc_start = data['doc_start']
+                term_ids, counts = data['term_ids'], data['counts']
+                doc_terms = {}
+                for i, key in enumerate(data['keys'].tolist()):
+                    start, end = doc_start[i], doc_start[i + 1]
+                    doc_terms[key] = (term_ids[start:end], counts[start:end])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Ignoring unreadable example index {path}: {str(e)}")
+            return index
+
+        index.vocabulary = vocabulary
+        index.doc_terms = doc_terms
+        return index
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Gemini API, for load tests and benchmarks
+Answers generateContent / streamGenerateContent / embedContent with fake
+text, fake grounding metadata and a configurable latency distribution.
+Explicit context caches (cachedContents) are kept in memory; with
+--prefill-ms-per-1k, uncached prompt tokens add latency like a real prefill.
+
+Usage:
+    python fake_gemini_server.py --port 8089 --latency-ms 1500
+    GEMINI_BASE_URL=http://localhost:8089 python app.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL_PATH_RE = re.compile(r'^/[^/]+/models/(?P<model>[^:/]+):(?P<method>\w+)')
+JSON_FIELD_RE = re.compile(r'^\s*"(?P<key>\w+)":\s*(?P<value>.*?),?\s*$', re.MULTILINE)
+CACHE_PATH_RE = re.compile(r'^/[^/]+/cachedContents(?:/(?P<id>[^/?]+))?')
+
+FAKE_SOURCES = [
+    ('nd11.pdf', 'https://example.invalid/documents/nd11.pdf'),
+    ('sample_questions.xlsx', 'https://example.invalid/documents/sample_questions.xlsx'),
+    ('EBES_specification.pdf', 'https://example.invalid/documents/EBES_specification.pdf'),
+]
+
+FAKE_WORDS = (
+    'Hệ thống EBES phải tuân theo tiêu chuẩn ASTM E331 AAMA 501.2 và ASTM E1105 '
+    'về khả năng chống thấm nước của tường kính cửa sổ và cửa ngoài theo tài liệu'
+).split()
+
+class LatencyModel:
+    """Samples response latencies (seconds)"""
+
+    def __init__(self, mean_ms=1000.0, distribution='lognormal', sigma=0.5, ttft_ratio=0.2):
+        self.mean_ms = mean_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self.ttft_ratio = ttft_ratio
+
+    def sample(self):
+        if self.mean_ms <= 0:
+            return 0.0
+        if self.distribution == 'fixed':
+            ms = self.mean_ms
+        elif self.distribution == 'uniform':
+            ms = random.uniform(0.5 * self.mean_ms, 1.5 * self.mean_ms)
+        else:
+            # Lognormal with the requested mean: long right tail like a real API
+            mu = math.log(self.mean_ms) - self.sigma ** 2 / 2
+            ms = random.lognormvariate(mu, self.sigma)
+        return ms / 1000.0
+
+class FakeGeminiState:
+    """Shared server state: settings and request counters"""
+
+    def __init__(self, latency, error_rate=0.0, answer_words=60, stream_chunks=8, prefill_ms_per_1k=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.answer_words = answer_words
+        self.stream_chunks = stream_chunks
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.caches = {}  # cachedContents/<id> -> {'text', 'tools', 'expire_at'}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def begin(self, method):
+        with self.lock:
+            self.counts[method] = self.counts.get(method, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': dict(self.counts),
+                'total_requests': sum(self.counts.values()),
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+            self.max_in_flight = self.in_flight
+
+def prompt_text(body):
+    """Concatenate the text parts of a generateContent request (system instruction first)"""
+    contents = list(body.get('contents', []))
+    system = body.get('systemInstruction') or body.get('system_instruction')
+    if system:
+        contents.insert(0, system)
+    texts = []
+    for content in contents:
+        for part in content.get('parts', []):
+            if 'text' in part:
+                texts.append(part['text'])
+    return '\n'.join(texts)
+
+def count_tokens(text):
+    """Rough token estimate: ~4 characters per token"""
+    return max(1, len(text) // 4) if text else 0
+
+def fake_answer(prompt, num_words):
+    """Deterministic fake answer derived from the prompt"""
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(FAKE_WORDS) for _ in range(num_words)) + '.'
+
+def fake_json_answer(prompt, num_words):
+    """
+    Fake JSON answer for prompts that ask for JSON (query analysis, validation)
+    Fills the fields of the template in the prompt: "a/b/c" picks an option,
+    [...] becomes [], true/false stays a boolean, anything else gets fake text.
+    """
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    answer = {}
+    for match in JSON_FIELD_RE.finditer(prompt):
+        value = match.group('value').strip().strip('"')
+        if value.startswith('['):
+            answer[match.group('key')] = []
+        elif value.startswith('true'):
+            answer[match.group('key')] = True
+        elif '/' in value and ' ' not in value:
+            answer[match.group('key')] = rng.choice(value.split('/'))
+        else:
+            answer[match.group('key')] = ' '.join(rng.choice(FAKE_WORDS) for _ in range(min(num_words, 12)))
+    return json.dumps(answer, ensure_ascii=False)
+
+def wants_json(prompt):
+    return 'JSON' in prompt[-200:]
+
+def fake_grounding(prompt):
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[8:16], 16)
+    rng = random.Random(seed)
+    sources = rng.sample(FAKE_SOURCES, k=rng.randint(1, len(FAKE_SOURCES)))
+    return {
+        'groundingChunks': [
+            {'web': {'title': title, 'uri': uri}} for title, uri in sources
+        ]
+    }
+
+def usage_metadata(prompt, answer, cached_tokens=0):
+    # promptTokenCount includes the cached tokens, as in the real API
+    prompt_tokens = count_tokens(prompt) + cached_tokens
+    answer_tokens = count_tokens(answer) or 1
+    usage = {
+        'promptTokenCount': prompt_tokens,
+        'candidatesTokenCount': answer_tokens,
+        'totalTokenCount': prompt_tokens + answer_tokens
+    }
+    if cached_tokens:
+        usage['cachedContentTokenCount'] = cached_tokens
+    return usage
+
+def parse_ttl(ttl, default=3600.0):
+    """'3600s' → 3600.0"""
+    try:
+        return float(str(ttl).rstrip('s'))
+    except (TypeError, ValueError):
+        return default
+
+def format_time(epoch):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch)) + f".{int(epoch % 1 * 1e6):06d}Z"
+
+def generate_response(model, text, grounding=None, finish=True, usage=None):
+    candidate = {
+        'content': {'role': 'model', 'parts': [{'text': text}]},
+        'index': 0
+    }
+    if finish:
+        candidate['finishReason'] = 'STOP'
+    if grounding:
+        candidate['groundingMetadata'] = grounding
+
+    response = {'candidates': [candidate], 'modelVersion': model}
+    if usage:
+        response['usageMetadata'] = usage
+    return response
+
+def fake_embedding(text, dimensions=256):
+    """Deterministic bag-of-words embedding (similar texts → similar vectors)"""
+    vector = [0.0] * dimensions
+    for word in text.lower().split():
+        index = int(hashlib.md5(word.encode('utf-8')).hexdigest()[:8], 16) % dimensions
+        vector[index] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None  # FakeGeminiState, set by create_server
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        if self.path.startswith('/stats'):
+            self._send_json(200, self.state.stats())
+        else:
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length) if length else b''
+
+        if self.path.startswith('/reset'):
+            self.state.reset()
+            self._send_json(200, {'reset': True})
+            return
+
+        if CACHE_PATH_RE.match(self.path):
+            self._create_cache(json.loads(raw or b'{}'))
+            return
+
+        match = MODEL_PATH_RE.match(self.path)
+        if not match:
+            self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+            return
+
+        model, method = match.group('model'), match.group('method')
+        body = json.loads(raw or b'{}')
+
+        self.state.begin(method)
+        try:
+            if self.state.error_rate and random.random() < self.state.error_rate:
+                time.sleep(self.state.latency.sample() * 0.1)
+                self._send_json(503, {'error': {
+                    'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'
+                }})
+            elif method == 'generateContent':
+                self._generate(model, body)
+            elif method == 'streamGenerateContent':
+                self._stream_generate(model, body)
+            elif method in ('embedContent', 'batchEmbedContents'):
+                self._embed(method, body)
+            else:
+                self._send_json(404, {'error': {'code': 404, 'message': f'Unknown method {method}'}})
+        finally:
+            self.state.end()
+
+    def do_PATCH(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) if length else b'{}')
+        match = CACHE_PATH_RE.match(self.path)
+        name = f"cachedContents/{match.group('id')}" if match and match.group('id') else None
+
+        with self.state.lock:
+            entry = self.state.caches.get(name)
+            if entry and entry['expire_at'] > time.time():
+                entry['expire_at'] = time.time() + parse_ttl(body.get('ttl'))
+        if not entry:
+            self._send_json(404, {'error': {'code': 404, 'message': f'{name} not found', 'status': 'NOT_FOUND'}})
+            return
+        self.state.begin('cachedContents.patch')
+        self.state.end()
+        self._send_json(200, self._cache_resource(name, entry))
+
+    def do_DELETE(self):
+        match = CACHE_PATH_RE.match(self.path)
+        name = f"cachedContents/{match.group('id')}" if match and match.group('id') else None
+        with self.state.lock:
+            self.state.caches.pop(name, None)
+        self._send_json(200, {})
+
+    def _create_cache(self, body):
+        self.state.begin('cachedContents.create')
+        try:
+            name = f"cachedContents/{random.getrandbits(48):012x}"
+            entry = {
+                'text': prompt_text(body),
+                'tools': bool(body.get('tools')),
+                'model': body.get('model', ''),
+                'expire_at': time.time() + parse_ttl(body.get('ttl')),
+            }
+            with self.state.lock:
+                self.state.caches[name] = entry
+            self._send_json(200, self._cache_resource(name, entry))
+        finally:
+            self.state.end()
+
+    def _cache_resource(self, name, entry):
+        return {
+            'name': name,
+            'model': entry['model'],
+            'expireTime': format_time(entry['expire_at']),
+            'usageMetadata': {'totalTokenCount': count_tokens(entry['text'])}
+        }
+
+    def _resolve_cache(self, body):
+        """(cached text, cache has tools) for body['cachedContent'], or (None, False)"""
+        name = body.get('cachedContent') or body.get('cached_content')
+        if not name:
+            return None, False
+        with self.state.lock:
+            entry = self.state.caches.get(name)
+        if not entry or entry['expire_at'] <= time.time():
+            return None, False
+        return entry['text'], entry['tools']
+
+    def _prefill_seconds(self, prompt):
+        """Extra latency for the uncached prompt tokens"""
+        return self.state.prefill_ms_per_1k * count_tokens(prompt) / 1000.0 / 1000.0
+
+    def _generate(self, model, body):
+        prompt = prompt_text(body)
+        cached_text, cached_tools = self._resolve_cache(body)
+        if (body.get('cachedContent') or body.get('cached_content')) and cached_text is None:
+            self._send_json(404, {'error': {'code': 404, 'message': 'CachedContent not found', 'status': 'NOT_FOUND'}})
+            return
+        time.sleep(self.state.latency.sample() + self._prefill_seconds(prompt))
+
+        if wants_json(prompt):
+            answer = fake_json_answer(prompt, self.state.answer_words)
+        else:
+            answer = fake_answer((cached_text or '') + prompt, self.state.answer_words)
+        grounding = fake_grounding(prompt) if body.get('tools') or cached_tools else None
+        self._send_json(200, generate_response(
+            model, answer, grounding, usage=usage_metadata(prompt, answer, count_tokens(cached_text))
+        ))
+
+    def _stream_generate(self, model, body):
+        prompt = prompt_text(body)
+        cached_text, cached_tools = self._resolve_cache(body)
+        total = self.state.latency.sample() + self._prefill_seconds(prompt)
+        ttft = total * self.state.latency.ttft_ratio
+
+        words = fake_answer(prompt, self.state.answer_words).split(' ')
+        num_chunks = max(1, min(self.state.stream_chunks, len(words)))
+        size = math.ceil(len(words) / num_chunks)
+        chunks = [' '.join(words[i:i + size]) for i in range(0, len(words), size)]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        time.sleep(ttft)
+        for index, text in enumerate(chunks):
+            last = index == len(chunks) - 1
+            if index:
+                text = ' ' + text
+            payload = generate_response(
+                model, text,
+                grounding=fake_grounding(prompt) if last and (body.get('tools') or cached_tools) else None,
+                finish=last,
+                usage=usage_metadata(prompt, ' '.join(words), count_tokens(cached_text)) if last else None
+            )
+            self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\r\n\r\n".encode('utf-8'))
+            if not last:
+                time.sleep((total - ttft) / len(chunks))
+        self._write_chunk(b'')
+
+    def _embed(self, method, body):
+        time.sleep(self.state.latency.sample() * 0.05)  # Embeddings are much cheaper
+        if method == 'batchEmbedContents':
+            requests = body.get('requests', [])
+        else:
+            requests = [body]
+        embeddings = [
+            {'values': fake_embedding(prompt_text({'contents': [r.get('content', {})]}))}
+            for r in requests
+        ]
+        if method == 'batchEmbedContents':
+            self._send_json(200, {'embeddings': embeddings})
+        else:
+            self._send_json(200, {'embedding': embeddings[0]})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+def create_server(host='127.0.0.1', port=8089, latency_ms=1000.0, distribution='lognormal',
+                  error_rate=0.0, answer_words=60, stream_chunks=8, prefill_ms_per_1k=0.0):
+    """Create (but do not start) a fake Gemini server"""
+    state = FakeGeminiState(
+        LatencyModel(latency_ms, distribution),
+        error_rate=error_rate,
+        answer_words=answer_words,
+        stream_chunks=stream_chunks,
+        prefill_ms_per_1k=prefill_ms_per_1k
+    )
+    handler = type('Handler', (FakeGeminiHandler,), {'state': state})
+    return FakeGeminiServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Gemini API server for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=1000.0, help='Mean response latency')
+    parser.add_argument('--distribution', choices=['fixed', 'uniform', 'lognormal'], default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--answer-words', type=int, default=60)
+    parser.add_argument('--stream-chunks', type=int, default=8)
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=0.0,
+                        help='Extra latency per 1000 uncached prompt tokens')
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port, args.latency_ms, args.distribution,
+        args.error_rate, args.answer_words, args.stream_chunks, args.prefill_ms_per_1k
+    )
+    print(f"Fake Gemini server running at: http://{args.host}:{args.port}")
+    print(f"  Latency: {args.distribution}, mean {args.latency_ms:.0f} ms")
+    print(f"  Error rate: {args.error_rate:.0%}")
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
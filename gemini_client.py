@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Gemini client factory for Silkroad RAG Chatbot
+One place to configure the API endpoint and HTTP connection pool
+"""
+import httpx
+from google import genai
+from google.genai import types
+from config import Config
+
+def create_gemini_client(max_connections=None):
+    """
+    Create a genai.Client
+
+    GEMINI_BASE_URL points the client at another endpoint (e.g. the local
+    fake_gemini_server.py for load tests). max_connections sizes the HTTP
+    connection pool shared by client.models and client.aio.models.
+    """
+    http_options = {}
+
+    if Config.GEMINI_BASE_URL:
+        http_options['base_url'] = Config.GEMINI_BASE_URL
+
+    if max_connections:
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        http_options['client_args'] = {'limits': limits}
+        http_options['async_client_args'] = {'limits': limits}
+
+    return genai.Client(
+        api_key=Config.GEMINI_API_KEY,
+        http_options=types.HttpOptions(**http_options) if http_options else None
+    )
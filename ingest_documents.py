@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel PDF ingestion: parse and chunk the PDFs in documents/ locally
+Every PDF is split into page ranges (--pages-per-task) that worker
+processes parse and chunk. Pages are read one at a time (pypdf only parses
+a page when it is accessed), their text is normalized to NFC once, here,
+and the chunk records are written to a columnar file that
+local_index.py builds from. Each stage reports its throughput (pages/s,
+chunks/s) so ingestion jobs can be sized.
+
+Columns of the chunk file (.npz, written through a temp file + rename;
+the columns are spooled to disk while the workers run):
+    text          uint8, UTF-8 text of every chunk back to back
+    text_offsets  int64, byte offsets into text (chunks + 1)
+    source        int32, index into sources
+    page          int32, first page of the chunk
+    sources       file names
+
+Chunk windows do not cross page ranges: a range may end with one short
+chunk, so a smaller --pages-per-task trades a few more chunks for more
+parallelism on large files.
+
+Usage:
+    python ingest_documents.py --docs documents --workers 8
+    python local_index.py build --chunks document_chunks.npz
+"""
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import unicodedata
+import zipfile
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+CHUNKS_FILE = 'document_chunks.npz'
+PAGES_PER_TASK = 32
+
+# ============================================================================
+# CHUNKING
+# ============================================================================
+
+def chunk_pages(pages, chunk_words=200, overlap=40):
+    """
+    Yield (text, first page) windows of chunk_words words, overlapping by
+    overlap words; windows run across page breaks
+    """
+    step = max(1, chunk_words - overlap)
+    words, word_pages = [], []
+    emitted = False
+    for number, text in pages:
+        for word in text.split():
+            words.append(word)
+            word_pages.append(number)
+        while len(words) >= chunk_words:
+            yield ' '.join(words[:chunk_words]), word_pages[0]
+            del words[:step], word_pages[:step]
+            emitted = True
+    # The first `overlap` leftover words are already in the previous chunk
+    if words and (not emitted or len(words) > overlap):
+        yield ' '.join(words), word_pages[0]
+
+def parse_range(path, first, last, chunk_words=200, overlap=40):
+    """
+    Worker: parse pages [first, last) of a PDF and chunk them
+    Returns (chunks [(text, page)], pages, parse seconds, chunk seconds).
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    parse_s = 0.0
+
+    def pages():
+        nonlocal parse_s
+        for index in range(first, last):
+            t0 = time.perf_counter()
+            text = unicodedata.normalize('NFC', reader.pages[index].extract_text() or '')
+            parse_s += time.perf_counter() - t0
+            yield index + 1, text
+
+    t0 = time.perf_counter()
+    chunks = list(chunk_pages(pages(), chunk_words, overlap))
+    chunk_s = time.perf_counter() - t0 - parse_s
+    return chunks, last - first, parse_s, chunk_s
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def new_stats(workers):
+    return {'workers': workers, 'files': 0, 'pages': 0, 'chunks': 0, 'failed': 0,
+            'parse_s': 0.0, 'chunk_s': 0.0, 'write_s': 0.0, 'wall_s': 0.0}
+
+def plan_tasks(paths, pages_per_task, stats):
+    """(path, first page, last page) ranges of every readable PDF"""
+    from pypdf import PdfReader
+
+    for path in paths:
+        try:
+            count = len(PdfReader(path).pages)
+        except Exception as e:
+            stats['failed'] += 1
+            print(f"  ✗ {path.name}: {e}")
+            continue
+        stats['files'] += 1
+        for first in range(0, count, pages_per_task):
+            yield path, first, min(count, first + pages_per_task)
+
+def iter_chunks(paths, workers=None, chunk_words=200, overlap=40,
+                pages_per_task=PAGES_PER_TASK, stats=None):
+    """
+    Chunk records {text, source, page} of the PDFs, in file and page order
+    Page ranges run on a process pool, at most 2 * workers ranges ahead of
+    the consumer; stats (see new_stats) is updated as ranges complete.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = stats if stats is not None else new_stats(workers)
+    tasks = plan_tasks(paths, pages_per_task, stats)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def submit_next():
+            task = next(tasks, None)
+            if task is not None:
+                path, first, last = task
+                pending.append((task, pool.submit(parse_range, str(path), first, last, chunk_words, overlap)))
+            return task is not None
+
+        while len(pending) < 2 * workers and submit_next():
+            pass
+        while pending:
+            (path, first, last), future = pending.popleft()
+            submit_next()
+            try:
+                chunks, pages, parse_s, chunk_s = future.result()
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"  ✗ {path.name} pages {first + 1}-{last}: {e}")
+                continue
+            stats['pages'] += pages
+            stats['chunks'] += len(chunks)
+            stats['parse_s'] += parse_s
+            stats['chunk_s'] += chunk_s
+            for text, page in chunks:
+                yield {'text': text, 'source': path.name, 'page': page}
+    stats['wall_s'] = time.perf_counter() - start
+
+class _Column:
+    """One numeric column spooled to an anonymous temp file in blocks"""
+
+    def __init__(self, typecode, directory, block=65536):
+        self.values = array(typecode)
+        self.dtype = np.dtype(self.values.typecode)
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.block = block
+        self.count = 0
+
+    def append(self, value):
+        self.values.append(value)
+        self.count += 1
+        if len(self.values) >= self.block:
+            self.flush()
+
+    def flush(self):
+        self.values.tofile(self.file)
+        del self.values[:]
+
+def _write_member(archive, name, dtype, count, source):
+    """Stream count items of dtype from a file object into archive as name.npy"""
+    source.seek(0)
+    with archive.open(f"{name}.npy", 'w', force_zip64=True) as member:
+        np.lib.format.write_array_header_2_0(member, {
+            'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,),
+        })
+        shutil.copyfileobj(source, member, 1 << 20)
+
+def write_chunks(records, path=CHUNKS_FILE, stats=None):
+    """
+    Write chunk records to the columnar file; returns the number of chunks
+    Text and per-chunk columns are spooled to temp files as records arrive
+    and streamed into the .npz at the end, so memory stays flat whatever
+    the corpus size.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    write_s = 0.0
+    with tempfile.TemporaryFile(dir=directory) as text:
+        offsets, sources, pages = (_Column(code, directory) for code in 'qii')
+        source_ids, size = {}, 0
+        try:
+            offsets.append(0)
+            for record in records:
+                t0 = time.perf_counter()
+                size += text.write(record['text'].encode('utf-8'))
+                offsets.append(size)
+                sources.append(source_ids.setdefault(record['source'], len(source_ids)))
+                pages.append(int(record.get('page') or 0))
+                write_s += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            tmp_path = f"{path}.tmp"
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                _write_member(archive, 'text', np.dtype(np.uint8), size, text)
+                for name, column in (('text_offsets', offsets), ('source', sources), ('page', pages)):
+                    column.flush()
+                    _write_member(archive, name, column.dtype, column.count, column.file)
+                with archive.open('sources.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.array(sorted(source_ids, key=source_ids.get), dtype=str))
+            os.replace(tmp_path, path)
+        finally:
+            for column in (offsets, sources, pages):
+                column.file.close()
+    if stats is not None:
+        stats['write_s'] = write_s + time.perf_counter() - t0
+    return pages.count
+
+def _map_member(path, name):
+    """
+    Memory-map one uncompressed array of an .npz (np.savez and write_chunks()
+    store members without compression), without reading it into memory
+    """
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as archive:
+        info = archive.getinfo(f"{name}.npy")
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{path}: {name} is compressed, cannot map it")
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, _, dtype = read_header(f)
+        offset = f.tell()
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape).view(np.ndarray)
+
+def read_chunks(path=CHUNKS_FILE):
+    """
+    Chunk records {text, source, page} of a file written by write_chunks()
+    The text column is memory-mapped and decoded one chunk at a time.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        offsets, source, page = data['text_offsets'], data['source'], data['page']
+        sources = data['sources'].tolist()
+    text = _map_member(path, 'text')
+    for i in range(len(page)):
+        yield {
+            'text': text[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8'),
+            'source': sources[source[i]],
+            'page': int(page[i]),
+        }
+
+def print_throughput(stats):
+    """Per-stage throughput (parse and chunk are summed over the workers)"""
+    def rate(count, seconds):
+        return f"{count / seconds:,.0f}" if seconds else '-'
+
+    wall = stats['wall_s']
+    print(f"  parse   {stats['pages']:>8} pages   {stats['parse_s']:>7.1f} worker-s  "
+          f"{rate(stats['pages'], stats['parse_s']):>9} pages/s per worker")
+    print(f"  chunk   {stats['chunks']:>8} chunks  {stats['chunk_s']:>7.1f} worker-s  "
+          f"{rate(stats['chunks'], stats['chunk_s']):>9} chunks/s per worker")
+    if stats['write_s']:
+        print(f"  write   {stats['chunks']:>8} chunks  {stats['write_s']:>7.1f} s         "
+              f"{rate(stats['chunks'], stats['write_s']):>9} chunks/s")
+    print(f"  total   {stats['workers']} workers, {wall:.1f} s wall: "
+          f"{rate(stats['pages'], wall)} pages/s, {rate(stats['chunks'], wall)} chunks/s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Parse and chunk PDFs in parallel into a columnar chunk file')
+    parser.add_argument('--docs', default='documents', help='Folder with PDF files')
+    parser.add_argument('--pattern', default='*.pdf', help='Glob pattern inside --docs')
+    parser.add_argument('--out', default=CHUNKS_FILE)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--chunk-words', type=int, default=200)
+    parser.add_argument('--overlap', type=int, default=40)
+    parser.add_argument('--pages-per-task', type=int, default=PAGES_PER_TASK)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        print("✗ Error: pypdf not installed")
+        print("  Install: pip install pypdf")
+        sys.exit(1)
+
+    paths = sorted(Path(args.docs).glob(args.pattern))
+    if not paths:
+        print(f"✗ No files matching {args.pattern} found in '{args.docs}'")
+        sys.exit(1)
+
+    print(f"Ingesting {len(paths)} file(s) from {args.docs} ({args.workers} workers)...")
+    stats = new_stats(args.workers)
+    records = iter_chunks(paths, args.workers, args.chunk_words, args.overlap, args.pages_per_task, stats)
+    count = write_chunks(records, args.out, stats)
+    print(f"✓ {stats['files']} files, {stats['pages']} pages → {count} chunks in {args.out}"
+          + (f" ({stats['failed']} failed)" if stats['failed'] else ''))
+    print_throughput(stats)
+
+if __name__ == '__main__':
+    main()
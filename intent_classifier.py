@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Local query intent classifier for Silkroad RAG Chatbot
+Character n-gram softmax regression that emits the same JSON as the LLM
+query analysis (intent / scope / focus), so most questions skip that
+Gemini round trip. The LLM stays as a fallback for low-confidence cases.
+
+Usage:
+    python intent_classifier.py label   # Label qa_examples.json questions with the LLM analysis
+    python intent_classifier.py train   # Train intent_model.json from intent_labels.jsonl
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from text_normalize import normalize
+
+MODEL_FILE = 'intent_model.json'
+LABELS_FILE = 'intent_labels.jsonl'
+
+# Label sets of the analysis JSON used by app_improved.py
+HEADS = {
+    'intent': ['list_names', 'describe_property', 'explain_concept', 'compare', 'general'],
+    'scope': ['single', 'multiple'],
+    'focus': ['name', 'property', 'characteristic', 'example', 'all'],
+}
+
+DEFAULT_ANALYSIS = {'intent': 'general', 'scope': 'multiple', 'focus': 'all'}
+
+def normalize_label(head, value):
+    """Map LLM label variants onto the classifier label set"""
+    value = str(value or '').strip().lower()
+    aliases = {
+        'other': 'general',
+        'single_object': 'single',
+        'multiple_objects': 'multiple',
+        'name_only': 'name',
+        'specific_property': 'property',
+        'multiple_properties': 'characteristic',
+        'all_info': 'all',
+    }
+    value = aliases.get(value, value)
+    return value if value in HEADS[head] else DEFAULT_ANALYSIS[head]
+
+def extract_features(text, n_min=2, n_max=4):
+    """
+    Sparse L2-normalized features: character n-grams (within word
+    boundaries) plus whole words
+    """
+    words = normalize(text).split()
+    counts = Counter()
+
+    for word in words:
+        counts['w:' + word] += 1
+        padded = f' {word} '
+        for n in range(n_min, n_max + 1):
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {feature: value / norm for feature, value in counts.items()}
+
+def softmax(scores):
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+class SoftmaxHead:
+    """Multinomial logistic regression over sparse features"""
+
+    def __init__(self, classes, weights=None, bias=None):
+        self.classes = classes
+        self.weights = weights or {}   # feature -> [weight per class]
+        self.bias = bias or [0.0] * len(classes)
+
+    def scores(self, features):
+        scores = list(self.bias)
+        num_classes = len(self.classes)
+        for feature, value in features.items():
+            w = self.weights.get(feature)
+            if w is not None:
+                for c in range(num_classes):
+                    scores[c] += w[c] * value
+        return scores
+
+    def predict(self, features):
+        """Return (label, probability)"""
+        probs = softmax(self.scores(features))
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.classes[best], probs[best]
+
+    def fit(self, samples, labels, epochs=20, learning_rate=0.5, l2=1e-4, seed=42):
+        """Plain SGD on (features, label) pairs"""
+        num_classes = len(self.classes)
+        index = {label: i for i, label in enumerate(self.classes)}
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for i in order:
+                features, target = samples[i], index[labels[i]]
+                probs = softmax(self.scores(features))
+                grad = [p - (1.0 if c == target else 0.0) for c, p in enumerate(probs)]
+
+                for c in range(num_classes):
+                    self.bias[c] -= rate * grad[c]
+                for feature, value in features.items():
+                    w = self.weights.setdefault(feature, [0.0] * num_classes)
+                    for c in range(num_classes):
+                        w[c] -= rate * (grad[c] * value + l2 * w[c])
+
+    def to_dict(self):
+        # Drop near-zero weights to keep the model file small
+        weights = {
+            feature: [round(v, 5) for v in w]
+            for feature, w in self.weights.items()
+            if max(abs(v) for v in w) > 1e-4
+        }
+        return {'classes': self.classes, 'bias': self.bias, 'weights': weights}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['classes'], data['weights'], data['bias'])
+
+class IntentClassifier:
+    """One softmax head per analysis field, sharing the feature extraction"""
+
+    def __init__(self, heads=None, trained_at=None, num_samples=0):
+        self.heads = heads or {name: SoftmaxHead(classes) for name, classes in HEADS.items()}
+        self.trained_at = trained_at
+        self.num_samples = num_samples
+        self._fuse()
+
+    def _fuse(self):
+        """
+        Concatenate the weights of all heads per feature, so prediction is
+        one pass over the question's features instead of one per head
+        """
+        self._slices = []
+        self._bias = []
+        offset = 0
+        for name, head in self.heads.items():
+            size = len(head.classes)
+            self._slices.append((name, head.classes, offset, offset + size))
+            self._bias.extend(head.bias)
+            offset += size
+
+        features = set()
+        for head in self.heads.values():
+            features.update(head.weights)
+
+        self._weights = {}
+        for feature in features:
+            fused = []
+            for head in self.heads.values():
+                fused.extend(head.weights.get(feature) or [0.0] * len(head.classes))
+            self._weights[feature] = fused
+
+    def predict(self, question):
+        """
+        Return (analysis, confidence) where analysis has the same keys as
+        the LLM analysis and confidence is the probability of the intent
+        """
+        scores = list(self._bias)
+        weights = self._weights
+        for feature, value in extract_features(question).items():
+            w = weights.get(feature)
+            if w is not None:
+                scores = [s + x * value for s, x in zip(scores, w)]
+
+        analysis = {}
+        confidence = 0.0
+        for name, classes, start, end in self._slices:
+            probs = softmax(scores[start:end])
+            best = max(range(len(probs)), key=probs.__getitem__)
+            analysis[name] = classes[best]
+            if name == 'intent':
+                confidence = probs[best]
+
+        analysis['enhanced_query'] = question
+        return analysis, confidence
+
+    def fit(self, records, epochs=20):
+        """Train every head from label records ({question, intent, scope, focus})"""
+        samples = [extract_features(r['question']) for r in records]
+        for name, head in self.heads.items():
+            head.fit(samples, [normalize_label(name, r.get(name)) for r in records], epochs=epochs)
+        self.trained_at = datetime.now().isoformat()
+        self.num_samples = len(records)
+        self._fuse()
+
+    def save(self, path=MODEL_FILE):
+        data = {
+            'trained_at': self.trained_at,
+            'num_samples': self.num_samples,
+            'heads': {name: head.to_dict() for name, head in self.heads.items()},
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        heads = {name: SoftmaxHead.from_dict(head) for name, head in data['heads'].items()}
+        return cls(heads, data.get('trained_at'), data.get('num_samples', 0))
+
+def load_classifier(path=MODEL_FILE):
+    """Load the trained model, or None if it has not been trained yet"""
+    if not Path(path).exists():
+        print(f"⚠ Intent model not found ({path}) - using LLM query analysis")
+        print("  Run: python intent_classifier.py label && python intent_classifier.py train")
+        return None
+    try:
+        classifier = IntentClassifier.load(path)
+        print(f"✓ Loaded intent classifier ({classifier.num_samples} training samples)")
+        return classifier
+    except Exception as e:
+        print(f"✗ Error loading intent classifier: {str(e)}")
+        return None
+
+_labels_lock = threading.Lock()
+
+def record_label(question, analysis, source='llm', path=LABELS_FILE):
+    """Append an LLM analysis to the labelled history used for retraining"""
+    record = {
+        'question': question,
+        'intent': normalize_label('intent', analysis.get('intent')),
+        'scope': normalize_label('scope', analysis.get('scope')),
+        'focus': normalize_label('focus', analysis.get('focus')),
+        'source': source,
+        'timestamp': datetime.now().isoformat(),
+    }
+    try:
+        with _labels_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"Could not record intent label: {e}")
+
+def load_labels(path=LABELS_FILE):
+    """Read label records, keeping the latest label per question"""
+    records = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                records[record['question']] = record
+    return list(records.values())
+
+def to_langgraph_analysis(analysis):
+    """Expand an analysis into the richer schema used by app_langgraph.py"""
+    intent = analysis.get('intent', 'general')
+    focus = analysis.get('focus', 'all')
+    expected_length = {
+        'list_names': 'short',
+        'describe_property': 'short' if focus == 'name' else 'medium',
+        'explain_concept': 'medium',
+        'compare': 'long',
+    }.get(intent, 'medium')
+    should_include = {
+        'list_names': ['names'],
+        'describe_property': ['descriptions'],
+        'explain_concept': ['descriptions', 'examples'],
+        'compare': ['comparisons'],
+    }.get(intent, ['all'])
+    should_exclude = ['unrelated_info', 'extra_details']
+    if intent == 'list_names' or focus == 'name':
+        should_exclude.append('descriptions')
+    if focus == 'property':
+        should_exclude.append('other_properties')
+
+    return {
+        'intent': intent,
+        'scope': 'single_object' if analysis.get('scope') == 'single' else 'multiple_objects',
+        'focus': {
+            'name': 'name_only',
+            'property': 'specific_property',
+            'characteristic': 'multiple_properties',
+        }.get(focus, 'all_info'),
+        'expected_length': expected_length,
+        'should_include': should_include,
+        'should_exclude': should_exclude,
+        'enhanced_query': analysis.get('enhanced_query', ''),
+    }
+
+def label_examples(examples_file=None, labels_file=LABELS_FILE):
+    """
+    Bootstrap labels: run the LLM analysis over every example question
+    Only real LLM analyses are recorded (a failed call is skipped, not
+    labelled with the default), once per question.
+    """
+    from config import Config
+    from rag_engine import RAGEngine
+    strategy = RAGEngine(Config, 'dynamic').strategy
+    if not strategy.engine.client:
+        print("✗ Gemini client not initialized, no labels recorded")
+        return
+
+    from qa_example_log import read_examples
+    examples = read_examples(examples_file)
+
+    labelled = set()
+    if Path(labels_file).exists():
+        labelled = {r['question'] for r in load_labels(labels_file)}
+
+    todo = list(dict.fromkeys(ex['question'] for ex in examples if ex['question'] not in labelled))
+    print(f"Labelling {len(todo)} questions ({len(labelled)} already labelled)...")
+    failed = 0
+    for i, question in enumerate(todo, 1):
+        try:
+            analysis = strategy.llm_analysis(question)
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {question[:60]}: {e}")
+            continue
+        record_label(question, analysis, source='bootstrap', path=labels_file)
+        if i % 20 == 0:
+            print(f"  {i}/{len(todo)}")
+    print(f"✓ {len(todo) - failed} labels saved to {labels_file}"
+          + (f" ({failed} failed, run again to retry)" if failed else ''))
+
+def train(labels_file=LABELS_FILE, model_file=MODEL_FILE, epochs=20, holdout=0.2):
+    """Train, report holdout accuracy and latency, then refit on all data and save"""
+    records = load_labels(labels_file)
+    if len(records) < 10:
+        print(f"✗ Need at least 10 labelled questions, found {len(records)}")
+        return None
+
+    rng = random.Random(0)
+    rng.shuffle(records)
+    split = int(len(records) * (1 - holdout))
+    train_records, test_records = records[:split], records[split:]
+
+    classifier = IntentClassifier()
+    classifier.fit(train_records, epochs=epochs)
+
+    print(f"\nHoldout evaluation ({len(test_records)} questions):")
+    for name in HEADS:
+        correct = sum(
+            classifier.predict(r['question'])[0][name] == normalize_label(name, r.get(name))
+            for r in test_records
+        )
+        print(f"  {name:<7} accuracy: {correct / len(test_records):.1%}")
+
+    start = time.perf_counter()
+    for r in test_records:
+        classifier.predict(r['question'])
+    per_query_ms = (time.perf_counter() - start) * 1000 / len(test_records)
+    print(f"  latency: {per_query_ms:.3f} ms / question")
+
+    classifier = IntentClassifier()
+    classifier.fit(records, epochs=epochs)
+    classifier.save(model_file)
+    print(f"\n✓ Trained on {len(records)} questions, saved to {model_file}")
+    return classifier
+
+def main():
+    parser = argparse.ArgumentParser(description='Local query intent classifier')
+    parser.add_argument('command', choices=['label', 'train'])
+    parser.add_argument('--examples', help='Examples file (default: qa_examples.jsonl, else qa_examples.json)')
+    parser.add_argument('--labels', default=LABELS_FILE)
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--epochs', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'label':
+        label_examples(args.examples, args.labels)
+    else:
+        if not train(args.labels, args.model, args.epochs):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,98 +1,118 @@
 # -*- coding: utf-8 -*-
 """
 Load Q&A examples from Excel file for few-shot learning
+Sheets are read row by row (openpyxl read-only mode) and streamed into
+qa_examples.jsonl (qa_example_log.py): only new or changed pairs are
+appended, so reloads are incremental and memory stays flat however large
+the workbook grows.
+
+Usage:
+    python load_qa_examples.py                          # the only .xlsx found
+    python load_qa_examples.py --file documents/sample_questions.xlsx --sheet "Q&A"
 """
+import argparse
+import itertools
 import sys
 import io
-import pandas as pd
 from pathlib import Path
 import json
 
+from qa_example_log import EXAMPLES_LOG_FILE, QAExampleLog
+from text_normalize import normalize
+
 # Fix encoding
 if sys.stdout.encoding != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def load_qa_from_excel(file_path):
+QUESTION_HEADERS = ['question', 'câu hỏi', 'query', 'questions', 'q']
+ANSWER_HEADERS = ['answer', 'câu trả lời', 'response', 'answers', 'a']
+
+def find_column(header, names, exclude=None):
+    """Index of the first header cell matching one of names (None if none)"""
+    for i, cell in enumerate(header):
+        if cell is None or i == exclude:
+            continue
+        text = normalize(cell)
+        # One-letter names ('q', 'a') only match the whole cell
+        if any(text == name if len(name) == 1 else name in text for name in names):
+            return i
+    return None
+
+def iter_qa_rows(file_path, sheets=None, question_col=None, answer_col=None):
     """
-    Load Q&A pairs from Excel file
-    Expected columns: Question, Answer (hoặc tương tự)
+    Yield (question, answer) pairs from an Excel file, one row at a time
+    Every sheet (or only the given ones) whose first non-empty row has
+    question / answer headers is read; other sheets are skipped.
     """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
     try:
-        # Try to read Excel file - specifically from 'Q&A' sheet if it exists
-        xl = pd.ExcelFile(file_path)
-        if 'Q&A' in xl.sheet_names:
-            df = pd.read_excel(file_path, sheet_name='Q&A')
-            print(f"✓ Loading from sheet: 'Q&A'")
-        else:
-            df = pd.read_excel(file_path)
-            print(f"✓ Loading from default sheet")
-
-        print(f"✓ Loaded Excel file: {file_path}")
-        print(f"  Columns: {list(df.columns)}")
-        print(f"  Rows: {len(df)}")
-
-        # Try to identify Q&A columns
-        possible_q_cols = ['question', 'câu hỏi', 'q', 'query', 'questions']
-        possible_a_cols = ['answer', 'câu trả lời', 'a', 'response', 'answers']
-
-        q_col = None
-        a_col = None
-
-        # Find question column
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            if any(p in col_lower for p in possible_q_cols):
-                q_col = col
-                break
-
-        # Find answer column
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            if any(p in col_lower for p in possible_a_cols):
-                a_col = col
-                break
-
-        if not q_col or not a_col:
-            print("\n⚠ Warning: Cannot auto-detect Q&A columns")
-            print(f"  Available columns: {list(df.columns)}")
-            print("\n  Please specify column names:")
-            q_col = input(f"  Question column name [{df.columns[0]}]: ").strip() or df.columns[0]
-            a_col = input(f"  Answer column name [{df.columns[1] if len(df.columns) > 1 else 'answer'}]: ").strip()
-            if not a_col and len(df.columns) > 1:
-                a_col = df.columns[1]
-
-        print(f"\n✓ Using columns:")
-        print(f"  Question: {q_col}")
-        print(f"  Answer: {a_col}")
-
-        # Extract Q&A pairs
-        qa_pairs = []
-        for idx, row in df.iterrows():
-            question = str(row[q_col]).strip() if pd.notna(row[q_col]) else ""
-            answer = str(row[a_col]).strip() if pd.notna(row[a_col]) else ""
-
-            if question and answer:  # Skip empty rows
-                qa_pairs.append({
-                    'id': idx + 1,
-                    'question': question,
-                    'answer': answer
-                })
-
-        print(f"\n✓ Extracted {len(qa_pairs)} Q&A pairs")
-
-        return qa_pairs
+        for sheet in workbook.worksheets:
+            if sheets and sheet.title not in sheets:
+                continue
+            rows = sheet.iter_rows(values_only=True)
+            header = next((row for row in rows if any(cell is not None for cell in row)), None)
+            if header is None:
+                continue
+
+            headers = [str(cell).strip() if cell is not None else '' for cell in header]
+            q_idx = headers.index(question_col) if question_col in headers else find_column(header, QUESTION_HEADERS)
+            a_idx = headers.index(answer_col) if answer_col in headers else find_column(header, ANSWER_HEADERS, q_idx)
+            if q_idx is None or a_idx is None:
+                print(f"⚠ Sheet '{sheet.title}': no question/answer columns in {[h for h in headers if h]}, skipped")
+                continue
+            print(f"✓ Sheet '{sheet.title}': question = '{headers[q_idx]}', answer = '{headers[a_idx]}'")
+
+            count = 0
+            for row in rows:
+                question = row[q_idx] if q_idx < len(row) else None
+                answer = row[a_idx] if a_idx < len(row) else None
+                question = str(question).strip() if question is not None else ''
+                answer = str(answer).strip() if answer is not None else ''
+                if question and answer:  # Skip empty rows
+                    count += 1
+                    yield question, answer
+            print(f"  {count} Q&A pairs")
+    finally:
+        workbook.close()
+
+def load_qa_from_excel(file_path, output_file=EXAMPLES_LOG_FILE, sheets=None,
+                       question_col=None, answer_col=None):
+    """
+    Stream the Q&A pairs of an Excel file into the examples log
+    Returns the change counts of QAExampleLog.sync (None on error).
+    """
+    try:
+        log = QAExampleLog(output_file)
+        print(f"✓ Reading Excel file: {file_path}")
+        changes = log.sync(iter_qa_rows(file_path, sheets, question_col, answer_col), source=str(file_path))
+        print(f"\n✓ {output_file}: {changes['added']} added, {changes['changed']} changed, "
+              f"{changes['unchanged']} unchanged, {changes['removed']} removed"
+              + (f", {changes['duplicates']} duplicate questions skipped" if changes['duplicates'] else ''))
+        return changes
 
     except Exception as e:
         print(f"\n✗ Error loading Excel: {str(e)}")
         import traceback
         traceback.print_exc()
-        return []
+        return None
 
 def save_qa_to_json(qa_pairs, output_file='qa_examples.json'):
-    """Save Q&A pairs to JSON for easy loading"""
+    """
+    Export Q&A pairs as one JSON array (for tools that want a plain file)
+    qa_pairs may be any iterable; pairs are written one at a time, with the
+    same layout as json.dump(..., indent=2).
+    """
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(qa_pairs, f, ensure_ascii=False, indent=2)
+            f.write('[')
+            count = 0
+            for pair in qa_pairs:
+                item = json.dumps(pair, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+                f.write(f"{',' if count else ''}\n  {item}")
+                count += 1
+            f.write('\n]' if count else ']')
         print(f"\n✓ Saved to {output_file}")
         return True
     except Exception as e:
@@ -101,89 +121,133 @@ def save_qa_to_json(qa_pairs, output_file='qa_examples.json'):
 
 def find_similar_questions(user_question, qa_pairs, top_k=3):
     """
-    Find most similar questions using simple string matching
-    For better results, use embeddings (implement later if needed)
+    Find most similar questions with the same index as app_with_examples.py
+    (char n-gram TF-IDF cosine similarity)
     """
-    from difflib import SequenceMatcher
-
-    def similarity(q1, q2):
-        """Calculate similarity between two questions"""
-        return SequenceMatcher(None, q1.lower(), q2.lower()).ratio()
-
-    # Calculate similarity scores
-    scored_pairs = []
-    for pair in qa_pairs:
-        score = similarity(user_question, pair['question'])
-        scored_pairs.append({
-            **pair,
-            'similarity': score
-        })
+    from example_index import ExampleIndex
 
-    # Sort by similarity
-    scored_pairs.sort(key=lambda x: x['similarity'], reverse=True)
+    index = ExampleIndex()
+    index.build(qa_pairs)
+    return index.search(user_question, top_k=top_k)
 
-    # Return top K
-    return scored_pairs[:top_k]
-
-def preview_qa_pairs(qa_pairs, num=5):
+def code_summary(qa_pairs, top=10):
+    """
+    Build the standards code index the apps build at load time (code_index.py)
+    and show which codes the examples cover; qa_pairs is consumed as a stream
+    """
+    from code_index import CodeIndex
+
+    total = 0
+
+    def items():
+        nonlocal total
+        for i, pair in enumerate(qa_pairs):
+            total += 1
+            yield i, f"{pair['question']}\n{pair['answer']}"
+
+    index = CodeIndex.build(items())
+    covered = set()
+    for ids in index.postings.values():
+        covered.update(ids.tolist())
+    print(f"\n✓ Standards codes: {len(index)} codes in {len(covered)} of {total} examples")
+    most_common = sorted(index.postings.items(), key=lambda item: (-len(item[1]), item[0]))[:top]
+    if most_common:
+        print("  " + ", ".join(f"{code} ({len(ids)})" for code, ids in most_common))
+    return index
+
+def preview_qa_pairs(qa_pairs, num=5, total=None):
     """Preview first N Q&A pairs"""
+    if total is None:
+        total = len(qa_pairs)
+    qa_pairs = list(itertools.islice(qa_pairs, num))
     print(f"\n{'=' * 80}")
-    print(f"Preview of Q&A Examples (showing {min(num, len(qa_pairs))} of {len(qa_pairs)})")
+    print(f"Preview of Q&A Examples (showing {len(qa_pairs)} of {total})")
     print(f"{'=' * 80}\n")
 
-    for i, pair in enumerate(qa_pairs[:num], 1):
+    for i, pair in enumerate(qa_pairs, 1):
         print(f"{i}. Q: {pair['question']}")
         print(f"   A: {pair['answer'][:100]}{'...' if len(pair['answer']) > 100 else ''}")
         print()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load Q&A examples from Excel into qa_examples.jsonl')
+    parser.add_argument('--file', help='Excel file (default: the only .xlsx found)')
+    parser.add_argument('--sheet', action='append', help='Only this sheet (repeatable; default: every Q&A sheet)')
+    parser.add_argument('--question-col', help='Question column header (default: auto-detect)')
+    parser.add_argument('--answer-col', help='Answer column header (default: auto-detect)')
+    parser.add_argument('--output', default=EXAMPLES_LOG_FILE, help='Examples log (JSONL)')
+    parser.add_argument('--export-json', metavar='PATH', help='Also write all examples as one JSON array')
+    parser.add_argument('--no-test', action='store_true', help='Skip the interactive similarity test')
+    return parser.parse_args()
+
 def main():
     """Main function"""
+    args = parse_args()
     print("=" * 80)
     print("Q&A Examples Loader")
     print("=" * 80)
 
-    # Check if sample_questions.xlsx exists
-    xlsx_files = list(Path('.').glob('*.xlsx')) + list(Path('documents').glob('*.xlsx'))
-
-    if not xlsx_files:
-        print("\n✗ No .xlsx files found")
-        print("  Please add sample_questions.xlsx to the project folder")
-        return
-
-    print(f"\nFound {len(xlsx_files)} Excel file(s):")
-    for i, f in enumerate(xlsx_files, 1):
-        print(f"  {i}. {f}")
-
-    # Select file
-    if len(xlsx_files) == 1:
-        selected_file = xlsx_files[0]
-        print(f"\n✓ Using: {selected_file}")
+    if args.file:
+        selected_file = Path(args.file)
     else:
-        choice = int(input("\nSelect file number: ").strip()) - 1
-        selected_file = xlsx_files[choice]
+        # Check if sample_questions.xlsx exists (skip Excel lock files ~$name.xlsx)
+        xlsx_files = [
+            f for f in list(Path('.').glob('*.xlsx')) + list(Path('documents').glob('*.xlsx'))
+            if not f.name.startswith('~$')
+        ]
+
+        if not xlsx_files:
+            print("\n✗ No .xlsx files found")
+            print("  Please add sample_questions.xlsx to the project folder")
+            return
+
+        print(f"\nFound {len(xlsx_files)} Excel file(s):")
+        for i, f in enumerate(xlsx_files, 1):
+            print(f"  {i}. {f}")
+
+        # Select file
+        if len(xlsx_files) == 1:
+            selected_file = xlsx_files[0]
+            print(f"\n✓ Using: {selected_file}")
+        else:
+            choice = int(input("\nSelect file number: ").strip()) - 1
+            selected_file = xlsx_files[choice]
 
-    # Load Q&A pairs
-    qa_pairs = load_qa_from_excel(selected_file)
+    # Stream new / changed Q&A pairs into the log
+    changes = load_qa_from_excel(selected_file, args.output, args.sheet, args.question_col, args.answer_col)
+    if changes is None:
+        return
 
-    if not qa_pairs:
+    log = QAExampleLog(args.output)
+    if not len(log):
         print("\n✗ No Q&A pairs loaded")
         return
 
-    # Preview
-    preview_qa_pairs(qa_pairs)
+    # Preview (reads only the first lines back)
+    preview_qa_pairs(log.records(), total=len(log))
 
-    # Save to JSON
-    save_qa_to_json(qa_pairs)
+    # Both stream the log: memory does not grow with the number of examples
+    code_index = code_summary(log.iter_examples())
 
-    # Test similarity search
-    print("=" * 80)
-    print("Test Similarity Search")
-    print("=" * 80)
+    if args.export_json:
+        save_qa_to_json(log.iter_examples(), args.export_json)
 
-    test_question = input("\nEnter a test question (or press Enter to skip): ").strip()
+    # Test similarity search
+    test_question = ''
+    if not args.no_test:
+        print("=" * 80)
+        print("Test Similarity Search")
+        print("=" * 80)
+        test_question = input("\nEnter a test question (or press Enter to skip): ").strip()
 
     if test_question:
-        similar = find_similar_questions(test_question, qa_pairs, top_k=3)
+        from text_normalize import standard_codes
+
+        codes = standard_codes(test_question)
+        matched = code_index.lookup(codes) if codes else None
+        if matched is not None:
+            print(f"\nStandards codes {', '.join(sorted(codes))}: {len(matched)} example(s) mention them")
+        similar = find_similar_questions(test_question, log.examples(), top_k=3)
 
         print(f"\nTop 3 similar questions:")
         for i, pair in enumerate(similar, 1):
@@ -194,20 +258,19 @@ def main():
     print("\n" + "=" * 80)
     print("Summary")
     print("=" * 80)
-    print(f"✓ Loaded {len(qa_pairs)} Q&A pairs")
-    print(f"✓ Saved to qa_examples.json")
+    print(f"✓ {len(log)} Q&A pairs in {args.output}")
     print("\nNext steps:")
-    print("  1. Use qa_examples.json in chatbot for few-shot learning")
+    print(f"  1. Restart the chatbot or POST /api/reload-examples to use {args.output}")
     print("  2. Or upload xlsx to FileSearch store")
     print("=" * 80)
 
 if __name__ == '__main__':
-    # Check pandas installed
+    # Check openpyxl installed
     try:
-        import pandas as pd
+        import openpyxl  # noqa: F401
     except ImportError:
-        print("✗ Error: pandas not installed")
-        print("  Install: pip install pandas openpyxl")
+        print("✗ Error: openpyxl not installed")
+        print("  Install: pip install openpyxl")
         sys.exit(1)
 
     main()
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Load test / benchmark harness for every app variant
+(app.py, app_improved.py, app_with_examples.py, app_langgraph.py, app_async.py)
+All run against fake_gemini_server.py, so no API key or quota is needed.
+Reports RPS, p50/p95/p99, error rate, memory growth and upstream Gemini calls
+per request as JSON; --baseline compares against an earlier report.
+
+Usage:
+    python load_test.py --concurrency 200 --requests 1000 --latency-ms 1500
+    python load_test.py --targets sync,improved --output new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import http.cookiejar
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from fake_gemini_server import create_server
+
+TEST_QUESTIONS = [
+    "Hệ thống EBES cần tuân theo những tiêu chuẩn nào để kiểm tra khả năng chống thấm nước?",
+    "Lớp phủ nhôm dùng cho mặt dựng có yêu cầu kỹ thuật cụ thể nào không?",
+    "Các tiêu chuẩn kiểm tra khả năng chịu gió và độ kín khí của tường kính?",
+    "What standards apply to water penetration testing of curtain walls?",
+]
+
+def gunicorn_target(module):
+    """Command for a Flask app variant: gunicorn sync worker with a thread pool"""
+    return lambda port, args: [
+        sys.executable, '-m', 'gunicorn', '-w', '1', '--threads', str(args.sync_threads),
+        '--timeout', '300', '-b', f'127.0.0.1:{port}', f'{module}:app'
+    ]
+
+TARGETS = {
+    # Current production setup (plain strategy)
+    'sync': gunicorn_target('app'),
+    'improved': gunicorn_target('app_improved'),
+    'examples': gunicorn_target('app_with_examples'),
+    'langgraph': gunicorn_target('app_langgraph'),
+    # Async mode: one event loop, one shared Gemini connection pool
+    'async': lambda port, args: [
+        sys.executable, '-m', 'hypercorn', '--bind', f'127.0.0.1:{port}', 'app_async:app'
+    ],
+}
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, errors, elapsed):
+    """Latency/throughput summary (latencies in seconds)"""
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    ms = lambda v: round(v * 1000, 1) if v is not None else None
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+async def run_load(base_url, concurrency, num_requests, questions=TEST_QUESTIONS,
+                   path='/api/chat', timeout=300.0, unique=False):
+    """
+    Send num_requests chat requests with at most `concurrency` in flight
+    Cookies are not kept, so every request is a new session. unique=True
+    makes every question distinct (no answer sharing between requests).
+    """
+    no_cookies = http.cookiejar.CookieJar(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout,
+                                 cookies=no_cookies) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                question = questions[i % len(questions)]
+                if unique:
+                    question = f"{question} (#{i})"
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json={'message': question})
+                    ok = response.status_code == 200 and response.json().get('success')
+                except (httpx.HTTPError, ValueError):
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_requests)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, errors, elapsed)
+
+# Metrics where a higher value is a regression
+REGRESSION_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'error_rate', 'rss_growth_kb')
+
+def rss_kb(pid):
+    """
+    Resident memory (KB) of a process and its children, e.g. gunicorn master
+    plus worker. Reads /proc, so it returns None where that is not available.
+    """
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            total = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            children = f.read().split()
+    except (OSError, StopIteration, ValueError):
+        return None
+    for child in children:
+        total += rss_kb(int(child)) or 0
+    return total
+
+class MemorySampler:
+    """Polls the RSS of a server process in the background; keeps the peak"""
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = rss_kb(pid)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            value = rss_kb(self.pid)
+            if value is not None:
+                self.peak_kb = max(self.peak_kb or 0, value)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def start_fake_gemini(port, latency_ms, distribution, error_rate=0.0):
+    """Run the fake Gemini server in a background thread"""
+    server = create_server('127.0.0.1', port, latency_ms, distribution, error_rate=error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def app_env(fake_port):
+    """Environment for app subprocesses: fake upstream, cache off"""
+    env = dict(os.environ)
+    env.update({
+        'GEMINI_API_KEY': 'fake-key',
+        'FILE_SEARCH_STORE_ID': 'fileSearchStores/load-test',
+        'GEMINI_BASE_URL': f'http://127.0.0.1:{fake_port}',
+        'ANSWER_CACHE_ENABLED': 'False',
+        'INTENT_RECORD_LABELS': 'False',
+        'FLASK_DEBUG': 'False',
+        'PYTHONIOENCODING': 'utf-8',
+    })
+    return env
+
+def start_app(cmd, env, port, startup_timeout=30.0):
+    """Start an app server subprocess and wait until /api/health answers"""
+    process = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup: {' '.join(cmd)}")
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/api/health', timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Server did not start within {startup_timeout}s: {' '.join(cmd)}")
+
+def stop_app(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def run_target(name, args, env, fake_state):
+    """Start one app variant, warm it up, load it and collect memory / upstream stats"""
+    base_url = f'http://127.0.0.1:{args.app_port}'
+    process = start_app(TARGETS[name](args.app_port, args), env, args.app_port)
+    try:
+        if args.warmup:
+            asyncio.run(run_load(base_url, min(args.concurrency, args.warmup), args.warmup))
+        fake_state.reset()
+        rss_before = rss_kb(process.pid)
+
+        with MemorySampler(process.pid) as sampler:
+            result = asyncio.run(run_load(base_url, args.concurrency, args.requests, unique=args.unique))
+
+        rss_after = rss_kb(process.pid)
+    finally:
+        stop_app(process)
+
+    upstream = fake_state.stats()
+    result.update({
+        'rss_before_kb': rss_before,
+        'rss_peak_kb': sampler.peak_kb,
+        'rss_after_kb': rss_after,
+        'rss_growth_kb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        'upstream_requests': upstream['requests'],
+        'upstream_calls_per_request': round(upstream['total_requests'] / args.requests, 2),
+        'upstream_max_in_flight': upstream['max_in_flight'],
+    })
+    return result
+
+def compare_to_baseline(results, baseline, max_regression):
+    """
+    Relative change of each metric vs an earlier report
+    Returns (changes, regressions): a regression is a latency / error / memory
+    increase or an RPS drop larger than max_regression (fraction).
+    """
+    changes, regressions = {}, []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or 'error' in current or 'error' in previous:
+            continue
+        changes[name] = {}
+        for metric in REGRESSION_METRICS + ('rps',):
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            changes[name][metric] = round(change, 4)
+            worse = -change if metric == 'rps' else change
+            # Absolute floors so noise on tiny values (0 errors, a few KB) is not flagged
+            if metric == 'error_rate' and new - old < 0.01:
+                continue
+            if metric == 'rss_growth_kb' and new - old < 10240:
+                continue
+            if worse > max_regression:
+                regressions.append(f"{name} {metric}: {old} → {new} ({change:+.0%})")
+    return changes, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the app variants against a fake Gemini server')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='Comma-separated: ' + ', '.join(TARGETS))
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=1500.0, help='Mean fake Gemini latency')
+    parser.add_argument('--distribution', choices=['fixed', 'uniform', 'lognormal'], default='lognormal')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of fake Gemini calls answered with 503')
+    parser.add_argument('--unique', action='store_true',
+                        help='Make every question distinct (measures without single-flight sharing)')
+    parser.add_argument('--warmup', type=int, default=20, help='Requests sent before measuring (not counted)')
+    parser.add_argument('--sync-threads', type=int, default=8, help='gunicorn --threads for the Flask targets')
+    parser.add_argument('--fake-port', type=int, default=8089)
+    parser.add_argument('--app-port', type=int, default=5099)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Earlier --output JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='Allowed relative regression vs --baseline before exiting with status 1')
+    args = parser.parse_args()
+
+    fake_server = start_fake_gemini(args.fake_port, args.latency_ms, args.distribution, args.error_rate)
+    fake_state = fake_server.RequestHandlerClass.state
+    env = app_env(args.fake_port)
+
+    print("=" * 80)
+    print(f"Load test: {args.requests} requests, concurrency {args.concurrency}, "
+          f"fake Gemini latency {args.distribution} {args.latency_ms:.0f} ms")
+    print("=" * 80)
+
+    results = {}
+    try:
+        for name in args.targets.split(','):
+            name = name.strip()
+            try:
+                r = results[name] = run_target(name, args, env, fake_state)
+            except RuntimeError as e:
+                # e.g. app_langgraph.py without requirements_langgraph.txt installed
+                results[name] = {'error': str(e)}
+                print(f"  {name:<9} ✗ {e}")
+                continue
+            growth = f"{r['rss_growth_kb'] / 1024:+.1f}MB" if r['rss_growth_kb'] is not None else 'n/a'
+            print(f"  {name:<9} rps={r['rps']:>8}  p50={r['p50_ms']}ms  p95={r['p95_ms']}ms  "
+                  f"p99={r['p99_ms']}ms  errors={r['errors']}  rss={growth}  "
+                  f"gemini calls/req={r['upstream_calls_per_request']}")
+    finally:
+        fake_server.shutdown()
+
+    report = {
+        'settings': {
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'latency_ms': args.latency_ms,
+            'distribution': args.distribution,
+            'error_rate': args.error_rate,
+            'warmup': args.warmup,
+            'unique': args.unique,
+            'sync_threads': args.sync_threads,
+        },
+        'results': results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['baseline_changes'], regressions = compare_to_baseline(
+                results, json.load(f), args.max_regression
+            )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+
+    if args.baseline:
+        if regressions:
+            print(f"\n✗ Regressions vs {args.baseline} (> {args.max_regression:.0%}):")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\n✓ No regressions vs {args.baseline}")
+
+if __name__ == '__main__':
+    main()
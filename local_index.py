@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+"""
+Local retrieval index over the PDFs in documents/ (RETRIEVAL_BACKEND=local)
+An alternative to the remote FileSearch tool: the PDFs are chunked once,
+and each question retrieves its excerpts locally, so retrieval cost is
+known and measurable (bench_retrieval.py).
+
+Each build writes a new generation directory; the CURRENT pointer file
+is replaced by an atomic rename once it is complete, and running apps
+switch to it on their next check. Files of a generation (all memory-mapped,
+nothing is parsed at startup):
+    manifest.json          build settings, chunk count, source file names
+    chunk_text.bin         UTF-8 text of every chunk, back to back
+    chunk_offsets.npy      int64 byte offsets into chunk_text.bin (chunks + 1)
+    chunk_meta.npy         (source, page) int32 table, one row per chunk
+    vocab.bin              terms sorted by UTF-8 bytes, back to back
+    vocab_offsets.npy      int64 byte offsets into vocab.bin (terms + 1)
+    term_start.npy         postings range of every term
+    posting_docs.npy       term-major postings with precomputed BM25 weights
+    posting_weights.npy
+    embeddings.npy         L2-normalized int8 or float16 matrix (optional)
+    embedding_scales.npy   per-row scale of an int8 matrix
+    codes.json, code_start.npy, code_ids.npy
+                           standards code -> chunk ids (code_index.py)
+
+Search: BM25 and cosine top candidates, fused by reciprocal rank fusion.
+A question naming standards codes found in the index is ranked by BM25
+among the chunks containing them only (no query embedding, fewer excerpts).
+
+Usage:
+    python local_index.py build --docs documents
+    python local_index.py build --chunks document_chunks.npz   (ingest_documents.py)
+    python local_index.py search "Tiêu chuẩn ASTM E1105 là gì?"
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from code_index import CodeIndex, code_keys
+from ingest_documents import iter_chunks, new_stats, print_throughput, read_chunks
+from text_normalize import standard_codes, tokenize
+
+INDEX_FORMAT_VERSION = 4
+INDEX_DIR = 'local_index'
+CURRENT_FILE = 'CURRENT'
+GENERATIONS_DIR = 'generations'
+KEEP_GENERATIONS = 2  # Current + previous (workers that have not reloaded yet)
+VECTOR_DTYPES = ('int8', 'float16')
+CHUNK_META_DTYPE = np.dtype([('source', np.int32), ('page', np.int32)])
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def embed_texts(client, model, texts, batch_size=100):
+    """Embeddings of texts, batch_size per request (batchEmbedContents)"""
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        response = client.models.embed_content(model=model, contents=texts[i:i + batch_size])
+        vectors.extend(e.values for e in response.embeddings)
+    return vectors
+
+def write_atomic(path, write):
+    """Write a file through a temp file + rename, so readers never see half of it"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def current_generation(index_dir):
+    """Name of the generation the CURRENT pointer file designates"""
+    with open(os.path.join(index_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+def quantize_int8(matrix):
+    """Per-row symmetric int8 quantization: (codes, float32 scales)"""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(matrix / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def save_array(path, array):
+    write_atomic(path, lambda f: np.save(f, array))
+
+def build_index(records, index_dir=INDEX_DIR, embed_fn=None, k1=1.5, b=0.75,
+                vector_dtype='int8', keep_generations=KEEP_GENERATIONS):
+    """
+    Build a new generation from chunk records {text, source, page} and make
+    it current (the CURRENT pointer is swapped last, by an atomic rename)
+    embed_fn(list of texts) -> list of vectors; None builds a BM25-only index.
+    vector_dtype: 'int8' (per-row scales in embedding_scales.npy) or 'float16'
+    (more precise, slower to score: numpy converts float16 slowly).
+    Returns the manifest.
+    """
+    if vector_dtype not in VECTOR_DTYPES:
+        raise ValueError(f"vector_dtype must be one of {', '.join(VECTOR_DTYPES)}")
+    name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    gen_dir = os.path.join(index_dir, GENERATIONS_DIR, name)
+    os.makedirs(gen_dir)
+
+    vocabulary, sources, source_ids, code_postings = {}, [], {}, {}
+    doc_ids, term_ids, term_freqs = array('i'), array('i'), array('f')
+    lengths, offsets, pages, chunk_sources = array('f'), array('q', [0]), array('i'), array('i')
+
+    # Chunk text: UTF-8 back to back, located by the offsets table
+    with open(os.path.join(gen_dir, 'chunk_text.bin'), 'wb') as f:
+        for chunk_id, record in enumerate(records):
+            counts = Counter(tokenize(record['text']))
+            for term, tf in counts.items():
+                doc_ids.append(chunk_id)
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                term_freqs.append(tf)
+            lengths.append(sum(counts.values()))
+            data = record['text'].encode('utf-8')
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            pages.append(int(record.get('page') or 0))
+            chunk_sources.append(source_ids.setdefault(record['source'], len(source_ids)))
+            for key in code_keys(record['text']):
+                code_postings.setdefault(key, array('i')).append(chunk_id)
+        sources = sorted(source_ids, key=source_ids.get)
+
+    codes = CodeIndex({key: np.frombuffer(ids, dtype=np.int32) for key, ids in code_postings.items()})
+    codes.save(gen_dir)
+
+    num_docs, num_terms = len(lengths), len(vocabulary)
+    meta = np.zeros(num_docs, dtype=CHUNK_META_DTYPE)
+    meta['source'] = np.frombuffer(chunk_sources, dtype=np.int32)
+    meta['page'] = np.frombuffer(pages, dtype=np.int32)
+    save_array(os.path.join(gen_dir, 'chunk_offsets.npy'), np.frombuffer(offsets, dtype=np.int64))
+    save_array(os.path.join(gen_dir, 'chunk_meta.npy'), meta)
+
+    # Vocabulary sorted by UTF-8 bytes (binary search at query time, nothing to load)
+    terms = sorted(vocabulary, key=lambda term: term.encode('utf-8'))
+    remap = np.empty(num_terms, dtype=np.int32)
+    remap[[vocabulary[term] for term in terms]] = np.arange(num_terms, dtype=np.int32)
+    encoded = [term.encode('utf-8') for term in terms]
+    write_atomic(os.path.join(gen_dir, 'vocab.bin'), lambda f: f.write(b''.join(encoded)))
+    save_array(os.path.join(gen_dir, 'vocab_offsets.npy'),
+               np.concatenate(([0], np.cumsum([len(t) for t in encoded], dtype=np.int64))).astype(np.int64))
+
+    # BM25 weight of every (term, chunk) pair; a query sums the weights of its terms
+    doc_ids = np.frombuffer(doc_ids, dtype=np.int32)
+    term_ids = remap[np.frombuffer(term_ids, dtype=np.int32)]
+    term_freqs = np.frombuffer(term_freqs, dtype=np.float32)
+    lengths = np.frombuffer(lengths, dtype=np.float32)
+    df = np.bincount(term_ids, minlength=num_terms)
+    idf = np.log(1.0 + (num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+    avg_length = float(lengths.mean()) if num_docs else 1.0
+    norm = k1 * (1.0 - b + b * lengths[doc_ids] / avg_length)
+    weights = idf[term_ids] * term_freqs * (k1 + 1.0) / (term_freqs + norm)
+
+    order = np.argsort(term_ids, kind='stable')
+    save_array(os.path.join(gen_dir, 'term_start.npy'),
+               np.concatenate(([0], np.cumsum(df))).astype(np.int64))
+    save_array(os.path.join(gen_dir, 'posting_docs.npy'), doc_ids[order])
+    save_array(os.path.join(gen_dir, 'posting_weights.npy'), weights[order].astype(np.float32))
+    del doc_ids, term_ids, term_freqs, weights, order
+
+    dimensions = None
+    if embed_fn and num_docs:
+        dimensions = _build_embeddings(gen_dir, embed_fn, num_docs, vector_dtype)
+
+    manifest = {
+        'format': INDEX_FORMAT_VERSION,
+        'generation': name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'chunks': num_docs,
+        'terms': num_terms,
+        'codes': len(codes),
+        'sources': sources,
+        'dimensions': dimensions,
+        'vector_dtype': vector_dtype if dimensions else None,
+        'bm25': {'k1': k1, 'b': b},
+    }
+    write_atomic(os.path.join(gen_dir, 'manifest.json'),
+                 lambda f: f.write(json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')))
+
+    # Publish: workers pick up the new pointer on their next check
+    write_atomic(os.path.join(index_dir, CURRENT_FILE), lambda f: f.write(name.encode('utf-8')))
+    prune_generations(index_dir, keep_generations)
+    return manifest
+
+def _build_embeddings(gen_dir, embed_fn, num_docs, vector_dtype, batch_size=1000):
+    """Embed the chunks batch by batch straight into the on-disk matrix"""
+    offsets = np.load(os.path.join(gen_dir, 'chunk_offsets.npy'))
+    text = _map_bytes(os.path.join(gen_dir, 'chunk_text.bin'))
+    path = os.path.join(gen_dir, 'embeddings.npy')
+    matrix, scales = None, None
+    for start in range(0, num_docs, batch_size):
+        stop = min(num_docs, start + batch_size)
+        texts = [text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(start, stop)]
+        batch = np.asarray(embed_fn(texts), dtype=np.float32)
+        batch /= np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12)
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(f"{path}.tmp", mode='w+', dtype=np.dtype(vector_dtype),
+                                               shape=(num_docs, batch.shape[1]))
+            scales = np.ones(num_docs, dtype=np.float32)
+        if vector_dtype == 'int8':
+            matrix[start:stop], scales[start:stop] = quantize_int8(batch)
+        else:
+            matrix[start:stop] = batch
+    matrix.flush()
+    dimensions = int(matrix.shape[1])
+    del matrix
+    os.replace(f"{path}.tmp", path)
+    if vector_dtype == 'int8':
+        save_array(os.path.join(gen_dir, 'embedding_scales.npy'), scales)
+    return dimensions
+
+def prune_generations(index_dir, keep=KEEP_GENERATIONS):
+    """
+    Delete all but the newest `keep` generations (the current one always
+    stays). Workers still mapping a deleted generation keep their pages
+    until they reload.
+    """
+    root = Path(index_dir) / GENERATIONS_DIR
+    current = current_generation(index_dir)
+    names = sorted((p.name for p in root.iterdir() if p.is_dir()), reverse=True)
+    for name in [n for n in names if n != current][max(0, keep - 1):]:
+        shutil.rmtree(root / name, ignore_errors=True)
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+def _map_bytes(path):
+    """Read-only mapping of a file; slices are bytes (an empty file cannot be mapped)"""
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _map_array(path):
+    """np.load(mmap_mode='r') as a plain ndarray view (np.memmap indexing is slow)"""
+    return np.load(path, mmap_mode='r').view(np.ndarray)
+
+def top_indices(scores, k):
+    """Indices of the k highest scores, best first (scores > 0 only)"""
+    k = min(k, int(np.count_nonzero(scores > 0)))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+def rrf_fuse(rankings, k=60, top_k=5):
+    """Reciprocal rank fusion: score(d) = sum over rankings of 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])[:top_k]
+
+class LocalIndex:
+    """
+    Read-only view of the current generation built by build_index()
+    Every array is memory-mapped, so opening the index costs the same at any
+    corpus size and all workers share the same page cache.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        try:
+            name = current_generation(index_dir)
+        except FileNotFoundError:
+            raise ValueError(f"{index_dir} has no {CURRENT_FILE} pointer (build or rebuild the index)")
+        self.path = os.path.join(index_dir, GENERATIONS_DIR, name)
+        with open(os.path.join(self.path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{index_dir} has index format {self.manifest.get('format')}, "
+                             f"expected {INDEX_FORMAT_VERSION} (rebuild it)")
+        self.sources = self.manifest['sources']
+
+        def load(filename):
+            return _map_array(os.path.join(self.path, filename))
+
+        self.chunk_text = _map_bytes(os.path.join(self.path, 'chunk_text.bin'))
+        self.chunk_offsets = load('chunk_offsets.npy')
+        self.chunk_meta = load('chunk_meta.npy')
+        self.vocab = _map_bytes(os.path.join(self.path, 'vocab.bin'))
+        self.vocab_offsets = load('vocab_offsets.npy')
+        self.term_start = load('term_start.npy')
+        self.posting_docs = load('posting_docs.npy')
+        self.posting_weights = load('posting_weights.npy')
+
+        self.codes = CodeIndex.load(self.path)
+        self.embeddings, self.embedding_scales = None, None
+        if self.manifest.get('dimensions'):
+            self.embeddings = load('embeddings.npy')
+            if self.manifest.get('vector_dtype') == 'int8':
+                self.embedding_scales = load('embedding_scales.npy')
+
+    def __len__(self):
+        return self.manifest['chunks']
+
+    @property
+    def generation(self):
+        return self.manifest.get('generation')
+
+    def chunk(self, i):
+        """{id, text, source, page} of one chunk"""
+        text = self.chunk_text[self.chunk_offsets[i]:self.chunk_offsets[i + 1]].decode('utf-8')
+        meta = self.chunk_meta[i]
+        return {'id': int(i), 'text': text, 'source': self.sources[meta['source']], 'page': int(meta['page'])}
+
+    def term_id(self, term):
+        """Id of a term (binary search over the sorted vocabulary), None if unknown"""
+        key = term.encode('utf-8')
+        lo, hi = 0, len(self.vocab_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self.vocab[self.vocab_offsets[mid]:self.vocab_offsets[mid + 1]]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def bm25_scores(self, question):
+        """BM25 score of every chunk for a question"""
+        term_ids = np.array(
+            [i for i in (self.term_id(t) for t in tokenize(question)) if i is not None],
+            dtype=np.int64
+        )
+        scores = np.zeros(len(self), dtype=np.float32)
+        if not len(term_ids):
+            return scores
+        starts = self.term_start[term_ids]
+        lengths = self.term_start[term_ids + 1] - starts
+        total = int(lengths.sum())
+        if total:
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            scores = np.bincount(self.posting_docs[offsets], weights=self.posting_weights[offsets],
+                                 minlength=len(self)).astype(np.float32)
+        return scores
+
+    def vector_scores(self, query_vector, block_rows=8192, rows=None):
+        """
+        Cosine similarity of every chunk with a query embedding
+        Scored block by block, so only block_rows rows are ever converted
+        to float32 at once. With rows, only those chunks are scored (0 elsewhere).
+        """
+        query = np.array(query_vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        if rows is not None:
+            scores = np.zeros(len(self), dtype=np.float32)
+            scores[rows] = np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+            if self.embedding_scales is not None:
+                scores[rows] *= self.embedding_scales[rows]
+            return scores
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), block_rows):
+            block = np.asarray(self.embeddings[start:start + block_rows], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self.embedding_scales is not None:
+            scores *= self.embedding_scales
+        return scores
+
+    def search(self, question, top_k=5, query_vector=None, mode='hybrid', candidates=50, rrf_k=60,
+               restrict=None):
+        """
+        Top chunks as {**chunk, 'score', 'bm25_rank', 'vector_rank'}
+        mode: 'bm25', 'vector' or 'hybrid' (RRF of both; BM25 only when there
+        is no query vector or no embedding matrix)
+        restrict: chunk ids to rank (e.g. CodeIndex.lookup()), None for all
+        """
+        rankings = {}
+        if mode in ('bm25', 'hybrid'):
+            scores = self.bm25_scores(question)
+            if restrict is not None:
+                kept = np.zeros_like(scores)
+                kept[restrict] = scores[restrict]
+                scores = kept
+            rankings['bm25'] = top_indices(scores, candidates).tolist()
+        if mode in ('vector', 'hybrid') and query_vector is not None and self.embeddings is not None:
+            rankings['vector'] = top_indices(self.vector_scores(query_vector, rows=restrict), candidates).tolist()
+
+        positions = {name: {doc: rank for rank, doc in enumerate(ranking, 1)}
+                     for name, ranking in rankings.items()}
+        results = []
+        for doc, score in rrf_fuse(rankings.values(), rrf_k, top_k):
+            results.append({
+                **self.chunk(doc),
+                'score': round(score, 6),
+                'bm25_rank': positions.get('bm25', {}).get(doc),
+                'vector_rank': positions.get('vector', {}).get(doc),
+            })
+        return results
+
+class LocalRetriever:
+    """
+    What the engine uses: search + formatting of the excerpts for the prompt
+    Every reload_interval seconds the CURRENT pointer is checked; a new
+    generation is opened and swapped in, searches in flight keep the old one.
+    Questions naming indexed standards codes get code_top_k excerpts from
+    the chunks containing the codes (code_top_k=0 turns this off).
+    """
+
+    def __init__(self, index, embed_fn=None, top_k=5, candidates=50, rrf_k=60, reload_interval=5.0,
+                 code_top_k=3):
+        self.index = index
+        self.embed_fn = embed_fn
+        self.top_k = top_k
+        self.code_top_k = code_top_k
+        self.code_hits = 0
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reload_interval = reload_interval
+        self.reloads = 0
+        self._checked_at = time.monotonic()
+
+    @classmethod
+    def from_config(cls, config, embed_fn=None):
+        """
+        LocalRetriever for LOCAL_INDEX_DIR
+        Raises RuntimeError if the index cannot be opened: with
+        RETRIEVAL_BACKEND=local there is no FileSearch store to fall back to.
+        """
+        try:
+            index = LocalIndex(config.LOCAL_INDEX_DIR)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"✗ Local index not available ({config.LOCAL_INDEX_DIR}): {e}")
+            print("  Run: python local_index.py build --docs documents")
+            raise RuntimeError(f"RETRIEVAL_BACKEND=local but the local index could not be opened: {e}") from e
+        print(f"✓ Local index: {len(index)} chunks"
+              f"{', %s vectors' % index.manifest['vector_dtype'] if index.embeddings is not None else ', BM25 only'}")
+        return cls(index, embed_fn if config.LOCAL_INDEX_VECTORS else None,
+                   config.LOCAL_INDEX_TOP_K, config.LOCAL_INDEX_CANDIDATES, config.LOCAL_INDEX_RRF_K,
+                   config.LOCAL_INDEX_RELOAD_INTERVAL, config.LOCAL_INDEX_CODE_TOP_K)
+
+    @property
+    def generation(self):
+        return self.index.generation
+
+    def _check_generation(self):
+        """Open the new generation once the CURRENT pointer moved"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        index_dir = self.index.index_dir
+        try:
+            if current_generation(index_dir) == self.index.generation:
+                return
+            index = LocalIndex(index_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"✗ Local index reload failed, keeping {self.index.generation}: {e}")
+            return
+        self.index = index
+        self.reloads += 1
+        print(f"✓ Local index reloaded: generation {index.generation} ({len(index)} chunks)")
+
+    def search(self, question, top_k=None):
+        self._check_generation()
+        index = self.index
+        codes = standard_codes(question) if self.code_top_k else None
+        restrict = index.codes.lookup(codes) if codes else None
+        if restrict is not None:
+            # Exact code match: BM25 among the chunks naming the codes, no embedding call
+            self.code_hits += 1
+            return index.search(question, self.code_top_k, mode='bm25',
+                                candidates=self.candidates, rrf_k=self.rrf_k, restrict=restrict)
+
+        query_vector = None
+        if self.embed_fn and index.embeddings is not None:
+            try:
+                query_vector = self.embed_fn(question)
+            except Exception as e:
+                print(f"Query embedding failed, BM25 only: {e}")
+        return index.search(question, top_k or self.top_k, query_vector,
+                            candidates=self.candidates, rrf_k=self.rrf_k)
+
+    def context(self, question):
+        """(excerpts text for the prompt, citations)"""
+        chunks = self.search(question)
+        context = '\n\n'.join(
+            f"[{i}] ({chunk['source']}, trang {chunk['page']})\n{chunk['text']}"
+            for i, chunk in enumerate(chunks, 1)
+        )
+        citations, seen = [], set()
+        for chunk in chunks:
+            if (chunk['source'], chunk['page']) not in seen:
+                seen.add((chunk['source'], chunk['page']))
+                citations.append({'title': chunk['source'], 'uri': '', 'page': chunk['page']})
+        return context, citations
+
+    def stats(self):
+        index = self.index
+        return {
+            'chunks': len(index),
+            'vectors': index.manifest.get('vector_dtype') if self.embed_fn and index.embeddings is not None else None,
+            'generation': index.generation,
+            'reloads': self.reloads,
+            'codes': len(index.codes),
+            'code_hits': self.code_hits,
+        }
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Local BM25 + vector index over the PDFs')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Parse, chunk and index the PDFs')
+    source = build.add_mutually_exclusive_group()
+    source.add_argument('--docs', default='documents', help='Parse the PDFs of this folder')
+    source.add_argument('--chunks', help='Chunk file written by ingest_documents.py (no parsing)')
+    build.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='PDF parsing processes')
+    build.add_argument('--out', default=INDEX_DIR)
+    build.add_argument('--chunk-words', type=int, default=200)
+    build.add_argument('--overlap', type=int, default=40)
+    build.add_argument('--no-embeddings', action='store_true', help='BM25 only (no Gemini calls)')
+    build.add_argument('--dtype', choices=VECTOR_DTYPES, default='int8',
+                       help='Embedding matrix type (int8: 4x smaller than float32, fastest to score)')
+    search = sub.add_parser('search', help='Query the index (BM25 only)')
+    search.add_argument('question')
+    search.add_argument('--index', default=INDEX_DIR)
+    search.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'search':
+        for chunk in LocalIndex(args.index).search(args.question, args.top_k, mode='bm25'):
+            print(f"{chunk['score']:.4f}  {chunk['source']} p.{chunk['page']}: {chunk['text'][:120]}...")
+        return
+
+    if not args.chunks:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            print("✗ Error: pypdf not installed")
+            print("  Install: pip install pypdf")
+            sys.exit(1)
+
+    embed_fn = None
+    if not args.no_embeddings:
+        from config import Config
+        from gemini_client import create_gemini_client
+        client = create_gemini_client()
+        embed_fn = lambda texts: embed_texts(client, Config.EMBEDDING_MODEL, texts)
+
+    start = time.perf_counter()
+    stats = None
+    if args.chunks:
+        print(f"Indexing chunks of {args.chunks}...")
+        records = read_chunks(args.chunks)
+    else:
+        print(f"Indexing PDFs in {args.docs} ({args.workers} workers)...")
+        stats = new_stats(args.workers)
+        records = iter_chunks(sorted(Path(args.docs).glob('*.pdf')), args.workers,
+                              args.chunk_words, args.overlap, stats=stats)
+    manifest = build_index(records, args.out, embed_fn, vector_dtype=args.dtype)
+    if stats:
+        print_throughput(stats)
+    print(f"✓ {manifest['chunks']} chunks, {manifest['terms']} terms"
+          f"{', %d-d %s vectors' % (manifest['dimensions'], args.dtype) if manifest['dimensions'] else ''} "
+          f"in {time.perf_counter() - start:.1f}s → {args.out} (generation {manifest['generation']})")
+
+    # Running apps drop answers cached from the previous index
+    from answer_cache import bump_store_generation
+    bump_store_generation(f"local:{args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental store of the Q&A examples (qa_examples.jsonl)
+load_qa_examples.py streams the Excel rows into this append-only JSON Lines
+log: one line per new or changed pair (keyed by the normalized question,
+with a hash of question + answer) and a tombstone per removed pair. Only a
+small index (key -> line offset, id, hash, source) is kept in memory;
+examples() reads the current lines back. The log is compacted once most of
+its lines are superseded.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from example_index import normalize_text, question_key
+
+EXAMPLES_LOG_FILE = 'qa_examples.jsonl'
+EXAMPLES_JSON_FILE = 'qa_examples.json'
+
+def pair_hash(question, answer):
+    """Content hash of one pair (an edited answer changes it)"""
+    raw = f"{normalize_text(question)}\0{str(answer).strip()}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+def default_examples_file():
+    """qa_examples.jsonl when load_qa_examples.py created it, else qa_examples.json"""
+    return EXAMPLES_LOG_FILE if Path(EXAMPLES_LOG_FILE).exists() else EXAMPLES_JSON_FILE
+
+def read_examples(path=None):
+    """List of {id, question, answer} from a .jsonl log or a .json array"""
+    path = str(path or default_examples_file())
+    if path.endswith('.jsonl'):
+        return QAExampleLog(path).examples()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class QAExampleLog:
+    """Q&A pairs keyed by normalized question, persisted as a JSONL log"""
+
+    def __init__(self, path=EXAMPLES_LOG_FILE):
+        self.path = path
+        self._index = {}  # question key -> (offset, id, hash, source)
+        self.lines = 0
+        self.next_id = 1
+        self._load()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if not line.endswith(b'\n'):
+                        break  # Torn last line after a crash: truncated below
+                    offset += len(line)
+                    continue
+                if record.get('deleted'):
+                    self._index.pop(record['key'], None)
+                else:
+                    self._index[record['key']] = (offset, record['id'], record['hash'], record.get('source'))
+                    self.next_id = max(self.next_id, record['id'] + 1)
+                offset += len(line)
+                self.lines += 1
+        if offset < os.path.getsize(self.path):
+            os.truncate(self.path, offset)
+
+    def sync(self, pairs, source):
+        """
+        Bring the pairs of one source (e.g. a workbook) up to date
+        pairs is an iterable of (question, answer), consumed as a stream;
+        only new or changed pairs are appended, and pairs of this source
+        that are no longer present get a tombstone.
+        Returns {'added', 'changed', 'unchanged', 'removed', 'duplicates'}.
+        """
+        counts = dict.fromkeys(('added', 'changed', 'unchanged', 'removed', 'duplicates'), 0)
+        seen = set()
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            for question, answer in pairs:
+                key = question_key(question)
+                if key in seen:
+                    counts['duplicates'] += 1  # First occurrence wins
+                    continue
+                seen.add(key)
+
+                digest = pair_hash(question, answer)
+                entry = self._index.get(key)
+                if entry and entry[2] == digest and entry[3] == source:
+                    counts['unchanged'] += 1
+                    continue
+                if entry:
+                    example_id = entry[1]
+                    counts['changed'] += 1
+                else:
+                    example_id = self.next_id
+                    self.next_id += 1
+                    counts['added'] += 1
+                self._write(f, {
+                    'key': key, 'id': example_id, 'question': question, 'answer': answer,
+                    'hash': digest, 'source': source,
+                    'updated_at': datetime.now().isoformat(timespec='seconds')
+                })
+
+            for key, entry in list(self._index.items()):
+                if entry[3] == source and key not in seen:
+                    self._write(f, {'key': key, 'deleted': True})
+                    counts['removed'] += 1
+
+        if self.lines > 2 * len(self._index) + 100:
+            self.compact()
+        return counts
+
+    def _write(self, f, record):
+        offset = f.tell()
+        f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.lines += 1
+        if record.get('deleted'):
+            self._index.pop(record['key'], None)
+        else:
+            self._index[record['key']] = (offset, record['id'], record['hash'], record['source'])
+
+    def records(self):
+        """Current records in id order (read back from the log)"""
+        entries = sorted(self._index.values(), key=lambda entry: entry[1])
+        if not entries:
+            return
+        with open(self.path, 'rb') as f:
+            for offset, _, _, _ in entries:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def iter_examples(self):
+        """{id, question, answer} in the shape of qa_examples.json, one at a time"""
+        for r in self.records():
+            yield {'id': r['id'], 'question': r['question'], 'answer': r['answer']}
+
+    def examples(self):
+        """[{id, question, answer}] in the shape of qa_examples.json"""
+        return list(self.iter_examples())
+
+    def compact(self):
+        """Rewrite the log with one line per current pair (atomic rename)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.records():
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self._index, self.lines = {}, 0
+        self._load()
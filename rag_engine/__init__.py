@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Shared RAG engine for Silkroad RAG Chatbot
+One engine (client, caches, sessions, metrics) with pluggable answering
+strategies: plain, dynamic, few_shot, graph.
+"""
+from rag_engine.engine import RAGEngine
+from rag_engine.strategies import STRATEGIES, create_strategy
+from rag_engine.web import create_app
+
+__all__ = ['RAGEngine', 'STRATEGIES', 'create_strategy', 'create_app']
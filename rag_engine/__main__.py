@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Run the chatbot with the strategy from RAG_STRATEGY
+    RAG_STRATEGY=dynamic PORT=5002 python -m rag_engine
+"""
+from config import Config
+from rag_engine import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    print("\n" + "=" * 60)
+    print(f"Silkroad RAG Chatbot - strategy: {app.engine.strategy.name}")
+    print("=" * 60)
+
+    if not app.engine.client:
+        print("\n⚠ Warning: Gemini client not initialized!")
+        print("  Please check your .env configuration\n")
+
+    print(f"Server running at: http://localhost:{Config.PORT}")
+    print("=" * 60 + "\n")
+
+    app.run(
+        host='0.0.0.0',
+        port=Config.PORT,
+        debug=Config.DEBUG
+    )
@@ -0,0 +1,692 @@
+# -*- coding: utf-8 -*-
+"""
+RAGEngine: the state shared by every strategy
+One Gemini client (connection pool), session store, answer cache, worker
+pool and metrics; the strategy only decides what prompt is sent.
+"""
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+from answer_cache import AnswerCache, prompt_fingerprint
+from config import Config
+from gemini_client import create_gemini_client
+from local_index import LocalRetriever
+from session_store import create_session_store
+from rag_engine.metrics import Metrics, elapsed_ms
+from rag_engine.prompt_cache import MISS, PromptCache
+from rag_engine.prompting import candidate_text, extract_citations, sse_event
+from rag_engine.resilience import GeminiGuard, GeminiUnavailableError, SingleFlight, error_result, is_retryable
+from rag_engine.strategies import create_strategy
+from rag_engine.tracing import Tracer
+from rag_engine.warmer import CacheWarmer
+
+CLIENT_NOT_INITIALIZED = 'Gemini client not initialized. Please check your API key.'
+
+class RAGEngine:
+    """
+    Answers questions with one strategy on top of shared infrastructure
+
+    ask()/stream() are used by the Flask apps, aask()/astream() by the
+    async server (app_async.py); all of them keep session history, the
+    answer cache and metrics the same way.
+    """
+
+    def __init__(self, config=Config, strategy=None, client=None, max_connections=None):
+        self.config = config
+
+        # Initialize Gemini client
+        if client is None:
+            try:
+                config.validate()
+                client = create_gemini_client(max_connections=max_connections)
+                print("✓ Gemini client initialized successfully")
+            except Exception as e:
+                print(f"✗ Error initializing Gemini client: {str(e)}")
+        self.client = client
+        # Rate limit, retry, circuit breaker and coalescing around every Gemini call
+        self.gemini = GeminiGuard.from_config(config)
+        # Concurrent identical standalone questions wait for one answer
+        self.inflight = SingleFlight() if config.SINGLE_FLIGHT_ENABLED else None
+
+        # Local BM25 + vector retrieval instead of the FileSearch tool (RETRIEVAL_BACKEND=local)
+        self.retriever = LocalRetriever.from_config(
+            config, embed_fn=self.embed if self.client else None
+        ) if config.RETRIEVAL_BACKEND == 'local' else None
+
+        # Chat sessions (bounded; see SESSION_BACKEND in config.py)
+        self.session_store = create_session_store(config)
+
+        # Answer cache in front of the whole strategy
+        self.answer_cache = AnswerCache(
+            max_size=config.ANSWER_CACHE_MAX_SIZE,
+            ttl=config.ANSWER_CACHE_TTL,
+            embed_fn=self.embed if config.ANSWER_CACHE_SEMANTIC and self.client else None,
+            similarity_threshold=config.ANSWER_CACHE_SIMILARITY
+        ) if config.ANSWER_CACHE_ENABLED else None
+
+        # Worker threads for strategies that run calls concurrently (pipeline mode)
+        self.executor = ThreadPoolExecutor(max_workers=config.PIPELINE_WORKERS, thread_name_prefix='rag')
+        self.metrics = Metrics()
+
+        # Static instructions: inline ('off'), as system_instruction ('system'),
+        # or registered as Gemini context caches ('cached')
+        self.prompt_cache_mode = config.PROMPT_CACHE_MODE
+        self.prompt_cache = PromptCache(
+            self.client, config.MODEL_NAME, lambda: self.generate_config().tools,
+            executor=self.executor,
+            ttl=config.PROMPT_CACHE_TTL,
+            refresh_margin=config.PROMPT_CACHE_REFRESH_MARGIN,
+            guard=self.gemini
+        ) if self.prompt_cache_mode == 'cached' and self.client else None
+
+        strategy = strategy or config.RAG_STRATEGY
+        self.tracer = Tracer(strategy)  # /metrics histograms and per-request traces
+        self.strategy = create_strategy(strategy, self)
+
+        # Cache namespace: answers depend on store (or local index), model and prompt template
+        # (a rebuilt local index bumps the store generation, like an upload)
+        store = f"local:{config.LOCAL_INDEX_DIR}" if self.retriever else config.FILE_SEARCH_STORE_ID
+        self.namespace = AnswerCache.namespace(
+            store, config.MODEL_NAME,
+            prompt_fingerprint(self.strategy.fingerprint(), self.prompt_cache_mode)
+        )
+
+        # Pre-compute the most asked answers at startup and after document uploads
+        self.warmer = None
+        if config.CACHE_WARM_ENABLED and self.answer_cache and self.client:
+            self.warmer = CacheWarmer.from_config(self)
+            self.answer_cache.on_store_change = self.warmer.start
+            self.warmer.start('startup')
+
+    def embed(self, text):
+        """Embedding vector for near-duplicate answer cache lookups"""
+        response, _ = self.gemini.call(
+            lambda: self.client.models.embed_content(model=self.config.EMBEDDING_MODEL, contents=text),
+            key=self.coalesce_key(text, 'embed')
+        )
+        return response.embeddings[0].values
+
+    def retrieve(self, question):
+        """(excerpts, citations) from the local index (RETRIEVAL_BACKEND=local)"""
+        with self.tracer.span('local_retrieval'):
+            return self.retriever.context(question)
+
+    def submit(self, fn, *args):
+        """Run fn on the worker pool, keeping the caller's trace context"""
+        return self.executor.submit(contextvars.copy_context().run, fn, *args)
+
+    # --- Gemini calls (each one is a traced 'llm' span named by call) ---
+
+    def generate_config(self, file_search=True, temperature=None, max_output_tokens=None,
+                        system_instruction=None, cached_content=None):
+        """
+        GenerateContentConfig, with the FileSearch tool unless file_search=False
+        A cached_content already holds the system instruction and the tools.
+        With the local retriever, strategies put the excerpts in the prompt instead.
+        """
+        tools = None
+        if file_search and not cached_content and not self.retriever:
+            tools = [
+                types.Tool(
+                    file_search=types.FileSearch(
+                        file_search_store_names=[self.config.FILE_SEARCH_STORE_ID]
+                    )
+                )
+            ]
+        return types.GenerateContentConfig(
+            tools=tools,
+            system_instruction=None if cached_content else system_instruction,
+            cached_content=cached_content,
+            temperature=self.config.TEMPERATURE if temperature is None else temperature,
+            max_output_tokens=max_output_tokens,
+            response_modalities=["TEXT"],
+        )
+
+    def cached_content_for(self, system_instruction, file_search):
+        """Context cache name for a system instruction (PROMPT_CACHE_MODE=cached), else None"""
+        if system_instruction and self.prompt_cache:
+            return self.prompt_cache.get(system_instruction, file_search)
+        return None
+
+    async def acached_content_for(self, system_instruction, file_search):
+        """cached_content_for() that creates a missing cache in a thread, off the event loop"""
+        if not (system_instruction and self.prompt_cache):
+            return None
+        name = self.prompt_cache.lookup(system_instruction, file_search)
+        if name is MISS:
+            return await asyncio.to_thread(self.prompt_cache.get, system_instruction, file_search)
+        return name
+
+    def _request(self, contents, file_search, temperature, max_output_tokens, system_instruction,
+                 cached_content=None):
+        """Keyword arguments of one generate_content request"""
+        return {
+            'model': self.config.MODEL_NAME,
+            'contents': contents,
+            'config': self.generate_config(file_search, temperature, max_output_tokens,
+                                           system_instruction, cached_content)
+        }
+
+    @staticmethod
+    def coalesce_key(*request):
+        """Identical in-flight requests share one upstream call (None: never shared)"""
+        if not isinstance(request[0], str):
+            return None
+        return prompt_fingerprint(repr(request))
+
+    def generate(self, contents, file_search=True, temperature=None, max_output_tokens=None,
+                 system_instruction=None, call='generation'):
+        """One generate_content call (every strategy goes through here)"""
+        with self.tracer.span(call, 'llm') as span:
+            cached_content = self.cached_content_for(system_instruction, file_search)
+            key = self.coalesce_key(contents, file_search, temperature, max_output_tokens, system_instruction)
+            request = self._request(contents, file_search, temperature, max_output_tokens,
+                                    system_instruction, cached_content)
+            try:
+                response, span.coalesced = self.gemini.call(
+                    lambda: self.client.models.generate_content(**request), span, key)
+            except Exception as e:
+                if not cached_content or isinstance(e, GeminiUnavailableError) or is_retryable(e):
+                    raise
+                # The cache may be gone server-side: retry once with the inline instruction
+                self.prompt_cache.invalidate(cached_content)
+                span.retries += 1
+                request = self._request(contents, file_search, temperature, max_output_tokens, system_instruction)
+                response, span.coalesced = self.gemini.call(
+                    lambda: self.client.models.generate_content(**request), span)
+            span.record_usage(response)
+        return response
+
+    def generate_stream(self, contents, file_search=True, temperature=None, max_output_tokens=None,
+                        system_instruction=None, call='generation'):
+        """
+        Streaming variant of generate() (the span covers the whole stream)
+        Failures before the first chunk are retried like generate(); a stream
+        that breaks later is not (text was already sent to the user).
+        """
+        with self.tracer.span(call, 'llm') as span:
+            cached_content = self.cached_content_for(system_instruction, file_search)
+            request = self._request(contents, file_search, temperature, max_output_tokens,
+                                    system_instruction, cached_content)
+
+            def open_stream():
+                stream = iter(self.client.models.generate_content_stream(**request))
+                return next(stream, None), stream
+
+            try:
+                (first, stream), _ = self.gemini.call(open_stream, span)
+                if first is None:
+                    return
+                span.record_usage(first)
+                yield first
+                for chunk in stream:
+                    span.record_usage(chunk)
+                    yield chunk
+            except Exception:
+                if cached_content:
+                    self.prompt_cache.invalidate(cached_content)
+                raise
+
+    async def agenerate(self, contents, file_search=True, temperature=None, max_output_tokens=None,
+                        system_instruction=None, call='generation'):
+        """Async generate() through client.aio"""
+        with self.tracer.span(call, 'llm') as span:
+            cached_content = await self.acached_content_for(system_instruction, file_search)
+            key = self.coalesce_key(contents, file_search, temperature, max_output_tokens, system_instruction)
+            request = self._request(contents, file_search, temperature, max_output_tokens,
+                                    system_instruction, cached_content)
+            try:
+                response, span.coalesced = await self.gemini.acall(
+                    lambda: self.client.aio.models.generate_content(**request), span, key)
+            except Exception as e:
+                if not cached_content or isinstance(e, GeminiUnavailableError) or is_retryable(e):
+                    raise
+                self.prompt_cache.invalidate(cached_content)
+                span.retries += 1
+                request = self._request(contents, file_search, temperature, max_output_tokens, system_instruction)
+                response, span.coalesced = await self.gemini.acall(
+                    lambda: self.client.aio.models.generate_content(**request), span)
+            span.record_usage(response)
+        return response
+
+    async def agenerate_stream(self, contents, file_search=True, temperature=None, max_output_tokens=None,
+                               system_instruction=None, call='generation'):
+        """Async generate_stream() through client.aio"""
+        with self.tracer.span(call, 'llm') as span:
+            cached_content = await self.acached_content_for(system_instruction, file_search)
+            request = self._request(contents, file_search, temperature, max_output_tokens,
+                                    system_instruction, cached_content)
+
+            async def open_stream():
+                stream = await self.client.aio.models.generate_content_stream(**request)
+                try:
+                    return await stream.__anext__(), stream
+                except StopAsyncIteration:
+                    return None, stream
+
+            try:
+                (first, stream), _ = await self.gemini.acall(open_stream, span)
+                if first is None:
+                    return
+                span.record_usage(first)
+                yield first
+                async for chunk in stream:
+                    span.record_usage(chunk)
+                    yield chunk
+            except Exception:
+                if cached_content:
+                    self.prompt_cache.invalidate(cached_content)
+                raise
+
+    def _result(self, response, generation, timings):
+        """Result dict of a single-call strategy"""
+        if not response.candidates:
+            return {
+                'error': 'No response generated from Gemini',
+                'success': False
+            }
+
+        candidate = response.candidates[0]
+        citations = generation.citations
+        if citations is None:
+            citations = extract_citations(candidate)
+
+        return {
+            'answer': candidate_text(candidate) or "No response generated",
+            'citations': citations,
+            **generation.extra,
+            'timings': timings,
+            'success': True
+        }
+
+    def run_generation(self, generation):
+        """Make the final call a strategy prepared"""
+        stage = time.perf_counter()
+        response = self.generate(generation.prompt, **generation.call_kwargs())
+        return self._result(response, generation, {**generation.timings, 'generation_ms': elapsed_ms(stage)})
+
+    # --- Request handling ---
+
+    def use_answer_cache(self, history):
+        """
+        Only standalone questions are cached: once a session has earlier
+        messages, the prompt includes them and the answer may depend on them
+        """
+        # The current question is already in history when this is called
+        return self.answer_cache is not None and len(history) <= 1
+
+    def _start(self, question, session_id):
+        """Add the question to the session; return (history, cacheable, cached result)"""
+        self.session_store.add_message(session_id, 'user', question)
+        history = self.session_store.get_messages(session_id)
+
+        cacheable = self.use_answer_cache(history)
+        cached = self.answer_cache.get(question, self.namespace) if cacheable else None
+        if cached is None and len(history) <= 1:
+            # Strategy fast path (e.g. curated example answers): no Gemini call
+            cached = self.strategy.fast_answer(question)
+        return history, cacheable, cached
+
+    def _finish(self, question, session_id, result, cacheable, start, cached=False):
+        """Record the answer in the session, cache and metrics"""
+        success = bool(result.get('success'))
+        if success:
+            self.session_store.add_message(session_id, 'assistant', result['answer'])
+            if not cached:
+                result.setdefault('timings', {})['total_ms'] = elapsed_ms(start)
+                if cacheable:
+                    self.answer_cache.set(question, self.namespace, result)
+        latency = elapsed_ms(start)
+        self.metrics.record(latency, success=success, cached=cached)
+        if success:
+            self.tracer.observe_request(latency, cached)
+
+    def ask(self, question, session_id, trace=False):
+        """
+        Answer one question in a session
+        trace=True adds a 'trace' block (spans with timings and token counts)
+        """
+        if not trace:
+            return self._ask(question, session_id)
+
+        token = self.tracer.start_trace()
+        try:
+            result = self._ask(question, session_id)
+        finally:
+            trace_block = self.tracer.end_trace(token)
+        # Copy: the result object may be the one stored in the answer cache
+        return {**result, 'trace': trace_block}
+
+    def _flight_key(self, question, history):
+        """
+        Single-flight key: concurrent identical standalone questions (same
+        normalized question, store, model and prompt) share one answer.
+        None for follow-ups, whose prompt includes the session history.
+        """
+        if self.inflight is None or len(history) > 1:
+            return None
+        return AnswerCache.make_key(question, self.namespace)
+
+    @staticmethod
+    def _own_copy(result, shared):
+        """Per-request copy of a result that several requests may hold"""
+        result = dict(result)
+        if 'timings' in result:
+            result['timings'] = dict(result['timings'])
+        if shared:
+            result['shared'] = True
+        return result
+
+    def _ask(self, question, session_id):
+        if not self.client:
+            return {'error': CLIENT_NOT_INITIALIZED, 'success': False}
+
+        start = time.perf_counter()
+        try:
+            history, cacheable, cached = self._start(question, session_id)
+            if cached:
+                result = {**cached, 'cached': True}
+                self._finish(question, session_id, result, cacheable, start, cached=True)
+                return result
+
+            key = self._flight_key(question, history)
+            if key:
+                result, shared = self.inflight.do(key, lambda: self.strategy.answer(question, history))
+            else:
+                result, shared = self.strategy.answer(question, history), False
+
+            result = self._own_copy(result, shared)
+            self._finish(question, session_id, result, cacheable and not shared, start)
+            return result
+
+        except Exception as e:
+            self.metrics.record(elapsed_ms(start), success=False)
+            return error_result(e)
+
+    def _stream_whole(self, result):
+        """SSE events for an answer that was not streamed (cache hit, multi-step strategy)"""
+        if not result.get('success'):
+            yield sse_event('error', result)
+            return
+        yield sse_event('delta', {'text': result['answer']})
+        yield sse_event('done', result)
+
+    def _stream_answer(self, question, history):
+        """Yield 'delta' events while answering; returns the result dict"""
+        if not self.strategy.single_call:
+            result = self.strategy.answer(question, history)
+            if result.get('success'):
+                yield sse_event('delta', {'text': result['answer']})
+            return result
+
+        generation = self.strategy.prepare(question, history)
+        answer_parts = []
+        citations = generation.citations or []
+
+        # Grounding metadata usually arrives on the last chunk only
+        stage = time.perf_counter()
+        for chunk in self.generate_stream(generation.prompt, **generation.call_kwargs()):
+            if not chunk.candidates:
+                continue
+            candidate = chunk.candidates[0]
+
+            text = candidate_text(candidate)
+            if text:
+                answer_parts.append(text)
+                yield sse_event('delta', {'text': text})
+
+            chunk_citations = extract_citations(candidate)
+            if chunk_citations:
+                citations = chunk_citations
+
+        return self._streamed_result(answer_parts, citations, generation, stage)
+
+    def stream(self, question, session_id):
+        """
+        Stream the answer as SSE events
+        Yields 'delta' events with text chunks, then one 'done' event
+        carrying the full answer and citations (or an 'error' event).
+        Multi-step strategies, and requests that share another request's
+        in-flight answer, send the whole answer as a single delta.
+        """
+        if not self.client:
+            yield sse_event('error', {'error': CLIENT_NOT_INITIALIZED, 'success': False})
+            return
+
+        start = time.perf_counter()
+        try:
+            history, cacheable, cached = self._start(question, session_id)
+            if cached:
+                result = {**cached, 'cached': True}
+                self._finish(question, session_id, result, cacheable, start, cached=True)
+                yield from self._stream_whole(result)
+                return
+
+            key = self._flight_key(question, history)
+            future, leader = self.inflight.begin(key) if key else (None, True)
+            if not leader:
+                result = self._own_copy(future.result(), shared=True)
+                self._finish(question, session_id, result, False, start)
+                yield from self._stream_whole(result)
+                return
+
+            try:
+                result = yield from self._stream_answer(question, history)
+            except BaseException as e:
+                if future:
+                    self.inflight.end(key, future, error=e)
+                raise
+            if future:
+                self.inflight.end(key, future, result)
+
+            result = self._own_copy(result, shared=False)
+            self._finish(question, session_id, result, cacheable, start)
+            yield sse_event('done' if result.get('success') else 'error', result)
+
+        except Exception as e:
+            self.metrics.record(elapsed_ms(start), success=False)
+            yield sse_event('error', error_result(e))
+
+    def _streamed_result(self, answer_parts, citations, generation, stage):
+        """Result dict assembled from streamed chunks"""
+        if not answer_parts:
+            return {
+                'error': 'No response generated from Gemini',
+                'success': False
+            }
+        return {
+            'answer': ''.join(answer_parts),
+            'citations': citations,
+            **generation.extra,
+            'timings': {**generation.timings, 'generation_ms': elapsed_ms(stage)},
+            'success': True
+        }
+
+    # --- Async variants (client.aio, one event loop) ---
+
+    async def _astate_call(self, fn, *args, **kwargs):
+        """
+        _start()/_finish()/clear() off the event loop when they block: the
+        session store does disk I/O (SESSION_BACKEND=sqlite) or the answer
+        cache embeds questions (ANSWER_CACHE_SEMANTIC, one call per miss)
+        """
+        if self.session_store.blocking or (self.answer_cache is not None and self.answer_cache.embed_fn):
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def ahistory(self, session_id):
+        """Session messages for GET /api/history, off the event loop if the store blocks"""
+        if self.session_store.blocking:
+            return await asyncio.to_thread(self.session_store.get_messages, session_id)
+        return self.session_store.get_messages(session_id)
+
+    async def aclear(self, session_id):
+        """Async clear()"""
+        await self._astate_call(self.clear, session_id)
+
+    async def _aprepare(self, question, history):
+        """
+        prepare() off the event loop when it makes blocking calls (the
+        strategy's own, or local retrieval: query embedding + index search)
+        """
+        if self.strategy.prepare_blocks or self.retriever:
+            return await asyncio.to_thread(self.strategy.prepare, question, history)
+        return self.strategy.prepare(question, history)
+
+    async def aask(self, question, session_id, trace=False):
+        """Async ask(): the event loop serves other requests during the Gemini call"""
+        if not trace:
+            return await self._aask(question, session_id)
+
+        token = self.tracer.start_trace()
+        try:
+            result = await self._aask(question, session_id)
+        finally:
+            trace_block = self.tracer.end_trace(token)
+        return {**result, 'trace': trace_block}
+
+    async def _aanswer(self, question, history):
+        if not self.strategy.single_call:
+            return await asyncio.to_thread(self.strategy.answer, question, history)
+        generation = await self._aprepare(question, history)
+        stage = time.perf_counter()
+        response = await self.agenerate(generation.prompt, **generation.call_kwargs())
+        return self._result(response, generation, {**generation.timings, 'generation_ms': elapsed_ms(stage)})
+
+    async def _aask(self, question, session_id):
+        if not self.client:
+            return {'error': CLIENT_NOT_INITIALIZED, 'success': False}
+
+        start = time.perf_counter()
+        try:
+            history, cacheable, cached = await self._astate_call(self._start, question, session_id)
+            if cached:
+                result = {**cached, 'cached': True}
+                await self._astate_call(self._finish, question, session_id, result, cacheable, start, cached=True)
+                return result
+
+            key = self._flight_key(question, history)
+            if key:
+                result, shared = await self.inflight.ado(key, lambda: self._aanswer(question, history))
+            else:
+                result, shared = await self._aanswer(question, history), False
+
+            result = self._own_copy(result, shared)
+            await self._astate_call(self._finish, question, session_id, result, cacheable and not shared, start)
+            return result
+
+        except Exception as e:
+            self.metrics.record(elapsed_ms(start), success=False)
+            return error_result(e)
+
+    async def _astream_answer(self, question, history, answer):
+        """Yield 'delta' events while answering; the result is put in answer['result']"""
+        if not self.strategy.single_call:
+            result = answer['result'] = await asyncio.to_thread(self.strategy.answer, question, history)
+            if result.get('success'):
+                yield sse_event('delta', {'text': result['answer']})
+            return
+
+        generation = await self._aprepare(question, history)
+        answer_parts = []
+        citations = generation.citations or []
+
+        stage = time.perf_counter()
+        async for chunk in self.agenerate_stream(generation.prompt, **generation.call_kwargs()):
+            if not chunk.candidates:
+                continue
+            candidate = chunk.candidates[0]
+
+            text = candidate_text(candidate)
+            if text:
+                answer_parts.append(text)
+                yield sse_event('delta', {'text': text})
+
+            chunk_citations = extract_citations(candidate)
+            if chunk_citations:
+                citations = chunk_citations
+
+        answer['result'] = self._streamed_result(answer_parts, citations, generation, stage)
+
+    async def astream(self, question, session_id):
+        """Async stream(): same events"""
+        if not self.client:
+            yield sse_event('error', {'error': CLIENT_NOT_INITIALIZED, 'success': False})
+            return
+
+        start = time.perf_counter()
+        try:
+            history, cacheable, cached = await self._astate_call(self._start, question, session_id)
+            if cached:
+                result = {**cached, 'cached': True}
+                await self._astate_call(self._finish, question, session_id, result, cacheable, start, cached=True)
+                for event in self._stream_whole(result):
+                    yield event
+                return
+
+            key = self._flight_key(question, history)
+            future, leader = self.inflight.abegin(key) if key else (None, True)
+            if not leader:
+                result = self._own_copy(await asyncio.shield(future), shared=True)
+                await self._astate_call(self._finish, question, session_id, result, False, start)
+                for event in self._stream_whole(result):
+                    yield event
+                return
+
+            answer = {}
+            try:
+                async for event in self._astream_answer(question, history, answer):
+                    yield event
+            except BaseException as e:
+                if future:
+                    self.inflight.aend(key, future, error=e)
+                raise
+            if future:
+                self.inflight.aend(key, future, answer['result'])
+
+            result = self._own_copy(answer['result'], shared=False)
+            await self._astate_call(self._finish, question, session_id, result, cacheable, start)
+            yield sse_event('done' if result.get('success') else 'error', result)
+
+        except Exception as e:
+            self.metrics.record(elapsed_ms(start), success=False)
+            yield sse_event('error', error_result(e))
+
+    def prometheus_metrics(self):
+        """Text for GET /metrics"""
+        snapshot = self.metrics.snapshot()
+        return self.tracer.render({
+            'rag_requests_total': ('Chat requests', snapshot['requests']),
+            'rag_request_errors_total': ('Failed chat requests', snapshot['errors']),
+            'rag_cache_hits_total': ('Requests answered from the answer cache', snapshot['cache_hits']),
+        })
+
+    def clear(self, session_id):
+        """Clear chat history for a session"""
+        self.session_store.clear(session_id)
+
+    def health(self):
+        """Fields for /api/health"""
+        return {
+            'status': 'healthy',
+            'gemini_initialized': self.client is not None,
+            'file_search_store': self.config.FILE_SEARCH_STORE_ID is not None,
+            'strategy': self.strategy.name,
+            'answer_cache': self.answer_cache.stats() if self.answer_cache else None,
+            'cache_warmer': self.warmer.stats() if self.warmer else None,
+            'retrieval': self.retriever.stats() if self.retriever else 'file_search',
+            'prompt_cache_mode': self.prompt_cache_mode,
+            'prompt_cache': self.prompt_cache.stats() if self.prompt_cache else None,
+            'gemini': self.gemini.stats(),
+            'single_flight': {
+                'shared': self.inflight.shared,
+                'in_flight': self.inflight.in_flight()
+            } if self.inflight else None,
+            'sessions': self.session_store.stats(),
+            'metrics': self.metrics.snapshot(),
+            **self.strategy.health()
+        }
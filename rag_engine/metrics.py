@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Request metrics shared by every strategy
+Counters plus latency percentiles over a sliding window of recent requests
+"""
+import threading
+import time
+from collections import deque
+
+def elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() start"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+class Metrics:
+    """Thread-safe request counters and latency window"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)  # ms of recent answered requests
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+
+    def record(self, latency_ms, success=True, cached=False):
+        with self._lock:
+            self.requests += 1
+            if not success:
+                self.errors += 1
+            elif cached:
+                self.cache_hits += 1
+            else:
+                self._latencies.append(latency_ms)
+
+    def snapshot(self):
+        """Counters and p50/p95/p99 (ms, uncached requests only)"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'cache_hits': self.cache_hits,
+            }
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))], 1)
+
+        stats.update({'p50_ms': pct(50), 'p95_ms': pct(95), 'p99_ms': pct(99)})
+        return stats
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Explicit Gemini context caches for the static system instructions
+(PROMPT_CACHE_MODE=cached)
+
+Each distinct system instruction (plus the FileSearch tool, which must live
+in the cache too) is registered once with client.caches. Requests reference
+the cache name, so the instruction tokens are neither resent nor prefilled
+again. Caches are refreshed in the background before their TTL runs out.
+Create/update calls go through the engine's GeminiGuard (rate limit, retry,
+circuit breaker); the async engine resolves misses with lookup() on the
+event loop and get() in a thread.
+Instructions the API refuses to cache (e.g. below the minimum token count)
+fall back to a plain system_instruction for retry_after seconds.
+"""
+import threading
+import time
+
+from google.genai import types
+
+from answer_cache import prompt_fingerprint
+
+MISS = object()  # lookup(): no cache yet, get() would create it
+
+class PromptCache:
+    """system instruction → cachedContents name, created and refreshed on demand"""
+
+    def __init__(self, client, model_name, tools_fn, executor=None, ttl=3600,
+                 refresh_margin=300, retry_after=600, guard=None):
+        self.client = client
+        self.guard = guard  # GeminiGuard, or None to call the client directly
+        self.model_name = model_name
+        self.tools_fn = tools_fn  # () -> FileSearch tools list
+        self.executor = executor
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+
+        self._entries = {}     # key -> (cache name, expires_at monotonic)
+        self._failed = {}      # key -> monotonic time of the next attempt
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._create_lock = threading.Lock()  # One create at a time (no stampede)
+
+        self.hits = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def get(self, system_instruction, file_search=True):
+        """Cache name for the instruction, or None (send it as system_instruction)"""
+        name = self.lookup(system_instruction, file_search)
+        if name is not MISS:
+            return name
+
+        key = (prompt_fingerprint(system_instruction), file_search)
+        with self._create_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[1] > time.monotonic():
+                    return entry[0]
+            return self._create(key, system_instruction, file_search)
+
+    def lookup(self, system_instruction, file_search=True):
+        """
+        get() without any network call: the cache name, None, or MISS when
+        the cache has to be created (refreshes are scheduled in the background)
+        """
+        key = (prompt_fingerprint(system_instruction), file_search)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                if entry[1] - now < self.refresh_margin and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._schedule_refresh(key, entry[0], system_instruction, file_search)
+                return entry[0]
+            if self._failed.get(key, 0) > now:
+                return None
+        return MISS
+
+    def invalidate(self, name):
+        """Forget a cache the API no longer knows (expired or deleted)"""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[0] == name:
+                    del self._entries[key]
+
+    def stats(self):
+        """Counters for /api/health"""
+        with self._lock:
+            return {
+                'caches': len(self._entries),
+                'hits': self.hits,
+                'creates': self.creates,
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'ttl_seconds': self.ttl,
+            }
+
+    def _call(self, fn):
+        """One caches request, under the guard when there is one"""
+        if self.guard is None:
+            return fn()
+        return self.guard.call(fn)[0]
+
+    def _create(self, key, system_instruction, file_search):
+        config = types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            tools=self.tools_fn() if file_search else None,
+            ttl=f"{self.ttl}s",
+            display_name=f"rag-prompt-{key[0][:12]}",
+        )
+        try:
+            cache = self._call(lambda: self.client.caches.create(model=self.model_name, config=config))
+        except Exception as e:
+            print(f"⚠ Prompt cache create failed, using system_instruction: {str(e)}")
+            with self._lock:
+                self.failures += 1
+                self._failed[key] = time.monotonic() + self.retry_after
+            return None
+
+        with self._lock:
+            self.creates += 1
+            self._entries[key] = (cache.name, time.monotonic() + self.ttl)
+            self._failed.pop(key, None)
+        return cache.name
+
+    def _schedule_refresh(self, key, name, system_instruction, file_search):
+        args = (key, name, system_instruction, file_search)
+        if self.executor:
+            self.executor.submit(self._refresh, *args)
+        else:
+            threading.Thread(target=self._refresh, args=args, daemon=True).start()
+
+    def _refresh(self, key, name, system_instruction, file_search):
+        """Extend the TTL; recreate the cache if the update fails"""
+        try:
+            self._call(lambda: self.client.caches.update(
+                name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")))
+            with self._lock:
+                self.refreshes += 1
+                self._entries[key] = (name, time.monotonic() + self.ttl)
+        except Exception as e:
+            print(f"⚠ Prompt cache refresh failed, recreating: {str(e)}")
+            self.invalidate(name)
+            with self._create_lock:
+                self._create(key, system_instruction, file_search)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Prompt and response helpers shared by all strategies
+"""
+import json
+
+# Last 3 exchanges of the conversation go into the prompt
+HISTORY_MESSAGES = 6
+
+def history_lines(messages, max_messages=HISTORY_MESSAGES):
+    """Recent conversation as 'Role: content' lines"""
+    recent = messages[-max_messages:] if len(messages) > max_messages else messages
+    return [f"{msg.role.capitalize()}: {msg.content}" for msg in recent]
+
+def compose_prompt(system_prompt, question, history=None, context=None):
+    """
+    System prompt + (retrieved excerpts) + recent history + question
+    history is a list of 'Role: content' lines (see history_lines)
+    """
+    prompt = system_prompt
+    if context is not None:
+        prompt += f"\n\nTHÔNG TIN TỪ TÀI LIỆU / DOCUMENT EXCERPTS:\n{context}"
+    if history:
+        return prompt + "\n\nCuộc hội thoại trước:\n" + "\n".join(history) + f"\n\nCâu hỏi mới: {question}"
+    return prompt + f"\n\nCâu hỏi: {question}"
+
+def extract_citations(candidate):
+    """Extract citations from the grounding metadata of a candidate"""
+    citations = []
+    if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
+        grounding = candidate.grounding_metadata
+        if hasattr(grounding, 'grounding_chunks') and grounding.grounding_chunks:
+            for chunk in grounding.grounding_chunks:
+                if hasattr(chunk, 'web') and chunk.web:
+                    citations.append({
+                        'title': chunk.web.title if hasattr(chunk.web, 'title') else 'Unknown',
+                        'uri': chunk.web.uri if hasattr(chunk.web, 'uri') else ''
+                    })
+    return citations
+
+def candidate_text(candidate):
+    """Text of a candidate ('' if it has no parts)"""
+    if not candidate.content or not candidate.content.parts:
+        return ""
+    return ''.join(part.text for part in candidate.content.parts if part.text)
+
+def parse_json_response(text):
+    """Parse JSON from a model answer, with or without a markdown code block"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    return json.loads(text)
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
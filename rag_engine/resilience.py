@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+Protection around Gemini calls: rate limit, retry, circuit breaker, coalescing
+
+Every generate_content / embed_content call of the engine goes through one
+GeminiGuard:
+    1. circuit breaker: fail fast while Gemini keeps failing
+    2. token bucket: at most GEMINI_RATE_LIMIT_RPS calls per second
+    3. jittered exponential retry on 429 / 5xx / connection errors
+    4. identical in-flight requests share one upstream call (single-flight)
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import httpx
+from google.genai import errors
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class GeminiUnavailableError(Exception):
+    """Gemini is not called at all (breaker open or rate limit wait too long)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitOpenError(GeminiUnavailableError):
+    pass
+
+class RateLimitExceeded(GeminiUnavailableError):
+    pass
+
+def error_result(error, prefix='Error querying Gemini'):
+    """Error result dict; retry_after (seconds) when Gemini was not called at all"""
+    result = {
+        'error': f'{prefix}: {str(error)}',
+        'success': False
+    }
+    if isinstance(error, GeminiUnavailableError):
+        result['retry_after'] = error.retry_after
+    return result
+
+def is_retryable(error):
+    """Transient upstream errors: rate limited, overloaded, connection problems"""
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS
+    return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
+
+class TokenBucket:
+    """At most `rate` acquisitions per second, bursts up to `burst` (rate 0 = unlimited)"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.waits = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, deadline):
+        """0 when a token was taken, else seconds to wait (None: past the deadline)"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                self.rejected += 1
+                return None
+            self.waits += 1
+            return wait
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting up to timeout seconds (None: forever); False if it timed out"""
+        if not self.rate:
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self._reserve(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            time.sleep(wait)
+
+    async def aacquire(self, timeout=None):
+        """acquire() without blocking the event loop"""
+        if not self.rate:
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self._reserve(deadline)
+            if wait is None:
+                return False
+            if not wait:
+                return True
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate_per_second': self.rate or None,
+                'burst': self.burst,
+                'waits': self.waits,
+                'rejected': self.rejected,
+            }
+
+class CircuitBreaker:
+    """
+    closed → open after `threshold` consecutive upstream failures; open
+    rejects calls for `reset_timeout` seconds, then half_open lets one probe
+    through: success closes the breaker, failure opens it again
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        if not self.threshold:
+            return
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError('Gemini is temporarily unavailable (circuit open)', max(1, round(remaining)))
+
+    def release_probe(self):
+        """The half-open probe never reached Gemini (rate limited, cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.threshold and self.failures >= self.threshold):
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'open_count': self.open_count,
+                'rejected': self.rejected,
+            }
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share the first caller's result
+    do()/ado() wrap a function; begin()/end() let a leader that produces its
+    result incrementally (e.g. a stream) publish it when done.
+    """
+
+    def __init__(self):
+        self._calls = {}    # key -> concurrent.futures.Future (threads)
+        self._acalls = {}   # key -> asyncio.Future (event loop)
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def begin(self, key):
+        """(future, leader): the leader must call end(); followers wait on future.result()"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def end(self, key, future, result=None, error=None):
+        """Publish the leader's result (or error) and close the flight"""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            if not isinstance(error, Exception):  # GeneratorExit, KeyboardInterrupt...
+                error = RuntimeError(f'Shared request did not finish ({type(error).__name__})')
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """(result, shared): shared=True when another caller made the call"""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self.end(key, future, error=e)
+            raise
+        self.end(key, future, result)
+        return result, False
+
+    def abegin(self, key):
+        """Async begin(); callers must share one event loop (followers: await asyncio.shield(future))"""
+        future = self._acalls.get(key)
+        if future is not None:
+            self.shared += 1
+            return future, False
+        future = self._acalls[key] = asyncio.get_running_loop().create_future()
+        return future, True
+
+    def aend(self, key, future, result=None, error=None):
+        """
+        Async end(); a cancelled leader (client disconnect) fails its
+        followers with a RuntimeError instead of cancelling them too
+        """
+        if self._acalls.get(key) is future:
+            del self._acalls[key]
+        if error is not None:
+            if not isinstance(error, Exception):  # CancelledError, GeneratorExit...
+                error = RuntimeError(f'Shared request did not finish ({type(error).__name__})')
+            future.set_exception(error)
+            future.exception()  # Retrieved: no "never retrieved" warning without followers
+        else:
+            future.set_result(result)
+
+    async def ado(self, key, coro_fn):
+        """Async do()"""
+        future, leader = self.abegin(key)
+        if not leader:
+            return await asyncio.shield(future), True
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self.aend(key, future, error=e)
+            raise
+        self.aend(key, future, result)
+        return result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls) + len(self._acalls)
+
+class GeminiGuard:
+    """Rate limit + retry + circuit breaker + coalescing for one Gemini client"""
+
+    def __init__(self, rate=0.0, burst=10, rate_limit_wait=10.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, breaker_threshold=5, breaker_reset=30.0,
+                 coalesce=True):
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.flight = SingleFlight() if coalesce else None
+        self.rate_limit_wait = rate_limit_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            rate=config.GEMINI_RATE_LIMIT_RPS,
+            burst=config.GEMINI_RATE_LIMIT_BURST,
+            rate_limit_wait=config.GEMINI_RATE_LIMIT_WAIT,
+            max_retries=config.GEMINI_MAX_RETRIES,
+            backoff_base=config.GEMINI_RETRY_BASE_DELAY,
+            backoff_max=config.GEMINI_RETRY_MAX_DELAY,
+            breaker_threshold=config.GEMINI_BREAKER_THRESHOLD,
+            breaker_reset=config.GEMINI_BREAKER_RESET,
+            coalesce=config.GEMINI_COALESCE,
+        )
+
+    def backoff(self, attempt):
+        """Full jitter: uniform(0, min(max, base * 2^attempt))"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _admit(self, acquired):
+        if not acquired:
+            self.breaker.release_probe()
+            raise RateLimitExceeded('Gemini rate limit reached, please retry', max(1, round(self.rate_limit_wait)))
+
+    def _failed(self, error, attempt, span):
+        """Record a failed attempt; True if it should be retried"""
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()  # Upstream answered (e.g. 400): not an outage
+        with self._lock:
+            self.failures += 1
+            if retryable and attempt < self.max_retries:
+                self.retries += 1
+            else:
+                return False
+        if span is not None:
+            span.retries += 1
+        return True
+
+    def _call(self, fn, span):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self._admit(self.limiter.acquire(self.rate_limit_wait))
+            try:
+                result = fn()
+            except Exception as e:
+                if not self._failed(e, attempt, span):
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _acall(self, coro_fn, span):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self._admit(await self.limiter.aacquire(self.rate_limit_wait))
+            try:
+                result = await coro_fn()
+            except Exception as e:
+                if not self._failed(e, attempt, span):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release_probe()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def call(self, fn, span=None, key=None):
+        """
+        Run fn() (one upstream request) under the guard
+        With a key, concurrent calls with the same key share one request;
+        returns (result, shared).
+        """
+        if key is not None and self.flight:
+            return self.flight.do(key, lambda: self._call(fn, span))
+        return self._call(fn, span), False
+
+    async def acall(self, coro_fn, span=None, key=None):
+        """Async call(); coro_fn() returns the awaitable upstream request"""
+        if key is not None and self.flight:
+            return await self.flight.ado(key, lambda: self._acall(coro_fn, span))
+        return await self._acall(coro_fn, span), False
+
+    def stats(self):
+        """Retry / breaker / limiter state for /api/health"""
+        with self._lock:
+            counters = {'retries': self.retries, 'failed_attempts': self.failures}
+        return {
+            **counters,
+            'circuit_breaker': self.breaker.stats(),
+            'rate_limit': self.limiter.stats(),
+            'coalesced': self.flight.shared if self.flight else None,
+            'in_flight_coalescable': self.flight.in_flight() if self.flight else None,
+        }
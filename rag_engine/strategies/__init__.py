@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Answering strategies, selected by name (RAG_STRATEGY in config.py)
+"""
+import importlib
+
+# name -> 'module:Class'; imported on demand so optional dependencies
+# (langgraph) are only needed by the strategy that uses them
+STRATEGIES = {
+    'plain': 'rag_engine.strategies.plain:PlainStrategy',
+    'dynamic': 'rag_engine.strategies.dynamic:DynamicPromptStrategy',
+    'few_shot': 'rag_engine.strategies.few_shot:FewShotStrategy',
+    'graph': 'rag_engine.strategies.graph:GraphStrategy',
+}
+
+def create_strategy(name, engine):
+    """Instantiate the strategy registered under name"""
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown RAG strategy '{name}' (choose from: {', '.join(STRATEGIES)})")
+    module_name, class_name = STRATEGIES[name].split(':')
+    strategy_class = getattr(importlib.import_module(module_name), class_name)
+    return strategy_class(engine)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Strategy interface: how one question is turned into an answer
+"""
+import inspect
+import time
+
+from answer_cache import prompt_fingerprint
+from rag_engine.metrics import elapsed_ms
+from rag_engine.prompting import compose_prompt
+
+class Generation:
+    """
+    The final model call a strategy asks the engine to make
+
+    file_search: attach the FileSearch tool (False when the strategy already
+    retrieved the excerpts itself). system_instruction: static instructions
+    sent apart from the prompt (see PROMPT_CACHE_MODE). citations/extra are
+    merged into the result; timings are the strategy's own stages (ms).
+    """
+    __slots__ = ('prompt', 'file_search', 'temperature', 'max_output_tokens',
+                 'system_instruction', 'citations', 'extra', 'timings')
+
+    def __init__(self, prompt, file_search=True, temperature=None, max_output_tokens=None,
+                 system_instruction=None, citations=None, extra=None, timings=None):
+        self.prompt = prompt
+        self.file_search = file_search
+        self.temperature = temperature
+        self.max_output_tokens = max_output_tokens
+        self.system_instruction = system_instruction
+        self.citations = citations
+        self.extra = extra or {}
+        self.timings = timings or {}
+
+    def call_kwargs(self):
+        """Keyword arguments for RAGEngine.generate()"""
+        return {
+            'file_search': self.file_search,
+            'temperature': self.temperature,
+            'max_output_tokens': self.max_output_tokens,
+            'system_instruction': self.system_instruction,
+        }
+
+class Strategy:
+    """
+    Base class of the answering strategies
+
+    Single-call strategies implement prepare() and the engine makes (or
+    streams) the final call. Multi-step strategies override answer() instead
+    and report single_call = False.
+    """
+    name = 'base'
+    single_call = True
+    prepare_blocks = False  # prepare() makes network calls (run off the event loop)
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def prepare(self, question, history):
+        """Return the Generation for a question (history includes the question)"""
+        raise NotImplementedError
+
+    def build_generation(self, instructions, question, history=None, context=None, **kwargs):
+        """
+        Generation with the static instructions inline (PROMPT_CACHE_MODE=off)
+        or as system_instruction, where Gemini can cache them
+        """
+        if context is None:
+            context = self.local_context(question, kwargs)
+        if self.engine.prompt_cache_mode == 'off':
+            return Generation(compose_prompt(instructions, question, history, context), **kwargs)
+        return Generation(compose_prompt('', question, history, context).lstrip('\n'),
+                          system_instruction=instructions, **kwargs)
+
+    def local_context(self, question, kwargs):
+        """
+        Excerpts from the local index for a generation that would use
+        FileSearch (RETRIEVAL_BACKEND=local), else None; updates the
+        Generation kwargs (no FileSearch tool, citations, retrieval_ms)
+        """
+        if not self.engine.retriever or not kwargs.get('file_search', True):
+            return None
+        stage = time.perf_counter()
+        context, citations = self.engine.retrieve(question)
+        kwargs['file_search'] = False
+        if kwargs.get('citations') is None:
+            kwargs['citations'] = citations
+        kwargs['timings'] = {**(kwargs.get('timings') or {}), 'retrieval_ms': elapsed_ms(stage)}
+        return context
+
+    def fast_answer(self, question):
+        """Answer dict for a standalone question without calling Gemini, or None"""
+        return None
+
+    def answer(self, question, history):
+        """Full answer dict; only multi-step strategies override this"""
+        return self.engine.run_generation(self.prepare(question, history))
+
+    def fingerprint(self):
+        """Changes whenever the prompts change (part of the answer cache namespace)"""
+        return prompt_fingerprint(inspect.getsource(inspect.getmodule(type(self))))
+
+    def register_routes(self, app):
+        """
+        Hook for strategy-specific endpoints, on the Flask apps and on the
+        Quart app (app_async.py): views return dicts, which both serialize to JSON
+        """
+
+    def health(self):
+        """Strategy-specific fields for /api/health"""
+        return {}
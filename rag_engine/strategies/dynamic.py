@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Dynamic-prompt strategy (app_improved.py)
+Query intent analysis (local classifier first, LLM fallback) selects the
+answer instructions. PIPELINE_MODE runs the analysis and a speculative
+retrieval concurrently, so the final call needs no FileSearch round trip.
+"""
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from answer_cache import prompt_fingerprint
+from intent_classifier import load_classifier, record_label
+from rag_engine.metrics import elapsed_ms
+from rag_engine.prompting import (
+    candidate_text, extract_citations, history_lines, parse_json_response
+)
+from rag_engine.strategies.base import Strategy
+
+DEFAULT_ANALYSIS = {"intent": "general", "scope": "multiple", "focus": "all"}
+
+RETRIEVAL_PROMPT = """Tìm và trích NGUYÊN VĂN các đoạn trong tài liệu liên quan đến câu hỏi sau.
+KHÔNG trả lời câu hỏi, CHỈ liệt kê các đoạn trích kèm tên tài liệu.
+
+Find and quote VERBATIM the passages from the documents that are relevant to the question below.
+Do NOT answer the question, ONLY list the excerpts with their document names.
+
+Câu hỏi / Question: {question}"""
+
+def run_timed(fn, *args):
+    """Run fn(*args) and return (result, elapsed ms)"""
+    start = time.perf_counter()
+    return fn(*args), elapsed_ms(start)
+
+def build_dynamic_prompt(user_question, query_analysis):
+    """
+    Build system prompt dynamically based on query analysis
+    No hardcoded keywords!
+    """
+
+    intent = query_analysis.get("intent", "general")
+    scope = query_analysis.get("scope", "multiple")
+    focus = query_analysis.get("focus", "all")
+
+    # Base prompt
+    base_prompt = """Bạn là trợ lý AI chuyên nghiệp, trả lời câu hỏi dựa trên tài liệu.
+
+QUY TẮC CƠ BẢN:
+1. Trả lời CHÍNH XÁC dựa trên nội dung tài liệu
+2. Sử dụng ngôn ngữ của câu hỏi (Việt → Việt, English → English)
+3. Nếu không có thông tin trong tài liệu, nói rõ ràng
+4. Trích dẫn nguồn khi có thể
+"""
+
+    # Dynamic instructions based on intent
+    if intent == "list_names":
+        specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (cho câu hỏi liệt kê):
+- CHỈ liệt kê tên/danh sách được yêu cầu
+- KHÔNG mô tả chi tiết từng mục
+- Format: Bullet points hoặc danh sách ngắn gọn
+- Độ dài: 1-2 câu
+
+VÍ DỤ:
+Q: Các loại X được đề cập?
+A: Các loại X bao gồm: A, B, C, D.
+"""
+
+    elif intent == "describe_property":
+        if focus == "name":
+            specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (cho câu hỏi về tên):
+- CHỈ trả lời tên/danh sách
+- KHÔNG thêm mô tả hoặc đặc điểm
+- Độ dài: 1-2 câu
+"""
+        else:
+            specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (cho câu hỏi về thuộc tính):
+- CHỈ mô tả thuộc tính/đặc điểm được hỏi
+- KHÔNG đề cập đến các thuộc tính khác
+- Nếu hỏi về MỘT thuộc tính cụ thể, CHỈ trả lời thuộc tính đó
+- Độ dài: 2-3 câu
+
+VÍ DỤ:
+Q: Khả năng X của đối tượng Y?
+A: Đối tượng Y có khả năng X là [thông tin từ tài liệu]. (KHÔNG đề cập khả năng Z, W, etc.)
+"""
+
+    elif intent == "explain_concept":
+        specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (cho câu hỏi giải thích):
+- Giải thích khái niệm được hỏi
+- Có thể bao gồm ví dụ nếu có trong tài liệu
+- Độ dài: 3-4 câu
+- Tập trung vào khái niệm chính, không lan man
+"""
+
+    elif intent == "compare":
+        specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (cho câu hỏi so sánh):
+- So sánh các đối tượng được yêu cầu
+- CHỈ so sánh về khía cạnh được hỏi (nếu có)
+- Format: Bảng hoặc danh sách so sánh
+- Độ dài: 3-5 câu
+"""
+
+    else:  # general
+        specific_instruction = """
+HƯỚNG DẪN CỤ THỂ (câu hỏi chung):
+- Trả lời trực tiếp câu hỏi
+- Ngắn gọn, súc tích (2-4 câu)
+- Tập trung vào thông tin chính
+- KHÔNG thêm thông tin không được hỏi
+"""
+
+    # Scope instruction
+    if scope == "single":
+        scope_instruction = "\n⚠ LƯU Ý: Câu hỏi chỉ hỏi về MỘT đối tượng cụ thể. CHỈ trả lời về đối tượng đó, KHÔNG liệt kê các đối tượng khác."
+    else:
+        scope_instruction = ""
+
+    # Combine all
+    final_prompt = f"""{base_prompt}
+
+{specific_instruction}
+{scope_instruction}
+
+QUAN TRỌNG:
+- Mỗi câu hỏi là ĐỘC LẬP
+- KHÔNG gộp nhiều thông tin không liên quan
+- KHÔNG thêm thông tin "bonus" dù có trong tài liệu
+- Độ dài tối đa: 100 từ
+
+---
+
+You are a professional AI assistant answering questions based on documents.
+
+BASIC RULES:
+1. Answer ACCURATELY based on document content
+2. Use question's language (Vietnamese → Vietnamese, English → English)
+3. If no info in documents, state clearly
+4. Cite sources when possible
+
+IMPORTANT:
+- Each question is INDEPENDENT
+- Do NOT merge unrelated information
+- Do NOT add "bonus" info even if in document
+- Max length: 100 words
+"""
+
+    return final_prompt
+
+class DynamicPromptStrategy(Strategy):
+    name = 'dynamic'
+    prepare_blocks = True  # analysis / retrieval calls
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        config = engine.config
+        self.pipeline_mode = config.PIPELINE_MODE
+        self.analysis_deadline = config.ANALYSIS_DEADLINE_MS / 1000.0
+        self.confidence_threshold = config.INTENT_CONFIDENCE_THRESHOLD
+        self.record_labels = config.INTENT_RECORD_LABELS
+        self.max_output_tokens = config.MAX_OUTPUT_TOKENS
+
+        # Local intent classifier (skips the analysis LLM call when confident)
+        self.intent_model = load_classifier() if config.INTENT_CLASSIFIER_ENABLED else None
+
+    def analyze(self, user_question, use_local=True):
+        """
+        Use LLM to analyze query intent and extract key aspects
+        This is a lightweight pre-processing step without hardcoded keywords
+        The local classifier answers first; the LLM is only called when its
+        confidence is below INTENT_CONFIDENCE_THRESHOLD
+        """
+        if use_local and self.intent_model:
+            analysis, confidence = self.intent_model.predict(user_question)
+            if confidence >= self.confidence_threshold:
+                return {**analysis, 'source': 'local', 'confidence': round(confidence, 3)}
+
+        if not self.engine.client:
+            return {"enhanced_query": user_question, "intent": "general"}
+
+        try:
+            analysis = self.llm_analysis(user_question)
+        except Exception as e:
+            print(f"Query analysis failed: {e}")
+            return {"enhanced_query": user_question, **DEFAULT_ANALYSIS}
+
+        # Labelled history for retraining the local classifier (LLM analyses only)
+        if self.record_labels:
+            record_label(user_question, analysis)
+        return analysis
+
+    def llm_analysis(self, user_question):
+        """Analysis by the LLM; raises on any failure instead of returning a default"""
+        analysis_prompt = f"""Phân tích câu hỏi sau và trả về JSON:
+
+Câu hỏi: "{user_question}"
+
+Phân tích:
+1. Intent: Câu hỏi muốn hỏi về gì? (list_names, describe_property, explain_concept, compare, other)
+2. Scope: Hỏi về một đối tượng cụ thể hay nhiều đối tượng?
+3. Focus: Khía cạnh nào đang được hỏi? (name, property, characteristic, example, all)
+
+Trả về JSON format:
+{{
+    "intent": "list_names/describe_property/explain_concept/compare/other",
+    "scope": "single/multiple",
+    "focus": "name/property/characteristic/example/all",
+    "enhanced_query": "câu hỏi được làm rõ hơn"
+}}
+
+Chỉ trả về JSON, không giải thích thêm."""
+
+        response = self.engine.generate(
+            analysis_prompt,
+            file_search=False,
+            temperature=0.0,  # Deterministic analysis
+            max_output_tokens=200,
+            call='analysis'
+        )
+        analysis = parse_json_response(candidate_text(response.candidates[0]))
+        if not isinstance(analysis, dict):
+            raise ValueError(f"Analysis is not a JSON object: {analysis!r}")
+        return analysis
+
+    def retrieve(self, user_question):
+        """
+        Speculative retrieval: FileSearch call for relevant excerpts of the raw question
+        Returns (context text, citations)
+        """
+        if self.engine.retriever:
+            return self.engine.retrieve(user_question)
+        response = self.engine.generate(
+            RETRIEVAL_PROMPT.format(question=user_question),
+            temperature=0.0,  # Deterministic retrieval
+            max_output_tokens=self.max_output_tokens,
+            call='retrieval'
+        )
+        if not response.candidates:
+            return "", []
+        candidate = response.candidates[0]
+        return candidate_text(candidate), extract_citations(candidate)
+
+    def prepare(self, question, history):
+        if self.pipeline_mode:
+            return self._prepare_pipeline(question, history)
+        return self._prepare_sequential(question, history)
+
+    def _prepare_sequential(self, question, history):
+        """Original flow: analysis, then one FileSearch + generation call"""
+        stage = time.perf_counter()
+        query_analysis = self.analyze(question)
+        timings = {'analysis_ms': elapsed_ms(stage)}
+
+        system_prompt = build_dynamic_prompt(question, query_analysis)
+        enhanced_query = query_analysis.get("enhanced_query", question)
+
+        return self.build_generation(
+            system_prompt, enhanced_query, history_lines(history),
+            max_output_tokens=self.max_output_tokens,
+            extra={'query_analysis': query_analysis},  # Returned for debugging
+            timings=timings
+        )
+
+    def _prepare_pipeline(self, question, history):
+        """
+        Pipeline flow: intent analysis and speculative retrieval start together.
+        The analysis gets ANALYSIS_DEADLINE_MS from when a worker starts it (an
+        analysis still queued after that long is cancelled); past the deadline
+        the default (general) instructions are used. The final prompt combines
+        the dynamic instructions with the retrieved excerpts, so the last call
+        needs no FileSearch tool.
+        """
+        started = threading.Event()
+
+        def analysis():
+            started.set()
+            return run_timed(self.analyze, question)
+
+        analysis_future = self.engine.submit(analysis)
+        retrieval_future = self.engine.submit(run_timed, self.retrieve, question)
+        timings = {}
+
+        # Wait for the analysis, but not past the deadline
+        try:
+            if not started.wait(self.analysis_deadline):
+                raise FutureTimeout()
+            query_analysis, timings['analysis_ms'] = analysis_future.result(timeout=self.analysis_deadline)
+            timings['analysis_skipped'] = False
+        except FutureTimeout:
+            # Keep going with default instructions. cancel() frees the worker slot of
+            # a queued analysis; one already running finishes in the background.
+            analysis_future.cancel()
+            query_analysis = {"enhanced_query": question, **DEFAULT_ANALYSIS}
+            timings['analysis_ms'] = None
+            timings['analysis_skipped'] = True
+
+        # Build dynamic prompt while retrieval may still be running
+        system_prompt = build_dynamic_prompt(question, query_analysis)
+        enhanced_query = query_analysis.get("enhanced_query", question)
+
+        (retrieved_context, citations), timings['retrieval_ms'] = retrieval_future.result()
+
+        return self.build_generation(
+            system_prompt, enhanced_query, history_lines(history), context=retrieved_context,
+            file_search=False,  # Generate from the excerpts, no FileSearch round trip
+            max_output_tokens=self.max_output_tokens,
+            citations=citations,
+            extra={'query_analysis': query_analysis},
+            timings=timings
+        )
+
+    def fingerprint(self):
+        return prompt_fingerprint(
+            super().fingerprint(),
+            'pipeline' if self.pipeline_mode else 'sequential'
+        )
+
+    def health(self):
+        return {
+            'pipeline_mode': self.pipeline_mode,
+            'intent_classifier_loaded': self.intent_model is not None,
+            'version': 'improved'
+        }
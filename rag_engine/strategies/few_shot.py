@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Few-shot strategy (app_with_examples.py)
+The most similar Q&A examples (example_index.py) are put into the prompt
+so the model copies their answer format and length. With EXAMPLE_FAST_PATH,
+questions that (almost) match an example are answered without Gemini.
+Standards codes in the question (code_index.py) narrow both: examples
+mentioning the codes are preferred, and an example asking about exactly
+those codes answers at the lower EXAMPLE_CODE_MATCH_THRESHOLD.
+"""
+import threading
+import time
+from pathlib import Path
+
+from answer_cache import normalize_question
+from code_index import CodeIndex
+from example_index import ExampleIndex
+from qa_example_log import default_examples_file, read_examples
+from rag_engine.metrics import elapsed_ms
+from rag_engine.prompting import compose_prompt, history_lines
+from rag_engine.strategies.base import Generation, Strategy
+from text_normalize import standard_codes
+
+FEW_SHOT_HEADER = """Bạn là trợ lý AI chuyên nghiệp, trả lời câu hỏi dựa trên TÀI LIỆU được cung cấp.
+
+⚠️ QUY TẮC BẮT BUỘC:
+1. BẮT BUỘC SỬ DỤNG FileSearch Tool để tìm thông tin từ tài liệu
+2. Trả lời PHẢI DỰA VÀO nội dung từ tài liệu, KHÔNG PHẢI từ các ví dụ
+3. Các ví dụ bên dưới CHỈ để học FORMAT/STYLE trả lời, KHÔNG DÙNG NỘI DUNG của chúng
+4. Ngôn ngữ: Vietnamese → Vietnamese, English → English
+
+---
+
+"""
+
+FEW_SHOT_EXAMPLES_TITLE = """VÍ DỤ FORMAT TRẢ LỜI (CHỈ HỌC FORMAT, KHÔNG COPY NỘI DUNG):
+
+"""
+
+FEW_SHOT_GUIDE = """
+
+🎯 HƯỚNG DẪN QUAN TRỌNG:
+
+VỀ NỘI DUNG:
+✅ SỬ DỤNG FileSearch để tìm thông tin từ TÀI LIỆU
+✅ Trả lời dựa 100% vào nội dung TÌM ĐƯỢC từ tài liệu
+❌ TUYỆT ĐỐI KHÔNG copy/paraphrase nội dung từ các ví dụ trên
+❌ KHÔNG dùng thông tin từ ví dụ, kể cả khi câu hỏi giống nhau
+
+VỀ FORMAT:
+✅ HỌC độ dài câu trả lời từ ví dụ (ngắn gọn/chi tiết)
+✅ HỌC cách tổ chức (bullet points/prose/liệt kê)
+✅ HỌC style (formal/concise/structured)
+
+---
+
+You are a professional AI assistant answering questions based on PROVIDED DOCUMENTS.
+
+⚠️ MANDATORY RULES:
+1. MUST USE FileSearch Tool to retrieve information from documents
+2. Answer MUST BE BASED ON document content, NOT from examples
+3. Examples below are ONLY for learning FORMAT/STYLE, DO NOT use their content
+4. Language: Vietnamese → Vietnamese, English → English
+
+🎯 CRITICAL INSTRUCTIONS:
+
+FOR CONTENT:
+✅ USE FileSearch to find information from DOCUMENTS
+✅ Answer based 100% on content FOUND in documents
+❌ ABSOLUTELY DO NOT copy/paraphrase content from examples above
+❌ DO NOT use information from examples, even if question is similar
+
+FOR FORMAT:
+✅ LEARN answer length from examples (concise/detailed)
+✅ LEARN organization style (bullet points/prose/lists)
+✅ LEARN tone (formal/concise/structured)
+
+"""
+
+def format_examples(similar_examples):
+    """The few-shot examples block (the only part of the instructions that varies)"""
+    block = FEW_SHOT_EXAMPLES_TITLE
+    for i, example in enumerate(similar_examples or [], 1):
+        block += f"""
+VÍ DỤ {i} - CHỈ ĐỂ HỌC FORMAT (KHÔNG DÙNG NỘI DUNG NÀY):
+
+Câu hỏi: {example['question']}
+
+Câu trả lời: {example['answer']}
+
+---
+"""
+    return block
+
+def build_few_shot_prompt(user_question, similar_examples):
+    """
+    Build prompt with few-shot examples
+    Examples teach the model the desired answer format and style
+    """
+    return FEW_SHOT_HEADER + format_examples(similar_examples) + FEW_SHOT_GUIDE
+
+class FewShotStrategy(Strategy):
+    name = 'few_shot'
+
+    def __init__(self, engine, examples_file=None):
+        super().__init__(engine)
+        self.examples_file = examples_file  # None: qa_examples.jsonl, else qa_examples.json
+        self.index_path = engine.config.EXAMPLE_INDEX_PATH
+        self.max_output_tokens = engine.config.MAX_OUTPUT_TOKENS
+        self.examples = []
+
+        # Fast path: answer near-identical questions from the examples
+        self.fast_path = engine.config.EXAMPLE_FAST_PATH
+        self.fast_path_threshold = engine.config.EXAMPLE_FAST_PATH_THRESHOLD
+        self.code_match_threshold = engine.config.EXAMPLE_CODE_MATCH_THRESHOLD
+        self.fast_path_counts = {'lookups': 0, 'curated_hits': 0, 'cached_hits': 0, 'code_hits': 0}
+        self._fast_path_lock = threading.Lock()
+
+        # Few-shot retrieval index (n-gram counts persisted to EXAMPLE_INDEX_PATH)
+        self.example_index = ExampleIndex.load(self.index_path, fold=engine.config.EXAMPLE_INDEX_FOLD_DIACRITICS)
+        # Standards code -> examples, and the codes each example question names
+        self.code_index = (CodeIndex(), [])
+        self.load_examples()
+
+    def load_examples(self):
+        """Load Q&A examples (JSONL log or JSON file) and update the retrieval index"""
+        examples_file = Path(self.examples_file or default_examples_file())
+        if not examples_file.exists():
+            print(f"⚠ Warning: {examples_file} not found")
+            print("  Run: python3 load_qa_examples.py first")
+            return False
+
+        try:
+            examples = read_examples(examples_file)
+            print(f"✓ Loaded {len(examples)} Q&A examples from {examples_file}")
+
+            # Only new or changed questions are processed
+            changes = self.example_index.build(examples)
+            self.examples = examples
+            self.code_index = (
+                CodeIndex.build((i, f"{ex['question']}\n{ex['answer']}") for i, ex in enumerate(examples)),
+                [standard_codes(ex['question']) for ex in examples]
+            )
+            print(f"✓ Example index: {changes['added']} added, {changes['reused']} reused, "
+                  f"{changes['removed']} removed; {len(self.code_index[0])} standards codes")
+
+            if changes['added'] or changes['removed'] or not Path(self.index_path).exists():
+                try:
+                    self.example_index.save(self.index_path)
+                except OSError as e:
+                    print(f"⚠ Could not save example index: {str(e)}")
+
+            # Cached answers were shaped by the old examples
+            if self.engine.answer_cache:
+                self.engine.answer_cache.clear()
+            return True
+        except Exception as e:
+            print(f"✗ Error loading Q&A examples: {str(e)}")
+            return False
+
+    def find_similar_examples(self, user_question, top_k=3):
+        """
+        Find most similar Q&A examples (char n-gram TF-IDF cosine similarity)
+        Returns top K most similar examples for few-shot prompting; examples
+        mentioning the question's standards codes come first
+        """
+        codes = standard_codes(user_question)
+        positions = self.code_index[0].lookup(codes) if codes else None
+        if positions is None:
+            return self.example_index.search(user_question, top_k=top_k)
+
+        found = self.example_index.search(user_question, top_k=top_k, candidates=positions)
+        seen = {ex['question'] for ex in found}
+        for ex in self.example_index.search(user_question, top_k=top_k + len(found)):
+            if len(found) >= top_k:
+                break
+            if ex['question'] not in seen:
+                found.append(ex)
+        return found
+
+    def code_match(self, question):
+        """
+        Best example whose question names exactly the question's standards
+        codes, if it scores at least EXAMPLE_CODE_MATCH_THRESHOLD
+        """
+        codes = standard_codes(question)
+        if not codes or not self.code_match_threshold:
+            return None, codes
+        code_index, question_codes = self.code_index
+        positions = code_index.lookup(codes)
+        if positions is None:
+            return None, codes
+        same = [p for p in positions.tolist() if p < len(question_codes) and question_codes[p] == codes]
+        matches = self.example_index.search(question, top_k=1, candidates=same) if same else []
+        if matches and matches[0]['similarity'] >= self.code_match_threshold:
+            return matches[0], codes
+        return None, codes
+
+    def fast_answer(self, question):
+        """
+        Answer without Gemini when the best example scores at least
+        EXAMPLE_FAST_PATH_THRESHOLD (or names the same standards codes and
+        scores EXAMPLE_CODE_MATCH_THRESHOLD): a cached model answer for the
+        example question ('cached'/'auto') or the curated answer ('curated'/'auto')
+        """
+        if self.fast_path == 'off':
+            return None
+
+        start = time.perf_counter()
+        matches = self.example_index.search(question, top_k=1)
+        with self._fast_path_lock:
+            self.fast_path_counts['lookups'] += 1
+        codes = None
+        if matches and matches[0]['similarity'] >= self.fast_path_threshold:
+            example = matches[0]
+        else:
+            example, codes = self.code_match(question)
+            if example is None:
+                return None
+        matched = {
+            'id': example.get('id'),
+            'question': example['question'],
+            'similarity': round(float(example['similarity']), 4)
+        }
+        if codes:
+            matched['codes'] = sorted(codes)
+
+        # Exact (normalized) repeats were already looked up in the answer cache
+        answer_cache = self.engine.answer_cache
+        if (self.fast_path in ('cached', 'auto') and answer_cache
+                and normalize_question(example['question']) != normalize_question(question)):
+            cached = answer_cache.get(example['question'], self.engine.namespace, similar=False)
+            if cached:
+                with self._fast_path_lock:
+                    self.fast_path_counts['cached_hits'] += 1
+                    self.fast_path_counts['code_hits'] += bool(codes)
+                return {**cached, 'answer_source': 'cached_model_answer', 'matched_example': matched}
+
+        if self.fast_path in ('curated', 'auto'):
+            with self._fast_path_lock:
+                self.fast_path_counts['curated_hits'] += 1
+                self.fast_path_counts['code_hits'] += bool(codes)
+            return {
+                'answer': example['answer'],
+                'citations': [],
+                'answer_source': 'curated_example',
+                'matched_example': matched,
+                'timings': {'fast_path_ms': elapsed_ms(start)},
+                'success': True
+            }
+        return None
+
+    def prepare(self, question, history):
+        similar_examples = self.find_similar_examples(question, top_k=3)
+        local = {}
+        context = self.local_context(question, local)
+
+        if self.engine.prompt_cache_mode == 'off':
+            system_prompt = build_few_shot_prompt(question, similar_examples)
+            prompt, system_instruction = compose_prompt(system_prompt, question, history_lines(history), context), None
+        else:
+            # Static rules as (cacheable) system_instruction, the chosen examples in the prompt
+            prompt = compose_prompt(format_examples(similar_examples), question, history_lines(history), context)
+            system_instruction = FEW_SHOT_HEADER + FEW_SHOT_GUIDE
+
+        return Generation(
+            prompt,
+            max_output_tokens=self.max_output_tokens,
+            system_instruction=system_instruction,
+            **local,
+            extra={
+                'similar_examples': [
+                    {
+                        'question': ex['question'],
+                        'answer': ex['answer'][:100] + '...' if len(ex['answer']) > 100 else ex['answer'],
+                        'similarity': f"{ex.get('similarity', 0):.0%}"
+                    }
+                    for ex in similar_examples
+                ]
+            }
+        )
+
+    def register_routes(self, app):
+        @app.route('/api/examples', methods=['GET'])
+        def get_examples():
+            """Get all Q&A examples"""
+            try:
+                return {
+                    'examples': self.examples[:20],  # Return first 20
+                    'total': len(self.examples),
+                    'success': True
+                }
+            except Exception as e:
+                return {
+                    'error': f'Error retrieving examples: {str(e)}',
+                    'success': False
+                }, 500
+
+        @app.route('/api/reload-examples', methods=['POST'])
+        def reload_examples():
+            """Reload Q&A examples from file"""
+            try:
+                success = self.load_examples()
+                return {
+                    'message': f'Reloaded {len(self.examples)} examples',
+                    'success': success
+                }
+            except Exception as e:
+                return {
+                    'error': f'Error reloading examples: {str(e)}',
+                    'success': False
+                }, 500
+
+    def health(self):
+        with self._fast_path_lock:
+            counts = dict(self.fast_path_counts)
+        hits = counts['curated_hits'] + counts['cached_hits']
+        return {
+            'qa_examples_loaded': len(self.examples) > 0,
+            'num_examples': len(self.examples),
+            'version': 'with_examples',
+            'example_fast_path': {
+                'mode': self.fast_path,
+                'threshold': self.fast_path_threshold,
+                'code_match_threshold': self.code_match_threshold,
+                **counts,
+                'hit_rate': round(hits / counts['lookups'], 4) if counts['lookups'] else 0.0
+            }
+        }
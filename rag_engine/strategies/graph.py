@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+LangGraph strategy (app_langgraph.py)
+Adaptive workflow, every node calls Gemini through the engine's shared client:
+
+    route_query ─(cheap)──────────────┐
+         └─(LLM)→ analyze_query ──────┤
+                                      ├→ answer_with_filesearch (fused)
+                                      └→ retrieve_context → generate_answer
+                                                         ↓
+                        validate_answer (only within confidence/latency budget) → END
+"""
+import time
+from typing import TypedDict, List
+
+from answer_cache import prompt_fingerprint
+from intent_classifier import record_label, to_langgraph_analysis
+from intent_classifier import load_classifier
+from rag_engine.metrics import elapsed_ms
+from rag_engine.prompting import candidate_text, extract_citations, parse_json_response
+from rag_engine.resilience import error_result
+from rag_engine.strategies.base import Strategy
+
+DEFAULT_GRAPH_ANALYSIS = {
+    "intent": "general",
+    "scope": "multiple_objects",
+    "focus": "all_info",
+    "expected_length": "medium",
+    "should_include": ["all"],
+    "should_exclude": [],
+}
+
+# Define State for LangGraph
+class RAGState(TypedDict):
+    question: str
+    query_analysis: dict
+    retrieved_context: str
+    answer: str
+    citations: List[dict]
+    should_refine: bool
+    path: List[str]        # Nodes this request went through
+    node_ms: dict          # Node name -> wall time (ms)
+    started_at: float      # time.perf_counter() at graph start
+
+def build_generation_prompt(question, analysis, context=None):
+    """
+    Answer prompt shaped by the query analysis
+    context=None: the model retrieves the excerpts itself (FileSearch tool)
+    """
+    intent = analysis.get("intent", "general")
+    expected_length = analysis.get("expected_length", "medium")
+    should_include = analysis.get("should_include", [])
+    should_exclude = analysis.get("should_exclude", [])
+
+    if context is None:
+        source = "Tìm thông tin liên quan trong tài liệu (FileSearch) rồi trả lời câu hỏi:"
+        context_block = ""
+    else:
+        source = "Dựa trên thông tin sau, trả lời câu hỏi:"
+        context_block = f"\nTHÔNG TIN TỪ TÀI LIỆU:\n{context}\n"
+
+    return f"""{source}
+{context_block}
+CÂU HỎI:
+{question}
+
+PHÂN TÍCH CÂU HỎI:
+- Loại: {intent}
+- Độ dài mong đợi: {expected_length}
+- Nên bao gồm: {', '.join(should_include)}
+- Không nên bao gồm: {', '.join(should_exclude)}
+
+YÊU CẦU:
+1. Trả lời CHÍNH XÁC câu hỏi, dựa VÀO THÔNG TIN TRÊN
+2. Chỉ trả lời những gì được hỏi
+3. Độ dài: {expected_length}
+4. Bao gồm: {', '.join(should_include)}
+5. KHÔNG bao gồm: {', '.join(should_exclude)}
+6. Ngôn ngữ: {'Tiếng Việt' if any(ord(c) > 127 for c in question) else 'English'}
+
+Trả lời:"""
+
+class GraphStrategy(Strategy):
+    name = 'graph'
+    single_call = False
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        config = engine.config
+        self.confidence_threshold = config.INTENT_CONFIDENCE_THRESHOLD
+        self.record_labels = config.INTENT_RECORD_LABELS
+        # With the local index, retrieval makes no Gemini call: always retrieve, then generate
+        self.fused = config.GRAPH_FUSED_GENERATION and engine.retriever is None
+        self.cheap_max_words = config.GRAPH_CHEAP_MAX_WORDS
+        self.validation = config.GRAPH_VALIDATION
+        self.validate_below = config.GRAPH_VALIDATE_BELOW_CONFIDENCE
+        self.latency_budget_ms = config.GRAPH_LATENCY_BUDGET_MS
+
+        # Local intent classifier (skips the analysis LLM call when confident)
+        self.intent_model = load_classifier() if config.INTENT_CLASSIFIER_ENABLED else None
+
+        try:
+            self.workflow = self.create_workflow() if engine.client else None
+        except ImportError as e:
+            print(f"✗ LangGraph not available: {str(e)}")
+            print("  Install: pip install -r requirements_langgraph.txt")
+            self.workflow = None
+
+    def llm(self, prompt, call):
+        """Plain text generation (no tools) through the shared client"""
+        response = self.engine.generate(prompt, file_search=False, call=call)
+        return candidate_text(response.candidates[0])
+
+    def timed(self, name, node):
+        """Wrap a node so the request records its path and per-node wall time"""
+        def run(state: RAGState) -> RAGState:
+            with self.engine.tracer.span(name, 'node') as span:
+                state = node(state)
+            state["path"] = state["path"] + [name]
+            state["node_ms"] = {**state["node_ms"], f"{name}_ms": span.duration_ms}
+            return state
+        return run
+
+    # Node 0: Route Query
+    def route_query_node(self, state: RAGState) -> RAGState:
+        """
+        Cheap questions skip the LLM analysis: the local classifier is
+        confident, or the question is short (GRAPH_CHEAP_MAX_WORDS)
+        """
+        question = state["question"]
+
+        # Fast path: local classifier, no LLM round trip
+        if self.intent_model:
+            analysis, confidence = self.intent_model.predict(question)
+            if confidence >= self.confidence_threshold:
+                state["query_analysis"] = {
+                    **to_langgraph_analysis(analysis), 'source': 'local', 'confidence': round(confidence, 3)
+                }
+                return state
+
+        if len(question.split()) <= self.cheap_max_words:
+            state["query_analysis"] = {**DEFAULT_GRAPH_ANALYSIS, "enhanced_query": question, 'source': 'default'}
+
+        return state
+
+    def after_route(self, state: RAGState) -> str:
+        """Analysis already known → straight to the answer"""
+        return "answer" if state["query_analysis"] else "analyze"
+
+    # Node 1: Analyze Query
+    def analyze_query_node(self, state: RAGState) -> RAGState:
+        """Analyze user query to understand intent and requirements"""
+        question = state["question"]
+
+        analysis_prompt = f"""Phân tích câu hỏi và trả về JSON:
+
+Câu hỏi: "{question}"
+
+Phân tích chi tiết:
+1. **intent**: Loại câu hỏi (list_names, describe_property, explain_concept, compare, general)
+2. **scope**: Phạm vi (single_object, multiple_objects)
+3. **focus**: Khía cạnh chính (name_only, specific_property, multiple_properties, all_info)
+4. **expected_length**: Độ dài mong đợi (short: 1-2 câu, medium: 2-4 câu, long: 4-6 câu)
+5. **should_include**: Nên bao gồm (names, descriptions, examples, comparisons)
+6. **should_exclude**: Nên loại trừ (other_properties, unrelated_info, extra_details)
+
+Trả về JSON:
+{{
+    "intent": "...",
+    "scope": "...",
+    "focus": "...",
+    "expected_length": "...",
+    "should_include": [...],
+    "should_exclude": [...],
+    "enhanced_query": "câu hỏi được làm rõ"
+}}
+
+CHỈ trả về JSON."""
+
+        try:
+            analysis = parse_json_response(self.llm(analysis_prompt, 'analysis'))
+            state["query_analysis"] = analysis
+
+            # Labelled history for retraining the local classifier
+            if self.record_labels:
+                record_label(question, analysis)
+
+        except Exception as e:
+            print(f"Query analysis failed: {e}")
+            state["query_analysis"] = {**DEFAULT_GRAPH_ANALYSIS, "enhanced_query": question}
+
+        return state
+
+    # Node 2: Retrieve from FileSearch
+    def retrieve_context_node(self, state: RAGState) -> RAGState:
+        """Retrieve relevant context from FileSearch"""
+        query_analysis = state["query_analysis"]
+        enhanced_query = query_analysis.get("enhanced_query", state["question"])
+
+        # Failures propagate like generation errors: an answer without the
+        # documents must not be returned (and cached) as a success
+        if self.engine.retriever:
+            state["retrieved_context"], state["citations"] = self.engine.retrieve(enhanced_query)
+            return state
+
+        response = self.engine.generate(
+            enhanced_query,
+            temperature=0.0,  # Deterministic retrieval
+            call='retrieval'
+        )
+
+        if response.candidates and len(response.candidates) > 0:
+            candidate = response.candidates[0]
+            state["retrieved_context"] = candidate_text(candidate)
+            state["citations"] = extract_citations(candidate)
+
+        return state
+
+    # Node 3: Generate Focused Answer
+    def generate_answer_node(self, state: RAGState) -> RAGState:
+        """Generate focused answer based on analysis and retrieved context"""
+        question = state["question"]
+        analysis = state["query_analysis"]
+        context = state["retrieved_context"]
+
+        generation_prompt = build_generation_prompt(question, analysis, context)
+
+        # No apology fallback: a failure ends the workflow with success=False,
+        # so it is never stored in the answer cache
+        state["answer"] = self.llm(generation_prompt, 'generation')
+        return state
+
+    # Node 2+3 fused: one FileSearch call retrieves and answers
+    def answer_with_filesearch_node(self, state: RAGState) -> RAGState:
+        """Generate the focused answer with the FileSearch tool (no separate retrieval call)"""
+        question = state["question"]
+        generation_prompt = build_generation_prompt(question, state["query_analysis"])
+
+        # Failures propagate, as in generate_answer_node
+        response = self.engine.generate(generation_prompt)
+        candidate = response.candidates[0]
+        state["answer"] = candidate_text(candidate)
+        state["citations"] = extract_citations(candidate)
+        return state
+
+    def answer_confidence(self, state: RAGState) -> float:
+        """
+        Rough confidence in the answer: the analysis confidence (local
+        classifier; LLM analyses count as certain), 0 when nothing was cited
+        """
+        if not state["citations"]:
+            return 0.0
+        return state["query_analysis"].get("confidence", 1.0)
+
+    def should_validate(self, state: RAGState) -> str:
+        """
+        GRAPH_VALIDATION: 'always', 'never' or 'auto' (validate low-confidence
+        answers while the request is still within GRAPH_LATENCY_BUDGET_MS)
+        """
+        if self.validation == 'always':
+            return "validate"
+        if self.validation == 'never':
+            return "end"
+        if elapsed_ms(state["started_at"]) > self.latency_budget_ms:
+            return "end"
+        return "validate" if self.answer_confidence(state) < self.validate_below else "end"
+
+    # Node 4: Validate and Refine
+    def validate_answer_node(self, state: RAGState) -> RAGState:
+        """Validate if answer meets requirements, refine if needed"""
+        question = state["question"]
+        answer = state["answer"]
+        analysis = state["query_analysis"]
+
+        validation_prompt = f"""Đánh giá câu trả lời:
+
+CÂU HỎI: {question}
+CÂU TRẢ LỜI: {answer}
+YÊU CẦU: {analysis}
+
+Kiểm tra:
+1. Có trả lời đúng câu hỏi không?
+2. Có thông tin thừa không?
+3. Độ dài có phù hợp không?
+4. Có đề cập thông tin không được yêu cầu không?
+
+Trả về JSON:
+{{
+    "is_valid": true/false,
+    "issues": ["vấn đề 1", "vấn đề 2"],
+    "refined_answer": "câu trả lời đã cải thiện (nếu cần)"
+}}
+
+CHỈ trả về JSON."""
+
+        try:
+            validation = parse_json_response(self.llm(validation_prompt, 'validation'))
+
+            if not validation.get("is_valid", True) and validation.get("refined_answer"):
+                state["answer"] = validation["refined_answer"]
+            state["should_refine"] = False
+
+        except Exception as e:
+            print(f"Validation failed: {e}")
+            state["should_refine"] = False
+
+        return state
+
+    def create_workflow(self):
+        """Create the RAG workflow graph"""
+        from langgraph.graph import StateGraph, END
+
+        workflow = StateGraph(RAGState)
+
+        # Add nodes (timed, recorded in the request path)
+        workflow.add_node("route_query", self.timed("route_query", self.route_query_node))
+        workflow.add_node("analyze_query", self.timed("analyze_query", self.analyze_query_node))
+        workflow.add_node("validate_answer", self.timed("validate_answer", self.validate_answer_node))
+        if self.fused:
+            workflow.add_node("answer_with_filesearch",
+                              self.timed("answer_with_filesearch", self.answer_with_filesearch_node))
+            answer_node, last_node = "answer_with_filesearch", "answer_with_filesearch"
+        else:
+            workflow.add_node("retrieve_context", self.timed("retrieve_context", self.retrieve_context_node))
+            workflow.add_node("generate_answer", self.timed("generate_answer", self.generate_answer_node))
+            workflow.add_edge("retrieve_context", "generate_answer")
+            answer_node, last_node = "retrieve_context", "generate_answer"
+
+        # Add edges
+        workflow.set_entry_point("route_query")
+        workflow.add_conditional_edges("route_query", self.after_route,
+                                       {"answer": answer_node, "analyze": "analyze_query"})
+        workflow.add_edge("analyze_query", answer_node)
+        workflow.add_conditional_edges(last_node, self.should_validate,
+                                       {"validate": "validate_answer", "end": END})
+        workflow.add_edge("validate_answer", END)
+
+        # Compile
+        return workflow.compile()
+
+    def answer(self, question, history):
+        """Run the workflow (history is not used by this strategy)"""
+        if not self.workflow:
+            return {
+                'error': 'LangGraph workflow not initialized',
+                'success': False
+            }
+
+        try:
+            result = self.workflow.invoke({
+                "question": question,
+                "query_analysis": {},
+                "retrieved_context": "",
+                "answer": "",
+                "citations": [],
+                "should_refine": False,
+                "path": [],
+                "node_ms": {},
+                "started_at": time.perf_counter()
+            })
+
+            return {
+                'answer': result["answer"],
+                'citations': result.get("citations", []),
+                'query_analysis': result.get("query_analysis", {}),
+                'workflow': 'langgraph',
+                'graph_path': result["path"],
+                'timings': dict(result["node_ms"]),
+                'success': True
+            }
+
+        except Exception as e:
+            return error_result(e, 'LangGraph workflow error')
+
+    def fingerprint(self):
+        return prompt_fingerprint(super().fingerprint(), 'fused' if self.fused else 'separate')
+
+    def health(self):
+        return {
+            'workflow': 'langgraph',
+            'graph_fused_generation': self.fused,
+            'graph_validation': self.validation,
+            'langgraph_initialized': self.workflow is not None,
+            'intent_classifier_loaded': self.intent_model is not None
+        }
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Plain strategy (app.py): one FileSearch call with a fixed system prompt
+"""
+from answer_cache import prompt_fingerprint
+from rag_engine.prompting import history_lines
+from rag_engine.strategies.base import Strategy
+
+SYSTEM_PROMPT = """Bạn là trợ lý AI thông minh, chuyên trả lời câu hỏi dựa trên tài liệu được cung cấp.
+
+Quy tắc:
+1. Trả lời CHÍNH XÁC dựa trên nội dung trong tài liệu
+2. Nếu câu hỏi bằng tiếng Việt, trả lời bằng tiếng Việt
+3. Nếu câu hỏi bằng tiếng Anh, trả lời bằng tiếng Anh
+4. Nếu không tìm thấy thông tin trong tài liệu, hãy nói rõ ràng
+5. Trích dẫn nguồn từ tài liệu khi có thể
+6. Trả lời ngắn gọn, súc tích và rõ ràng
+
+You are an intelligent AI assistant specializing in answering questions based on provided documents.
+
+Rules:
+1. Answer ACCURATELY based on document content
+2. If question is in Vietnamese, answer in Vietnamese
+3. If question is in English, answer in English
+4. If information is not found in documents, state clearly
+5. Cite sources from documents when possible
+6. Keep answers concise, clear and to the point
+"""
+
+class PlainStrategy(Strategy):
+    name = 'plain'
+
+    def prepare(self, question, history):
+        # History already ends with the current question
+        return self.build_generation(SYSTEM_PROMPT, question, history_lines(history))
+
+    def fingerprint(self):
+        return prompt_fingerprint(SYSTEM_PROMPT)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Tracing for graph nodes and Gemini calls
+Every span (node or model call) feeds Prometheus-style histograms for
+/metrics; while a request trace is active its spans are also collected so
+they can be returned in the /api/chat JSON.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Spans of the request being handled (None when no trace was asked for)
+_current_trace = contextvars.ContextVar('rag_trace', default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label set"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        """Prometheus text exposition lines"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, series in items:
+            labels = ','.join(f'{k}="{v}"' for k, v in zip(self.label_names, label_values))
+            prefix = labels + ',' if labels else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {round(series[-2], 6)}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+class Span:
+    """One timed node or model call"""
+    __slots__ = ('name', 'kind', 'start', 'duration_ms', 'prompt_tokens', 'candidate_tokens',
+                 'cached_tokens', 'retries', 'coalesced', 'error')
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.prompt_tokens = None
+        self.candidate_tokens = None
+        self.cached_tokens = None
+        self.retries = 0
+        self.coalesced = False  # Shared another request's upstream call
+        self.error = None
+
+    def record_usage(self, response):
+        """Token counts from a response's usage_metadata (last streamed chunk has them)"""
+        if self.coalesced:
+            return  # Tokens are counted once, on the call that was made
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            self.prompt_tokens = usage.prompt_token_count
+            self.candidate_tokens = usage.candidates_token_count
+            self.cached_tokens = usage.cached_content_token_count or 0
+
+    def to_dict(self, origin):
+        data = {
+            'name': self.name,
+            'kind': self.kind,
+            'start_ms': round((self.start - origin) * 1000, 1),
+            'duration_ms': self.duration_ms,
+        }
+        if self.kind == 'llm':
+            data.update({
+                'prompt_tokens': self.prompt_tokens,
+                'candidate_tokens': self.candidate_tokens,
+                'cached_tokens': self.cached_tokens,
+                'retries': self.retries,
+                'coalesced': self.coalesced,
+            })
+        if self.error:
+            data['error'] = self.error
+        return data
+
+class Tracer:
+    """Histograms for all spans plus optional per-request span lists"""
+
+    def __init__(self, strategy_name):
+        self.strategy_name = strategy_name
+        self.node_seconds = Histogram(
+            'rag_node_duration_seconds', 'Wall time of workflow nodes',
+            ('strategy', 'node'), LATENCY_BUCKETS)
+        self.llm_seconds = Histogram(
+            'rag_llm_call_duration_seconds', 'Wall time of Gemini calls',
+            ('strategy', 'call'), LATENCY_BUCKETS)
+        self.prompt_tokens = Histogram(
+            'rag_llm_prompt_tokens', 'Prompt tokens per Gemini call (usage_metadata)',
+            ('strategy', 'call'), TOKEN_BUCKETS)
+        self.candidate_tokens = Histogram(
+            'rag_llm_candidate_tokens', 'Candidate tokens per Gemini call (usage_metadata)',
+            ('strategy', 'call'), TOKEN_BUCKETS)
+        self.cached_tokens = Histogram(
+            'rag_llm_cached_tokens', 'Prompt tokens served from a context cache per Gemini call',
+            ('strategy', 'call'), TOKEN_BUCKETS)
+        self.request_seconds = Histogram(
+            'rag_request_duration_seconds', 'Wall time of answered requests',
+            ('strategy', 'cached'), LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self.retries = {}    # call name -> retry count
+        self.coalesced = {}  # call name -> calls that shared an in-flight request
+        self.errors = {}   # (kind, name) -> error count
+
+    @contextmanager
+    def span(self, name, kind='node'):
+        """Time a block; kind 'node' (workflow step) or 'llm' (Gemini call)"""
+        span = Span(name, kind)
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.finish(span)
+
+    def finish(self, span):
+        """Close a span: histograms, counters and the active request trace"""
+        span.duration_ms = round((time.perf_counter() - span.start) * 1000, 1)
+        seconds = span.duration_ms / 1000.0
+        if span.kind == 'llm':
+            self.llm_seconds.observe(seconds, self.strategy_name, span.name)
+            if span.prompt_tokens is not None:
+                self.prompt_tokens.observe(span.prompt_tokens, self.strategy_name, span.name)
+            if span.candidate_tokens is not None:
+                self.candidate_tokens.observe(span.candidate_tokens, self.strategy_name, span.name)
+            if span.cached_tokens is not None:
+                self.cached_tokens.observe(span.cached_tokens, self.strategy_name, span.name)
+        else:
+            self.node_seconds.observe(seconds, self.strategy_name, span.name)
+
+        with self._lock:
+            if span.retries:
+                self.retries[span.name] = self.retries.get(span.name, 0) + span.retries
+            if span.coalesced:
+                self.coalesced[span.name] = self.coalesced.get(span.name, 0) + 1
+            if span.error:
+                key = (span.kind, span.name)
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+        spans = _current_trace.get()
+        if spans is not None:
+            spans.append(span)
+
+    def observe_request(self, latency_ms, cached=False):
+        self.request_seconds.observe(latency_ms / 1000.0, self.strategy_name, str(cached).lower())
+
+    @staticmethod
+    def start_trace():
+        """Collect the spans of the current request (thread/task local); returns a reset token"""
+        return _current_trace.set([])
+
+    @staticmethod
+    def end_trace(token):
+        """Stop collecting and return the trace block"""
+        spans = _current_trace.get() or []
+        _current_trace.reset(token)
+        if not spans:
+            return {'spans': []}
+        origin = min(span.start for span in spans)
+        return {
+            'spans': [span.to_dict(origin) for span in sorted(spans, key=lambda s: s.start)],
+            'llm_calls': sum(1 for span in spans if span.kind == 'llm'),
+            'prompt_tokens': sum(span.prompt_tokens or 0 for span in spans),
+            'candidate_tokens': sum(span.candidate_tokens or 0 for span in spans),
+            'cached_tokens': sum(span.cached_tokens or 0 for span in spans),
+        }
+
+    def render(self, counters=None):
+        """/metrics body: histograms plus counters (name -> (help, value))"""
+        lines = []
+        for name, (help_text, value) in (counters or {}).items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter",
+                      f'{name}{{strategy="{self.strategy_name}"}} {value}']
+
+        with self._lock:
+            retries = sorted(self.retries.items())
+            coalesced = sorted(self.coalesced.items())
+            errors = sorted(self.errors.items())
+        lines += ["# HELP rag_llm_retries_total Retried Gemini calls",
+                  "# TYPE rag_llm_retries_total counter"]
+        lines += [f'rag_llm_retries_total{{strategy="{self.strategy_name}",call="{name}"}} {count}'
+                  for name, count in retries]
+        lines += ["# HELP rag_llm_coalesced_total Gemini calls answered by an identical in-flight request",
+                  "# TYPE rag_llm_coalesced_total counter"]
+        lines += [f'rag_llm_coalesced_total{{strategy="{self.strategy_name}",call="{name}"}} {count}'
+                  for name, count in coalesced]
+        lines += ["# HELP rag_span_errors_total Nodes and Gemini calls that raised",
+                  "# TYPE rag_span_errors_total counter"]
+        lines += [f'rag_span_errors_total{{strategy="{self.strategy_name}",kind="{kind}",name="{name}"}} {count}'
+                  for (kind, name), count in errors]
+
+        for histogram in (self.request_seconds, self.node_seconds, self.llm_seconds,
+                          self.prompt_tokens, self.candidate_tokens, self.cached_tokens):
+            lines += histogram.render()
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Answer cache warming after a deploy or a document re-upload
+The most asked questions (answer cache lookups of this process, then
+qa_examples.json) are answered in the background with bounded concurrency
+into a staging cache; the live cache keeps serving until the staging cache
+replaces it in one swap.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from answer_cache import AnswerCache, normalize_question
+from qa_example_log import read_examples
+from session_store import ChatMessage
+
+def example_questions(path=None):
+    """Questions of the curated Q&A examples ([] if the file is missing)"""
+    try:
+        return [ex['question'] for ex in read_examples(path) if ex.get('question')]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+
+class CacheWarmer:
+    """Background job that fills a staging answer cache and swaps it in"""
+
+    def __init__(self, engine, top_n=50, workers=4, sources=('traffic', 'examples'),
+                 examples_file=None):
+        self.engine = engine
+        self.top_n = top_n
+        self.workers = max(1, workers)
+        self.sources = sources
+        self.examples_file = examples_file
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._restart = False  # Store changed again while warming
+        self.runs = 0
+        self.last_run = None
+
+    @classmethod
+    def from_config(cls, engine):
+        config = engine.config
+        return cls(
+            engine,
+            top_n=config.CACHE_WARM_TOP_N,
+            workers=config.CACHE_WARM_CONCURRENCY,
+            sources=tuple(s.strip() for s in config.CACHE_WARM_SOURCES.split(',') if s.strip()),
+        )
+
+    def questions(self):
+        """Up to top_n distinct questions: recorded traffic first, then the examples"""
+        candidates = []
+        if 'traffic' in self.sources:
+            candidates += self.engine.answer_cache.top_questions(self.top_n)
+        if 'examples' in self.sources:
+            candidates += example_questions(self.examples_file)
+
+        questions, seen = [], set()
+        for question in candidates:
+            normalized = normalize_question(question)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                questions.append(question)
+        return questions[:self.top_n]
+
+    def start(self, reason='store_change'):
+        """Warm in a background thread; a run in progress starts over when it ends"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                self._restart = True
+                return False
+            self._thread = threading.Thread(target=self._run, args=(reason,),
+                                            name='cache-warmer', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self, reason):
+        cache = self.engine.answer_cache
+        while True:
+            with self._lock:
+                self._restart = False
+            staging = cache.begin_staging()
+            start = time.perf_counter()
+            try:
+                run = self.warm(staging)
+            except Exception as e:
+                cache.abort_staging(staging)
+                print(f"✗ Answer cache warming failed: {e}")
+                return
+            with self._lock:
+                restart = self._restart
+            if restart:
+                # Answers may predate the latest upload: warm again before swapping
+                cache.abort_staging(staging)
+                reason = 'store_change'
+                continue
+
+            cache.swap(staging)
+            run.update({'reason': reason, 'duration_s': round(time.perf_counter() - start, 1),
+                        'finished_at': time.time()})
+            with self._lock:
+                self.runs += 1
+                self.last_run = run
+            print(f"✓ Answer cache warmed: {run['warmed']}/{run['questions']} answers "
+                  f"({run['failed']} failed) in {run['duration_s']}s")
+            return
+
+    def warm(self, staging):
+        """Answer every question into the staging cache (workers at a time)"""
+        questions = self.questions()
+        namespace = self.engine.namespace
+
+        def answer(question):
+            if staging.get(question, namespace, similar=False) is not None:
+                return True  # A live request already answered it during warming
+            try:
+                result = self._answer(question)
+            except Exception:
+                return False
+            if not result.get('success'):
+                return False
+            staging.set(question, namespace, result)
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warm') as pool:
+            warmed = sum(pool.map(answer, questions))
+        return {'questions': len(questions), 'warmed': warmed, 'failed': len(questions) - warmed}
+
+    def _answer(self, question):
+        """Same call a standalone chat question makes (shares an identical in-flight one)"""
+        engine = self.engine
+        history = [ChatMessage('user', question)]
+        if engine.inflight is not None:
+            result, _ = engine.inflight.do(
+                AnswerCache.make_key(question, engine.namespace),
+                lambda: engine.strategy.answer(question, history)
+            )
+            return result
+        return engine.strategy.answer(question, history)
+
+    def stats(self):
+        """State for /api/health"""
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'top_n': self.top_n,
+                'concurrency': self.workers,
+                'sources': list(self.sources),
+                'runs': self.runs,
+                'last_run': self.last_run,
+            }
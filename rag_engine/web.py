@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Flask app factory: the same chat API for every strategy
+"""
+import os
+import uuid
+
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
+from flask_cors import CORS
+
+from config import Config
+from rag_engine.engine import RAGEngine
+
+# templates/ and static/ live next to the app_*.py entry points
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_or_create_session_id():
+    """Get or create a unique session ID for the user"""
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    return session['session_id']
+
+def read_message():
+    """(user message, request JSON) from the body; message is '' if missing"""
+    data = request.get_json(silent=True) or {}
+    return (data.get('message') or '').strip(), data
+
+def create_app(strategy=None, config=Config, engine=None):
+    """
+    Create the Flask app for a strategy (default: RAG_STRATEGY)
+    The engine is available as app.engine.
+    """
+    app = Flask(__name__, root_path=ROOT_DIR)
+    app.config.from_object(config)
+    app.secret_key = config.SECRET_KEY
+    CORS(app)
+
+    engine = engine or RAGEngine(config, strategy)
+    app.engine = engine
+
+    @app.route('/')
+    def index():
+        """Render the main chatbot interface"""
+        return render_template('index.html')
+
+    @app.route('/api/chat', methods=['POST'])
+    def chat():
+        """
+        Chat endpoint
+        Expects JSON: { "message": "user question" }
+        Returns JSON: { "answer": "bot response", "citations": [...], ... }
+        "trace": true in the request (or TRACE_RESPONSES) adds a "trace" block
+        """
+        try:
+            user_message, data = read_message()
+
+            if not user_message:
+                return jsonify({
+                    'error': 'Message is required',
+                    'success': False
+                }), 400
+
+            trace = bool(data.get('trace')) or config.TRACE_RESPONSES
+            result = engine.ask(user_message, get_or_create_session_id(), trace=trace)
+
+            if result.get('success'):
+                return jsonify({**result, 'cached': result.get('cached', False)})
+            elif 'retry_after' in result:
+                # Gemini overloaded / circuit open: tell the client when to retry
+                return jsonify(result), 503, {'Retry-After': str(result['retry_after'])}
+            else:
+                return jsonify(result), 500
+
+        except Exception as e:
+            return jsonify({
+                'error': f'Server error: {str(e)}',
+                'success': False
+            }), 500
+
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_stream():
+        """
+        Streaming chat endpoint (Server-Sent Events)
+        Expects JSON: { "message": "user question" }
+        Streams: event 'delta' { "text": "..." } for each chunk,
+                 then event 'done' { "answer": "...", "citations": [...] }
+                 or event 'error' { "error": "..." }
+        """
+        try:
+            user_message, _ = read_message()
+
+            if not user_message:
+                return jsonify({
+                    'error': 'Message is required',
+                    'success': False
+                }), 400
+
+            return Response(
+                stream_with_context(engine.stream(user_message, get_or_create_session_id())),
+                mimetype='text/event-stream',
+                headers={
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+                }
+            )
+
+        except Exception as e:
+            return jsonify({
+                'error': f'Server error: {str(e)}',
+                'success': False
+            }), 500
+
+    @app.route('/api/history', methods=['GET'])
+    def get_history():
+        """Get chat history for current session"""
+        try:
+            history = engine.session_store.get_messages(get_or_create_session_id())
+
+            return jsonify({
+                'history': [msg.to_dict() for msg in history],
+                'success': True
+            })
+        except Exception as e:
+            return jsonify({
+                'error': f'Error retrieving history: {str(e)}',
+                'success': False
+            }), 500
+
+    @app.route('/api/clear', methods=['POST'])
+    def clear_history():
+        """Clear chat history for current session"""
+        try:
+            engine.clear(get_or_create_session_id())
+
+            return jsonify({
+                'message': 'History cleared',
+                'success': True
+            })
+        except Exception as e:
+            return jsonify({
+                'error': f'Error clearing history: {str(e)}',
+                'success': False
+            }), 500
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        """Health check endpoint"""
+        return jsonify(engine.health())
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics (node / Gemini call latency, tokens, retries)"""
+        return Response(engine.prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+    # Strategy-specific endpoints (e.g. /api/examples)
+    engine.strategy.register_routes(app)
+
+    return app
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Chat session storage for Silkroad RAG Chatbot
+Bounded in-process store (LRU + TTL) and a shared SQLite store for multi-worker deployments
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from datetime import datetime
+
+class ChatMessage:
+    """One chat message (compact: slots + float timestamp)"""
+    __slots__ = ('role', 'content', 'timestamp')
+
+    def __init__(self, role, content, timestamp=None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    def to_dict(self):
+        """JSON-friendly form used by /api/history"""
+        return {
+            'role': self.role,
+            'content': self.content,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+class SessionStore:
+    """Interface for chat session backends"""
+
+    blocking = False  # Calls do I/O: the async server runs them in a thread
+
+    def get_messages(self, session_id):
+        """Return the messages of a session (oldest first, empty list if unknown)"""
+        raise NotImplementedError
+
+    def add_message(self, session_id, role, content):
+        """Append a message, keeping only the most recent max_messages"""
+        raise NotImplementedError
+
+    def clear(self, session_id):
+        """Remove all messages of a session"""
+        raise NotImplementedError
+
+    def stats(self):
+        """Counters for /api/health"""
+        raise NotImplementedError
+
+class _Session:
+    __slots__ = ('messages', 'last_access')
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.last_access = time.monotonic()
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with a cap on the number of sessions (LRU eviction)
+    and idle expiry (TTL). History is only visible to this process.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=3600, max_messages=20):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_messages(self, session_id):
+        with self._lock:
+            session = self._touch(session_id)
+            return list(session.messages) if session else []
+
+    def add_message(self, session_id, role, content):
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None:
+                session = _Session(self.max_messages)
+                self._sessions[session_id] = session
+                self._evict()
+            session.messages.append(ChatMessage(role, content))
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def _touch(self, session_id):
+        """Return a live session and mark it recently used (caller holds the lock)"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+
+        now = time.monotonic()
+        if now - session.last_access > self.ttl:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self):
+        """Drop expired sessions from the LRU end, then enforce max_sessions"""
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_access <= self.ttl:
+                break
+            del self._sessions[oldest_id]
+            self.expirations += 1
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store backed by a SQLite file shared by all worker processes
+    (e.g. gunicorn -w 4). Idle sessions are expired after ttl seconds.
+    """
+
+    blocking = True
+
+    def __init__(self, path='chat_sessions.db', ttl=3600, max_messages=20, cleanup_interval=60.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+        """)
+
+    def _conn(self):
+        """One connection per thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction (takes the database write lock up front)"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_messages(self, session_id):
+        conn = self._conn()
+        row = conn.execute(
+            'SELECT last_access FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return []
+
+        conn.execute(
+            'UPDATE sessions SET last_access = ? WHERE session_id = ?', (time.time(), session_id)
+        )
+        rows = conn.execute(
+            'SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id',
+            (session_id,)
+        ).fetchall()
+        return [ChatMessage(role, content, timestamp) for role, content, timestamp in rows]
+
+    def add_message(self, session_id, role, content):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT last_access FROM sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if row is not None and now - row[0] > self.ttl:
+                # Expired: start the session over
+                conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+
+            conn.execute(
+                'INSERT INTO sessions (session_id, last_access) VALUES (?, ?) '
+                'ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access',
+                (session_id, now)
+            )
+            conn.execute(
+                'INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)',
+                (session_id, role, content, now)
+            )
+            # Keep only the most recent max_messages
+            conn.execute(
+                'DELETE FROM messages WHERE session_id = ? AND id NOT IN '
+                '(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)',
+                (session_id, session_id, self.max_messages)
+            )
+
+        self._cleanup(now)
+
+    def clear(self, session_id):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM messages WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def stats(self):
+        conn = self._conn()
+        sessions = conn.execute(
+            'SELECT COUNT(*) FROM sessions WHERE last_access >= ?', (time.time() - self.ttl,)
+        ).fetchone()[0]
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'sessions': sessions,
+            'ttl_seconds': self.ttl
+        }
+
+    def _cleanup(self, now):
+        """Delete expired sessions, at most once per cleanup_interval"""
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+
+        cutoff = now - self.ttl
+        with self._transaction() as conn:
+            conn.execute(
+                'DELETE FROM messages WHERE session_id IN '
+                '(SELECT session_id FROM sessions WHERE last_access < ?)', (cutoff,)
+            )
+            conn.execute('DELETE FROM sessions WHERE last_access < ?', (cutoff,))
+
+def create_session_store(config):
+    """Build the session store selected by config.SESSION_BACKEND"""
+    max_messages = config.MAX_HISTORY_LENGTH * 2
+
+    if config.SESSION_BACKEND == 'sqlite':
+        return SQLiteSessionStore(
+            path=config.SESSION_DB_PATH,
+            ttl=config.SESSION_TTL,
+            max_messages=max_messages
+        )
+    if config.SESSION_BACKEND == 'memory':
+        return MemorySessionStore(
+            max_sessions=config.SESSION_MAX_COUNT,
+            ttl=config.SESSION_TTL,
+            max_messages=max_messages
+        )
+    raise ValueError(f"Unknown SESSION_BACKEND: {config.SESSION_BACKEND} (use 'memory' or 'sqlite')")
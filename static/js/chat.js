@@ -51,26 +51,31 @@ async function sendMessage(event) {
     sendBtn.disabled = true;
 
     try {
-        // Send request to backend
-        const response = await fetch('/api/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ message }),
-        });
+        // Prefer the streaming endpoint; fall back to /api/chat if unavailable
+        const streamed = await sendMessageStreaming(message, typingId);
+
+        if (!streamed) {
+            // Send request to backend
+            const response = await fetch('/api/chat', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ message }),
+            });
 
-        const data = await response.json();
+            const data = await response.json();
 
-        // Remove typing indicator
-        removeTypingIndicator(typingId);
+            // Remove typing indicator
+            removeTypingIndicator(typingId);
 
-        if (data.success) {
-            // Add bot response
-            addMessage('bot', data.answer, data.citations);
-        } else {
-            // Show error
-            addErrorMessage(data.error || 'An error occurred');
+            if (data.success) {
+                // Add bot response
+                addMessage('bot', data.answer, data.citations);
+            } else {
+                // Show error
+                addErrorMessage(data.error || 'An error occurred');
+            }
         }
     } catch (error) {
         removeTypingIndicator(typingId);
@@ -84,6 +89,100 @@ async function sendMessage(event) {
     }
 }
 
+/**
+ * Send a message to the streaming endpoint (Server-Sent Events)
+ * Renders text deltas as they arrive.
+ * Returns false if the server has no streaming endpoint.
+ */
+async function sendMessageStreaming(message, typingId) {
+    const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ message }),
+    });
+
+    // App variants without streaming support answer 404/405
+    if (response.status === 404 || response.status === 405) {
+        return false;
+    }
+
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!response.ok || !response.body || !contentType.includes('text/event-stream')) {
+        const data = await response.json();
+        removeTypingIndicator(typingId);
+        addErrorMessage(data.error || 'An error occurred');
+        return true;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    let botMessage = null;
+    let finished = false;
+
+    const handleEvent = (event, data) => {
+        if (event === 'delta') {
+            if (!botMessage) {
+                // First token: replace typing indicator with the answer bubble
+                removeTypingIndicator(typingId);
+                botMessage = addMessage('bot', '');
+            }
+            botMessage.querySelector('.message-text').textContent += data.text;
+            scrollToBottom();
+        } else if (event === 'done') {
+            finished = true;
+            removeTypingIndicator(typingId);
+            if (!botMessage) {
+                botMessage = addMessage('bot', data.answer);
+            }
+            botMessage.querySelector('.message-text').textContent = data.answer;
+            addCitations(botMessage, data.citations);
+            scrollToBottom();
+        } else if (event === 'error') {
+            finished = true;
+            removeTypingIndicator(typingId);
+            addErrorMessage(data.error || 'An error occurred');
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+
+            if (dataLines.length > 0) {
+                handleEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+
+    if (!finished) {
+        removeTypingIndicator(typingId);
+        addErrorMessage('Connection closed before the answer was complete.');
+    }
+
+    return true;
+}
+
 /**
  * Add a message to the chat
  */
@@ -99,28 +198,6 @@ function addMessage(role, content, citations = []) {
     messageText.textContent = content;
     messageContent.appendChild(messageText);
 
-    // Add citations if available
-    if (citations && citations.length > 0) {
-        const citationsDiv = document.createElement('div');
-        citationsDiv.className = 'citations';
-
-        const citationsTitle = document.createElement('div');
-        citationsTitle.className = 'citations-title';
-        citationsTitle.textContent = 'Sources / Nguồn:';
-        citationsDiv.appendChild(citationsTitle);
-
-        citations.forEach((citation, index) => {
-            const citationLink = document.createElement('a');
-            citationLink.className = 'citation';
-            citationLink.href = citation.uri;
-            citationLink.target = '_blank';
-            citationLink.textContent = `${index + 1}. ${citation.title}`;
-            citationsDiv.appendChild(citationLink);
-        });
-
-        messageContent.appendChild(citationsDiv);
-    }
-
     // Add timestamp
     const timestamp = document.createElement('div');
     timestamp.className = 'message-time';
@@ -133,8 +210,41 @@ function addMessage(role, content, citations = []) {
     messageDiv.appendChild(messageContent);
     chatContainer.appendChild(messageDiv);
 
+    // Add citations if available
+    addCitations(messageDiv, citations);
+
     // Scroll to bottom
     scrollToBottom();
+
+    return messageDiv;
+}
+
+/**
+ * Add citations to a message (placed before the timestamp)
+ */
+function addCitations(messageDiv, citations = []) {
+    if (!citations || citations.length === 0) return;
+
+    const messageContent = messageDiv.querySelector('.message-content');
+
+    const citationsDiv = document.createElement('div');
+    citationsDiv.className = 'citations';
+
+    const citationsTitle = document.createElement('div');
+    citationsTitle.className = 'citations-title';
+    citationsTitle.textContent = 'Sources / Nguồn:';
+    citationsDiv.appendChild(citationsTitle);
+
+    citations.forEach((citation, index) => {
+        const citationLink = document.createElement('a');
+        citationLink.className = 'citation';
+        citationLink.href = citation.uri;
+        citationLink.target = '_blank';
+        citationLink.textContent = `${index + 1}. ${citation.title}`;
+        citationsDiv.appendChild(citationLink);
+    });
+
+    messageContent.insertBefore(citationsDiv, messageContent.querySelector('.message-time'));
 }
 
 /**
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Vietnamese-aware text normalization shared by every matcher
+(example index, answer cache keys, local retrieval)
+
+    normalize(text)        NFC, lowercase, unified punctuation and whitespace
+    fold_diacritics(text)  normalize() without tone/vowel marks (đ -> d), for
+                           input typed without diacritics
+    tokenize(text)         syllable tokens of normalize(); decimal numbers
+                           ('501.2') and codes ('e1105') stay one token
+    standard_codes(text)   standards identifiers, e.g. {'ASTM E1105',
+                           'AAMA 501.2', 'CAN/ULC S101'}
+
+The Excel data and browser input differ in composed/decomposed diacritics
+(NFC vs NFD), quotes, dashes and spacing; after normalize() they compare
+equal. Results for short strings (questions) are memoized in bounded LRU
+caches; long texts (document chunks) are not cached.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+CACHE_SIZE = 10000        # Entries per memoized function
+MAX_CACHED_LENGTH = 512   # Longer texts are processed without caching
+
+# Typographic variants -> ASCII; zero-width characters are dropped
+PUNCTUATION_MAP = str.maketrans({
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"',
+    '«': '"', '»': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '―': '-',
+    '−': '-',
+    '…': '...',
+    '？': '?', '！': '!', '，': ',', '：': ':', '；': ';',
+    '\u200b': None, '\u200c': None, '\u200d': None, '\u2060': None, '\ufeff': None,
+})
+SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+([,.;:!?)\]])')
+SPACE_AFTER_BRACKET_RE = re.compile(r'([(\[])\s+')
+
+TOKEN_RE = re.compile(r'\d+(?:[.,]\d+)+|\w+')
+
+# Body: case-insensitive for unambiguous prefixes, upper case only for
+# short ones that are also words ('as', 'en', 'ul' ...)
+STANDARD_CODE_RE = re.compile(
+    r'\b((?i:ASTM|AAMA|TCVN|QCVN|ISO|IEC|DIN|ANSI|NFPA|JIS|CWCT|CAN[\s/\-]?ULC)|ULC|EN|BS|UL|GB|AS)'
+    r'[\s\-]*((?i:[a-z]{0,2})\s?\d+(?:[.\-:/]\d+)*)'
+)
+# Further numbers of the same body: 'ASTM E283, E330 và E331' (letter prefix required)
+STANDARD_CODE_NEXT_RE = re.compile(
+    r'\s*(?:,|;|/|&|và|hoặc|and|or)\s*((?i:[a-z]{1,2})\s?\d+(?:[.\-:/]\d+)*)\b'
+)
+
+def _cached(fn):
+    """Memoize fn for short strings in a bounded LRU (long texts bypass it)"""
+    cached = lru_cache(maxsize=CACHE_SIZE)(fn)
+
+    def wrapper(text):
+        text = '' if text is None else str(text)
+        return cached(text) if len(text) <= MAX_CACHED_LENGTH else fn(text)
+
+    wrapper.__name__, wrapper.__doc__ = fn.__name__, fn.__doc__
+    wrapper.cache_info, wrapper.cache_clear = cached.cache_info, cached.cache_clear
+    return wrapper
+
+@_cached
+def normalize(text):
+    """NFC, lowercase, ASCII quotes/dashes, no space before punctuation, collapsed whitespace"""
+    text = unicodedata.normalize('NFC', text).translate(PUNCTUATION_MAP).lower()
+    text = ' '.join(text.split())
+    text = SPACE_BEFORE_PUNCT_RE.sub(r'\1', text)
+    return SPACE_AFTER_BRACKET_RE.sub(r'\1', text)
+
+@_cached
+def fold_diacritics(text):
+    """normalize() with the diacritics removed ('cửa sổ' -> 'cua so')"""
+    decomposed = unicodedata.normalize('NFD', normalize(text).replace('đ', 'd'))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+@_cached
+def tokenize(text):
+    """Syllable tokens of normalize(text), as a tuple"""
+    return tuple(TOKEN_RE.findall(normalize(text)))
+
+def _code_body(body):
+    body = body.upper()
+    return 'CAN/ULC' if body.startswith('CAN') else body
+
+@_cached
+def standard_codes(text):
+    """Standards identifiers in a text, e.g. frozenset({'ASTM E331', 'AAMA 501.2'})"""
+    text = unicodedata.normalize('NFC', text).translate(PUNCTUATION_MAP)
+    codes = set()
+    for match in STANDARD_CODE_RE.finditer(text):
+        body = _code_body(match.group(1))
+        codes.add(f"{body} {match.group(2).replace(' ', '').upper()}")
+        following = STANDARD_CODE_NEXT_RE.match(text, match.end())
+        while following:
+            codes.add(f"{body} {following.group(1).replace(' ', '').upper()}")
+            following = STANDARD_CODE_NEXT_RE.match(text, following.end())
+    return frozenset(codes)
+
+def cache_stats():
+    """Hits/misses/size of the memoized functions"""
+    return {
+        fn.__name__: fn.cache_info()._asdict()
+        for fn in (normalize, fold_diacritics, tokenize, standard_codes)
+    }
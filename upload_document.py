@@ -2,15 +2,29 @@
 """
 Script to upload PDF documents to Gemini FileSearch Store
 Run this script once to index your documents before starting the chatbot
+
+Bulk mode uploads with a bounded worker pool, polls all indexing operations
+together and records progress and content hashes in .upload_manifest.jsonl,
+so an interrupted run resumes where it stopped and re-runs only upload new
+or modified files:
+    python upload_document.py --store fileSearchStores/xxx --workers 8
+    python upload_document.py --create "Silkroad Documents Store"
+    python upload_document.py --store fileSearchStores/xxx --dry-run --prune
 """
 import os
 import sys
 import io
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from answer_cache import bump_store_generation
+from upload_manifest import (
+    UploadManifest, MANIFEST_FILE, UPLOADING, INDEXING, DONE, FAILED, file_signature
+)
 
 # Fix encoding for Vietnamese characters
 if sys.stdout.encoding != 'utf-8':
@@ -33,42 +47,185 @@ def create_file_search_store(client, store_name="Silkroad Documents Store"):
     print(f"  Store ID: {file_search_store.name}")
     return file_search_store
 
-def upload_document_to_store(client, file_search_store, file_path):
-    """Upload a document to the FileSearch store"""
-    file_name = Path(file_path).name
-
-    # Safe print for Vietnamese filename
+def display_name(path):
+    """File name safe to print on any console encoding"""
+    name = Path(path).name
     try:
-        print(f"\nUploading document: {file_name}...")
+        name.encode(sys.stdout.encoding or 'utf-8')
+        return name
     except UnicodeEncodeError:
-        print(f"\nUploading document: {file_name.encode('utf-8', errors='replace').decode('utf-8')}...")
-
-    try:
-        # Upload file directly to FileSearch store (combines upload + import)
-        # Use UTF-8 encoding for display name
-        operation = client.file_search_stores.upload_to_file_search_store(
-            file=str(file_path),
-            file_search_store_name=file_search_store.name,
-            config={'display_name': file_name}
-        )
-
-        print(f"  Upload initiated. Waiting for indexing to complete...")
-
-        # Wait for operation to complete
-        # Pass the operation object itself, not the name string
-        while not operation.done:
-            time.sleep(2)
-            operation = client.operations.get(operation)
-            print("  .", end="", flush=True)
-
-        print("\n✓ Document uploaded and indexed successfully!")
-        return operation
-
-    except Exception as e:
-        print(f"\n✗ Error uploading document: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+        return name.encode('utf-8', errors='replace').decode('utf-8')
+
+def start_upload(client, store_name, file_path, sha256=None, max_attempts=3):
+    """
+    Upload one file and return its indexing operation (runs in a worker)
+    Retries transient errors with exponential backoff.
+    """
+    config = {'display_name': Path(file_path).name}
+    if sha256:
+        # Stored with the document, so the store itself shows which content it holds
+        config['custom_metadata'] = [{'key': 'sha256', 'string_value': sha256}]
+
+    delay = 2.0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return client.file_search_stores.upload_to_file_search_store(
+                file=str(file_path),
+                file_search_store_name=store_name,
+                config=config
+            )
+        except Exception:
+            if attempt == max_attempts:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+def print_plan(plan):
+    """Show what a sync would do (also the --dry-run output)"""
+    print(f"  Unchanged: {len(plan['unchanged'])}")
+    print(f"  Duplicate content (no upload): {len(plan['duplicate'])}")
+    for file, entry in plan['duplicate']:
+        print(f"    = {display_name(file)} (same as {display_name(entry['file'])})")
+    print(f"  Still indexing (resume): {len(plan['resume'])}")
+    print(f"  To upload (new/modified): {len(plan['upload'])}")
+    for file, _, replaces in plan['upload']:
+        print(f"    {'~' if replaces else '+'} {display_name(file)}")
+    print(f"  Removed locally: {len(plan['removed'])}")
+    for file, _ in plan['removed']:
+        print(f"    - {display_name(file)}")
+    if plan['stale']:
+        print(f"  Old versions of modified files still in store: {len(plan['stale'])}")
+
+def delete_documents(client, store_name, manifest, items, clear_replaces=False):
+    """
+    Delete store documents [(file, document name)]
+    Removed files are dropped from the manifest; for replaced versions only
+    the 'replaces' marker is cleared. Returns the number deleted.
+    """
+    deleted = 0
+    seen = set()
+    for file, document_name in items:
+        if document_name in seen:
+            continue
+        seen.add(document_name)
+        try:
+            client.file_search_stores.documents.delete(name=document_name, config={'force': True})
+            deleted += 1
+            print(f"  🗑 {display_name(file)} ({document_name})")
+        except Exception as e:
+            print(f"  ✗ Could not delete {document_name}: {e}")
+            continue
+        if clear_replaces:
+            manifest.update(store_name, file, replaces=None)
+        else:
+            manifest.remove(store_name, file)
+    return deleted
+
+def bulk_upload(client, store_name, plan, manifest, workers=4,
+                poll_interval=2.0, max_poll_interval=30.0, max_attempts=3, prune=False):
+    """
+    Upload the files of a plan (UploadManifest.plan) concurrently and wait
+    for all indexing operations
+
+    - Unchanged and duplicate-content files are not uploaded
+    - Files still INDEXING from an interrupted run are only polled again
+    - Uploads run in a pool of `workers` threads; the main thread polls
+      every outstanding operation, each with its own backoff
+      (poll_interval, x1.5 per poll, up to max_poll_interval)
+    - With prune, the old document of a modified file is deleted once the
+      new version is indexed
+
+    Returns {'done', 'failed', 'skipped'} counts.
+    """
+    counts = {'done': 0, 'failed': 0, 'skipped': len(plan['unchanged'])}
+    pending = {}  # operation name -> [file, operation, next poll time, delay]
+    replaced = []
+
+    for file, entry in plan['duplicate']:
+        manifest.update(store_name, file, status=DONE, sha256=entry['sha256'],
+                        document_name=entry.get('document_name'), **file_signature(file))
+        counts['skipped'] += 1
+    for file in plan['moved']:
+        manifest.remove(store_name, file)
+
+    for file, operation_name in plan['resume']:
+        operation = types.UploadToFileSearchStoreOperation(name=operation_name)
+        pending[operation_name] = [file, operation, 0.0, poll_interval]
+
+    total = counts['skipped'] + len(pending) + len(plan['upload'])
+
+    def report(symbol, file_path, message=''):
+        finished = counts['done'] + counts['failed'] + counts['skipped']
+        print(f"  [{finished}/{total}] {symbol} {display_name(file_path)}{message}", flush=True)
+
+    def upload(file_path, sha256, replaces):
+        manifest.update(store_name, file_path, status=UPLOADING, sha256=sha256,
+                        replaces=replaces, **file_signature(file_path))
+        return start_upload(client, store_name, file_path, sha256, max_attempts)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        uploads = {executor.submit(upload, *item): item[0] for item in plan['upload']}
+
+        while uploads or pending:
+            # Collect finished uploads: they now have an operation to poll
+            for future in [f for f in uploads if f.done()]:
+                file_path = uploads.pop(future)
+                try:
+                    operation = future.result()
+                except Exception as e:
+                    manifest.update(store_name, file_path, status=FAILED, error=str(e))
+                    counts['failed'] += 1
+                    report('✗', file_path, f" - upload failed: {e}")
+                    continue
+                if operation.done:
+                    pending[operation.name or file_path] = [file_path, operation, 0.0, poll_interval]
+                    continue
+                manifest.update(store_name, file_path, status=INDEXING, operation=operation.name)
+                pending[operation.name] = [file_path, operation, time.time() + poll_interval, poll_interval]
+
+            # Poll the operations that are due
+            now = time.time()
+            for name, item in list(pending.items()):
+                file_path, operation, next_poll, delay = item
+                if next_poll > now:
+                    continue
+                if not operation.done:
+                    try:
+                        operation = client.operations.get(operation)
+                    except Exception as e:
+                        print(f"  ⚠ Poll error for {display_name(file_path)}: {e}")
+                    item[1] = operation
+
+                if operation.done:
+                    del pending[name]
+                    if operation.error:
+                        manifest.update(store_name, file_path, status=FAILED, error=str(operation.error))
+                        counts['failed'] += 1
+                        report('✗', file_path, f" - indexing failed: {operation.error}")
+                    else:
+                        document_name = operation.response.document_name if operation.response else None
+                        manifest.update(store_name, file_path, status=DONE,
+                                        document_name=document_name, error=None)
+                        counts['done'] += 1
+                        report('✓', file_path)
+                        entry = manifest.get(store_name, file_path)
+                        if entry.get('replaces'):
+                            replaced.append((file_path, entry['replaces']))
+                else:
+                    item[3] = min(delay * 1.5, max_poll_interval)
+                    item[2] = now + item[3]
+
+            if uploads or pending:
+                # Wake up for the next due poll, or soon if uploads are still running
+                next_due = min((item[2] for item in pending.values()), default=now + 0.5)
+                time.sleep(max(0.05, min(next_due - time.time(), 0.5 if uploads else max_poll_interval)))
+
+    if prune and (replaced or plan['stale']):
+        print("\nDeleting old versions of modified files...")
+        delete_documents(client, store_name, manifest, replaced + plan['stale'], clear_replaces=True)
+
+    manifest.compact()
+    return counts
 
 def list_existing_stores(client):
     """List all existing FileSearch stores"""
@@ -120,8 +277,64 @@ def update_env_file(store_id):
 
     print(f"\n✓ Updated .env file with store ID")
 
+def choose_store_interactively(client):
+    """Ask the user to create a new store or pick an existing one"""
+    print("\n" + "=" * 60)
+    print("Choose an option:")
+    print("  1. Create new FileSearch store")
+    print("  2. Use existing FileSearch store")
+    print("=" * 60)
+
+    choice = input("Enter choice (1 or 2): ").strip()
+
+    if choice == '1':
+        # Create new store
+        store_name = input("Enter store name (or press Enter for default): ").strip()
+        if not store_name:
+            store_name = "Silkroad Documents Store"
+
+        return create_file_search_store(client, store_name).name
+
+    elif choice == '2':
+        # List existing stores
+        stores = list_existing_stores(client)
+        if not stores:
+            print("\nCreating new store instead...")
+            return create_file_search_store(client, "Silkroad Documents Store").name
+
+        store_idx = int(input("\nEnter store number to use: ").strip()) - 1
+        if 0 <= store_idx < len(stores):
+            print(f"\n✓ Using store: {stores[store_idx].display_name}")
+            return stores[store_idx].name
+
+        print("Invalid store number. Exiting.")
+        sys.exit(1)
+
+    print("Invalid choice. Exiting.")
+    sys.exit(1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Upload PDF documents to a Gemini FileSearch store')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--store', help='Existing store ID (fileSearchStores/...)')
+    target.add_argument('--create', metavar='NAME', nargs='?', const='Silkroad Documents Store',
+                        help='Create a new store')
+    parser.add_argument('--docs', default='documents', help='Folder with PDF files')
+    parser.add_argument('--pattern', default='*.pdf', help='Glob pattern inside --docs')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent uploads')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='Progress manifest (resume)')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='First poll delay (seconds)')
+    parser.add_argument('--max-poll-interval', type=float, default=30.0, help='Poll backoff cap (seconds)')
+    parser.add_argument('--no-env-update', action='store_true', help='Do not write the store ID to .env')
+    parser.add_argument('--dry-run', action='store_true', help='Only show new/modified/removed files')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete store documents of removed files and old versions of modified files')
+    return parser.parse_args()
+
 def main():
     """Main function to upload documents"""
+    args = parse_args()
+
     print("=" * 60)
     print("Silkroad RAG - Document Upload Tool")
     print("=" * 60)
@@ -144,91 +357,108 @@ def main():
         sys.exit(1)
 
     # Check if documents folder exists
-    docs_folder = Path('documents')
+    docs_folder = Path(args.docs)
     if not docs_folder.exists():
         docs_folder.mkdir()
-        print(f"\n✓ Created 'documents' folder")
-        print(f"  Please place your PDF files in the 'documents' folder and run this script again")
+        print(f"\n✓ Created '{docs_folder}' folder")
+        print(f"  Please place your PDF files in the '{docs_folder}' folder and run this script again")
         sys.exit(0)
 
     # Find PDF files
-    pdf_files = list(docs_folder.glob('*.pdf'))
+    pdf_files = sorted(docs_folder.glob(args.pattern))
 
     if not pdf_files:
-        print(f"\n✗ No PDF files found in 'documents' folder")
+        print(f"\n✗ No files matching {args.pattern} found in '{docs_folder}' folder")
         print(f"  Please add your PDF files and run this script again")
         sys.exit(1)
 
-    print(f"\nFound {len(pdf_files)} PDF file(s):")
-    for pdf in pdf_files:
-        file_size = pdf.stat().st_size / (1024 * 1024)  # Convert to MB
-        try:
-            print(f"  - {pdf.name} ({file_size:.2f} MB)")
-        except UnicodeEncodeError:
-            # Fallback for encoding issues
-            print(f"  - {pdf.name.encode('utf-8', errors='replace').decode('utf-8')} ({file_size:.2f} MB)")
+    total_size = sum(pdf.stat().st_size for pdf in pdf_files) / (1024 * 1024)
+    print(f"\nFound {len(pdf_files)} file(s), {total_size:.2f} MB total")
+    for pdf in pdf_files[:20]:
+        print(f"  - {display_name(pdf)} ({pdf.stat().st_size / (1024 * 1024):.2f} MB)")
+    if len(pdf_files) > 20:
+        print(f"  ... and {len(pdf_files) - 20} more")
+
+    # Target store: flags first, interactive menu only on a terminal
+    if args.create:
+        store_name = create_file_search_store(client, args.create).name
+    elif args.store:
+        store_name = args.store
+    elif sys.stdin.isatty():
+        store_name = choose_store_interactively(client)
+    elif os.getenv('FILE_SEARCH_STORE_ID'):
+        store_name = os.getenv('FILE_SEARCH_STORE_ID')
+        print(f"\n✓ Using FILE_SEARCH_STORE_ID: {store_name}")
+    else:
+        print("\n✗ No store given. Use --store ID or --create NAME (or set FILE_SEARCH_STORE_ID)")
+        sys.exit(1)
+
+    # Compare with what is already indexed (content hashes in the manifest)
+    manifest = UploadManifest(args.manifest)
+    plan = manifest.plan(
+        store_name, pdf_files,
+        owns=lambda f: Path(f).parent == docs_folder and Path(f).match(args.pattern)
+    )
 
-    # Ask user to create new store or use existing
     print("\n" + "=" * 60)
-    print("Choose an option:")
-    print("  1. Create new FileSearch store")
-    print("  2. Use existing FileSearch store")
+    print(f"Sync plan for {store_name}")
     print("=" * 60)
+    print_plan(plan)
 
-    choice = input("Enter choice (1 or 2): ").strip()
-
-    if choice == '1':
-        # Create new store
-        store_name = input("Enter store name (or press Enter for default): ").strip()
-        if not store_name:
-            store_name = "Silkroad Documents Store"
-
-        file_search_store = create_file_search_store(client, store_name)
+    if args.dry_run:
+        print("\n✓ Dry run - nothing uploaded or deleted")
+        return
 
-    elif choice == '2':
-        # List existing stores
-        stores = list_existing_stores(client)
-        if not stores:
-            print("\nCreating new store instead...")
-            file_search_store = create_file_search_store(client, "Silkroad Documents Store")
-        else:
-            store_idx = int(input("\nEnter store number to use: ").strip()) - 1
-            if 0 <= store_idx < len(stores):
-                file_search_store = stores[store_idx]
-                print(f"\n✓ Using store: {file_search_store.display_name}")
-            else:
-                print("Invalid store number. Exiting.")
-                sys.exit(1)
-
-    else:
-        print("Invalid choice. Exiting.")
-        sys.exit(1)
-
-    # Upload all PDF files
+    # Upload new and modified files
     print("\n" + "=" * 60)
-    print("Uploading documents...")
+    print(f"Uploading documents ({args.workers} workers)...")
     print("=" * 60)
 
-    success_count = 0
-    for pdf_file in pdf_files:
-        result = upload_document_to_store(client, file_search_store, str(pdf_file))
-        if result:
-            success_count += 1
+    start = time.time()
+    counts = bulk_upload(
+        client, store_name, plan, manifest,
+        workers=args.workers,
+        poll_interval=args.poll_interval,
+        max_poll_interval=args.max_poll_interval,
+        prune=args.prune
+    )
+
+    deleted = 0
+    if plan['removed']:
+        if args.prune:
+            print("\nDeleting documents of removed files...")
+            deleted = delete_documents(client, store_name, manifest, plan['removed'])
+            manifest.compact()
+        else:
+            print(f"\n⚠ {len(plan['removed'])} removed file(s) are still in the store (use --prune to delete)")
 
     # Update .env file
-    update_env_file(file_search_store.name)
+    if not args.no_env_update:
+        update_env_file(store_name)
+
+    # Tell running chatbots to drop cached answers for the old documents
+    if counts['done'] or deleted:
+        bump_store_generation(store_name)
 
     # Summary
     print("\n" + "=" * 60)
     print("Upload Summary")
     print("=" * 60)
     print(f"  Total files: {len(pdf_files)}")
-    print(f"  Successful: {success_count}")
-    print(f"  Failed: {len(pdf_files) - success_count}")
-    print(f"\n  Store ID: {file_search_store.name}")
+    print(f"  Successful: {counts['done']}")
+    print(f"  Already indexed (skipped): {counts['skipped']}")
+    print(f"  Deleted from store: {deleted}")
+    print(f"  Failed: {counts['failed']}")
+    print(f"  Time: {time.time() - start:.1f}s")
+    print(f"\n  Store ID: {store_name}")
+    if counts['failed']:
+        print(f"\n⚠ Re-run the same command to retry failed files (progress is kept in {args.manifest})")
     print("\n✓ Setup complete! You can now run the chatbot with:")
     print("  python app.py")
     print("=" * 60)
 
+    if counts['failed']:
+        sys.exit(1)
+
 if __name__ == '__main__':
     main()
@@ -2,14 +2,22 @@
 """
 Upload sample_questions.xlsx to EXISTING FileSearch store
 No need to create new store - add to current store!
+
+Uses the same content-hash manifest as upload_document.py, so an unchanged
+file is not uploaded again:
+    python upload_examples_to_store.py --file sample_questions.xlsx --yes
+    python upload_examples_to_store.py --dry-run
 """
 import os
 import sys
 import io
-import time
+import argparse
 from pathlib import Path
 from google import genai
 from dotenv import load_dotenv
+from answer_cache import bump_store_generation
+from upload_manifest import UploadManifest, MANIFEST_FILE
+from upload_document import bulk_upload, delete_documents, print_plan
 
 # Fix encoding
 if sys.stdout.encoding != 'utf-8':
@@ -19,41 +27,6 @@ if sys.stderr.encoding != 'utf-8':
 
 load_dotenv()
 
-def upload_to_existing_store(client, file_path, store_id):
-    """
-    Upload file to EXISTING FileSearch store
-    """
-    file_name = Path(file_path).name
-
-    try:
-        print(f"\nUploading to existing store...")
-        print(f"  File: {file_name}")
-        print(f"  Store: {store_id}")
-
-        # Upload file to existing store
-        operation = client.file_search_stores.upload_to_file_search_store(
-            file=str(file_path),
-            file_search_store_name=store_id,
-            config={'display_name': file_name}
-        )
-
-        print(f"\n  Upload initiated. Waiting for indexing...")
-
-        # Wait for completion
-        while not operation.done:
-            time.sleep(2)
-            operation = client.operations.get(operation)
-            print("  .", end="", flush=True)
-
-        print("\n\n✓ File uploaded and indexed successfully!")
-        return True
-
-    except Exception as e:
-        print(f"\n✗ Error uploading: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return False
-
 def list_files_in_store(client, store_id):
     """
     List all files in the store
@@ -70,8 +43,20 @@ def list_files_in_store(client, store_id):
         print(f"Error checking store: {e}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Upload a Q&A Excel file to the existing FileSearch store')
+    parser.add_argument('--file', help='Excel file to upload (default: the only .xlsx found)')
+    parser.add_argument('--yes', action='store_true', help='Do not ask for confirmation')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='Upload manifest (content hashes)')
+    parser.add_argument('--dry-run', action='store_true', help='Only show whether the file would be uploaded')
+    parser.add_argument('--prune', action='store_true',
+                        help='Delete store documents of removed .xlsx files and old versions of this file')
+    return parser.parse_args()
+
 def main():
     """Main function"""
+    args = parse_args()
+
     print("=" * 80)
     print("Upload Q&A Examples to Existing FileSearch Store")
     print("=" * 80)
@@ -114,9 +99,17 @@ def main():
         print(f"  {i}. {f.name} ({size_mb:.2f} MB)")
 
     # Select file
-    if len(xlsx_files) == 1:
+    if args.file:
+        selected_file = Path(args.file)
+        if not selected_file.exists():
+            print(f"\n✗ File not found: {selected_file}")
+            sys.exit(1)
+    elif len(xlsx_files) == 1:
         selected_file = xlsx_files[0]
         print(f"\n✓ Auto-selected: {selected_file.name}")
+    elif not sys.stdin.isatty():
+        print("\n✗ Several .xlsx files found, choose one with --file")
+        sys.exit(1)
     else:
         choice = int(input("\nSelect file number to upload: ").strip()) - 1
         if 0 <= choice < len(xlsx_files):
@@ -125,6 +118,13 @@ def main():
             print("Invalid choice")
             sys.exit(1)
 
+    # Compare with what is already indexed (content hashes in the manifest)
+    manifest = UploadManifest(args.manifest)
+    plan = manifest.plan(
+        store_id, [selected_file],
+        owns=lambda f: f.endswith('.xlsx') and not Path(f).exists()
+    )
+
     # Confirm
     print("\n" + "=" * 80)
     print("Upload Summary")
@@ -132,22 +132,39 @@ def main():
     print(f"  File: {selected_file.name}")
     print(f"  Store: {store_id}")
     print(f"  Action: Add to EXISTING store (not creating new store)")
+    print_plan(plan)
     print("=" * 80)
 
-    confirm = input("\nProceed with upload? (yes/no): ").strip().lower()
+    if args.dry_run:
+        print("\n✓ Dry run - nothing uploaded or deleted")
+        sys.exit(0)
 
-    if confirm not in ['yes', 'y']:
-        print("Upload cancelled")
+    if not plan['upload'] and not plan['resume'] and not (args.prune and (plan['removed'] or plan['stale'])):
+        print(f"\n✓ {selected_file.name} is already indexed with the same content - nothing to upload")
         sys.exit(0)
 
+    if not args.yes and sys.stdin.isatty():
+        confirm = input("\nProceed with upload? (yes/no): ").strip().lower()
+
+        if confirm not in ['yes', 'y']:
+            print("Upload cancelled")
+            sys.exit(0)
+
     # Upload
     print("\n" + "=" * 80)
     print("Uploading...")
     print("=" * 80)
 
-    success = upload_to_existing_store(client, selected_file, store_id)
+    counts = bulk_upload(client, store_id, plan, manifest, workers=1, prune=args.prune)
+    if args.prune and plan['removed']:
+        delete_documents(client, store_id, manifest, plan['removed'])
+        manifest.compact()
+    success = counts['failed'] == 0
 
     if success:
+        # Tell running chatbots to drop cached answers for the old documents
+        bump_store_generation(store_id)
+
         print("\n" + "=" * 80)
         print("✓ SUCCESS")
         print("=" * 80)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Local upload manifest for the FileSearch ingestion scripts
+Records the state and content hash of every file per store, so an
+interrupted bulk upload resumes where it stopped and re-runs only upload
+new or modified files (see UploadManifest.plan).
+
+The manifest is an append-only JSON Lines log (one line per state change,
+cheap and crash-safe); it is replayed on load and compacted at the end of
+a run.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+MANIFEST_FILE = '.upload_manifest.jsonl'
+
+# File states
+UPLOADING = 'uploading'   # upload started, no operation yet
+INDEXING = 'indexing'     # uploaded, waiting for the indexing operation
+DONE = 'done'
+FAILED = 'failed'
+
+def file_signature(path):
+    """Cheap change detection: size and mtime"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Content hash of a file (streamed)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadManifest:
+    """Per-store file states, persisted as a JSONL log"""
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}  # (store, file) -> entry dict
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                key = (record['store'], record['file'])
+                if record.get('deleted'):
+                    self._entries.pop(key, None)
+                else:
+                    self._entries.setdefault(key, {}).update(record)
+
+    def get(self, store, file):
+        with self._lock:
+            entry = self._entries.get((store, file))
+            return dict(entry) if entry else None
+
+    def entries(self, store):
+        """All entries of a store as {file: entry}"""
+        with self._lock:
+            return {f: dict(e) for (s, f), e in self._entries.items() if s == store}
+
+    def update(self, store, file, **fields):
+        """Merge fields into a file entry and append the change to the log"""
+        record = {'store': store, 'file': file, **fields,
+                  'updated_at': datetime.now().isoformat(timespec='seconds')}
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._entries.setdefault((store, file), {}).update(record)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+
+    def remove(self, store, file):
+        with self._lock:
+            self._entries.pop((store, file), None)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'store': store, 'file': file, 'deleted': True}) + '\n')
+
+    def compact(self):
+        """Rewrite the log with one line per file (atomic rename)"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in self._entries.values():
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+
+    def plan(self, store, files, owns=None):
+        """
+        Compare local files with the manifest of a store
+        owns(file) limits which manifest entries count as "removed" when
+        missing from files (e.g. only PDFs in documents/); default all.
+
+        Files are matched by content hash (sha256; only recomputed when
+        size/mtime changed), so renamed or copied files are not uploaded
+        again. Returns a dict of lists:
+          upload     [(file, sha256, replaces)]  new or modified files
+          resume     [(file, operation name)]    still indexing from a previous run
+          unchanged  [file]
+          duplicate  [(file, entry)]             same content as an indexed file
+          removed    [(file, document name)]     no longer present locally
+          moved      [file]                      missing, but its document is still used
+          stale      [(file, document name)]     old versions of modified files
+        """
+        entries = self.entries(store)
+        indexed = {}  # sha256 -> entry of an indexed file
+        for entry in entries.values():
+            if entry.get('status') == DONE and entry.get('sha256'):
+                indexed.setdefault(entry['sha256'], entry)
+
+        plan = {name: [] for name in ('upload', 'resume', 'unchanged', 'duplicate', 'removed', 'moved', 'stale')}
+        current = set()
+        kept_documents = set()
+
+        for path in files:
+            file = str(path)
+            current.add(file)
+            entry = entries.get(file) or {}
+            signature = file_signature(path)
+            same_stat = entry.get('size') == signature['size'] and entry.get('mtime') == signature['mtime']
+            sha256 = entry['sha256'] if same_stat and entry.get('sha256') else file_sha256(path)
+
+            if same_stat and not entry.get('sha256') and entry.get('status') == DONE:
+                # Indexed before hashes were recorded: adopt the current hash
+                entry['sha256'] = sha256
+                self.update(store, file, sha256=sha256)
+
+            if entry.get('sha256') == sha256 and entry.get('status') == DONE:
+                plan['unchanged'].append(file)
+                kept_documents.add(entry.get('document_name'))
+                if not same_stat:
+                    # Touched but identical: refresh the stat so it is not hashed again
+                    self.update(store, file, **signature)
+            elif entry.get('sha256') == sha256 and entry.get('status') == INDEXING and entry.get('operation'):
+                plan['resume'].append((file, entry['operation']))
+            elif sha256 in indexed:
+                plan['duplicate'].append((file, indexed[sha256]))
+                kept_documents.add(indexed[sha256].get('document_name'))
+            else:
+                # Modified file: its old document is replaced once the new one is indexed
+                replaces = entry.get('document_name') if entry.get('status') == DONE else entry.get('replaces')
+                plan['upload'].append((file, sha256, replaces))
+
+        # Never replace a document that another file still points to
+        plan['upload'] = [
+            (file, sha256, replaces if replaces not in kept_documents else None)
+            for file, sha256, replaces in plan['upload']
+        ]
+
+        for file, entry in entries.items():
+            if owns and not owns(file):
+                continue
+            if file not in current and entry.get('status') == DONE and entry.get('document_name'):
+                if entry['document_name'] in kept_documents:
+                    plan['moved'].append(file)
+                else:
+                    plan['removed'].append((file, entry['document_name']))
+            elif file in current and entry.get('status') == DONE and entry.get('replaces') \
+                    and entry['replaces'] not in kept_documents:
+                plan['stale'].append((file, entry['replaces']))
+
+        return plan